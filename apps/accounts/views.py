@@ -7,6 +7,7 @@ from django.urls import reverse_lazy
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_protect
 
+from apps.orders.views import get_order_summary
 from .models import User, GuestSession
 from .forms import UserRegistrationForm, UserEditForm, GuestRegistrationForm
 
@@ -53,7 +54,9 @@ def register_guest(request):
 @login_required
 def profile(request):
     """Display user profile."""
-    return render(request, 'accounts/profile.html')
+    return render(request, 'accounts/profile.html', {
+        'order_summary': get_order_summary(request.user),
+    })
 
 
 @login_required
@@ -0,0 +1,72 @@
+import json
+
+from django.contrib.admin.models import CHANGE, LogEntry
+from django.contrib.contenttypes.models import ContentType
+from django.db import router, transaction
+from django.utils import timezone
+
+
+class BulkListEditableMixin:
+    """
+    Save list_editable changes from the changelist with one bulk UPDATE.
+
+    ModelAdmin saves every changed row with its own UPDATE and LogEntry
+    INSERT. Here the rows and log entries are collected during the formset
+    loop and written with bulk_update/bulk_create inside the same transaction.
+    save_model() is bypassed for changelist edits and bulk_update sends no
+    post_save, so admins that need per-object side effects must not use this
+    mixin; side effects that apply to the whole batch (cache invalidation)
+    go in list_edits_saved().
+    """
+
+    def changelist_view(self, request, extra_context=None):
+        if request.method != 'POST' or '_save' not in request.POST or not self.list_editable:
+            return super().changelist_view(request, extra_context)
+        with transaction.atomic(using=router.db_for_write(self.model)):
+            request._bulk_list_edits = []
+            response = super().changelist_view(request, extra_context)
+            edits, request._bulk_list_edits = request._bulk_list_edits, None
+            self._save_list_edits(request, edits)
+        return response
+
+    def save_model(self, request, obj, form, change):
+        edits = getattr(request, '_bulk_list_edits', None)
+        if edits is None or not change:
+            return super().save_model(request, obj, form, change)
+        edits.append([obj, None])
+
+    def log_change(self, request, obj, message):
+        edits = getattr(request, '_bulk_list_edits', None)
+        if not edits or edits[-1][0] is not obj:
+            return super().log_change(request, obj, message)
+        edits[-1][1] = message
+
+    def _save_list_edits(self, request, edits):
+        if not edits:
+            return
+        objects = [obj for obj, _message in edits]
+        fields = list(self.list_editable)
+        if any(f.name == 'updated_at' for f in self.model._meta.concrete_fields):
+            # auto_now не срабатывает в bulk_update, выставляем вручную
+            now = timezone.now()
+            for obj in objects:
+                obj.updated_at = now
+            fields.append('updated_at')
+        self.model._default_manager.bulk_update(objects, fields)
+
+        content_type = ContentType.objects.get_for_model(self.model, for_concrete_model=False)
+        LogEntry.objects.bulk_create([
+            LogEntry(
+                user_id=request.user.pk,
+                content_type=content_type,
+                object_id=str(obj.pk),
+                object_repr=str(obj)[:200],
+                action_flag=CHANGE,
+                change_message=json.dumps(message) if isinstance(message, list) else (message or ''),
+            )
+            for obj, message in edits
+        ])
+        self.list_edits_saved(request, objects)
+
+    def list_edits_saved(self, request, objects):
+        """Hook called once after a changelist edit is written, inside its transaction."""
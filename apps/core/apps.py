@@ -3,4 +3,9 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
 	default_auto_field = 'django.db.models.BigAutoField'
 	name = 'apps.core'
-	verbose_name = 'Базовые модели'
\ No newline at end of file
+	verbose_name = 'Базовые модели'
+
+	def ready(self):
+		from . import db_pool, instrumentation
+		db_pool.connect_signals()
+		instrumentation.install()
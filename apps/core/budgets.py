@@ -0,0 +1,160 @@
+"""
+Query-count and response-time budgets for the main pages.
+
+Each entry of BUDGETS names a URL, how to request it (as a customer, as
+staff, with a cart) and its ceilings: the number of SQL queries and the
+median response time in milliseconds on the dataset created by seed().
+apps/core/tests/test_budgets.py fails when a page goes over its query
+budget; ``manage.py view_budgets`` prints the current numbers next to the
+budgets and fails on either ceiling, time included.
+
+Query budgets equal the current counts: a change that adds a query to a
+page must raise its budget in the same commit, so the reviewer sees it. Time budgets
+are generous ceilings that catch order-of-magnitude regressions (a lost
+select_related on a page of 12 products); VIEW_BUDGET_TIME_FACTOR scales
+them on slow CI machines.
+"""
+import statistics
+import time
+from collections import namedtuple
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+# who: None (аноним), 'customer' или 'staff'; kwargs и params - функции от данных seed()
+ViewBudget = namedtuple('ViewBudget', ('queries', 'ms', 'who', 'cart', 'kwargs', 'params'))
+ViewBudget.__new__.__defaults__ = (None, False, None, None)
+
+Measurement = namedtuple('Measurement', ('url_name', 'status', 'queries', 'ms', 'budget'))
+
+BUDGETS = {
+    'products:product_list': ViewBudget(queries=4, ms=100),
+    'products:product_list_by_category': ViewBudget(
+        queries=5, ms=100, kwargs=lambda data: {'category_slug': data['category'].slug},
+    ),
+    'products:product_detail': ViewBudget(
+        queries=3, ms=60, kwargs=lambda data: {'pk': data['product'].pk, 'slug': data['product'].slug},
+    ),
+    'products:search': ViewBudget(queries=4, ms=150, params=lambda data: {'q': 'coffee'}),
+    'cart:cart_detail': ViewBudget(queries=4, ms=80, cart=True),
+    'orders:checkout': ViewBudget(queries=4, ms=50, who='customer', cart=True),
+    'orders:guest_checkout': ViewBudget(queries=3, ms=60, cart=True),
+    'orders:order_history': ViewBudget(queries=4, ms=80, who='customer'),
+    'orders:order_history_json': ViewBudget(queries=3, ms=50, who='customer'),
+    'orders:order_detail': ViewBudget(
+        queries=4, ms=60, who='customer', kwargs=lambda data: {'pk': data['order'].pk},
+    ),
+    'orders:admin_order_report': ViewBudget(queries=4, ms=100, who='staff'),
+    'orders:admin_sales_report': ViewBudget(queries=5, ms=50, who='staff'),
+    'accounts:profile': ViewBudget(queries=4, ms=50, who='customer'),
+}
+
+CATEGORIES = 6
+PRODUCTS_PER_CATEGORY = 8
+ORDERS = 25
+CART_ITEMS = 5
+
+
+def seed():
+    """
+    Create the dataset the budgets are measured on and return its key objects.
+
+    6 categories with 8 products each (the catalog spans several pages),
+    a customer with 25 orders of 3 lines (several history pages), half of
+    them paid, and a staff user.
+    """
+    from apps.orders.models import Order
+    from apps.products.models import Category, Product
+
+    User = get_user_model()
+    products = []
+    for number in range(CATEGORIES):
+        category = Category.objects.create(
+            name=f'Coffee category {number}', slug=f'coffee-category-{number}', description='Coffee beans',
+        )
+        products += [
+            Product.objects.create(
+                name=f'Coffee {number}-{index}', slug=f'coffee-{number}-{index}',
+                description='Freshly roasted coffee beans', price=Decimal(300 + 10 * index),
+                category=category, stock=100,
+            )
+            for index in range(PRODUCTS_PER_CATEGORY)
+        ]
+
+    customer = User.objects.create_user(email='budget@example.com', password='budgetpass123', username='budget')
+    staff = User.objects.create_superuser(email='budget-admin@example.com', password='budgetpass123',
+                                          username='budget-admin')
+    started = timezone.now() - timedelta(days=ORDERS)
+    for number in range(ORDERS):
+        order = Order.objects.create(
+            user=customer, first_name='Ivan', last_name='Petrov', email=customer.email,
+            address='Moscow', postal_code='101000', city='Moscow', phone='+79990000000',
+        )
+        Order.objects.filter(pk=order.pk).update(created_at=started + timedelta(days=number))
+        order.add_items_from_cart([
+            {'product': product, 'price': product.price, 'quantity': 1 + index}
+            for index, product in enumerate(products[number % len(products):][:3])
+        ])
+        if number % 2:
+            order.mark_paid()
+
+    return {
+        'category': products[0].category,
+        'product': products[0],
+        'products': products,
+        'order': order,
+        'customer': customer,
+        'staff': staff,
+    }
+
+
+def _prepare(client, budget, data):
+    client.logout()
+    if budget.who:
+        client.force_login(data[budget.who])
+    if budget.cart:
+        session = client.session
+        session[settings.CART_SESSION_ID] = {
+            str(product.pk): {'quantity': 1, 'price': str(product.price)}
+            for product in data['products'][:CART_ITEMS]
+        }
+        session.save()
+
+
+def measure(client, url_name, data, repeat=5):
+    """Request ``url_name`` as its budget says and return a Measurement."""
+    budget = BUDGETS[url_name]
+    _prepare(client, budget, data)
+    url = reverse(url_name, kwargs=budget.kwargs(data) if budget.kwargs else None)
+    params = budget.params(data) if budget.params else None
+
+    client.get(url, params)  # прогрев: кэши ContentType, шаблонов, сессия
+    timings = []
+    queries = 0
+    for _ in range(max(1, repeat)):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = client.get(url, params)
+            timings.append((time.perf_counter() - started) * 1000)
+        queries = max(queries, len(captured))
+    return Measurement(url_name, response.status_code, queries, statistics.median(timings), budget)
+
+
+def over_budget(measurement):
+    """Reasons ``measurement`` is over its budget (an empty list if it is within)."""
+    budget = measurement.budget
+    ms = budget.ms * settings.VIEW_BUDGET_TIME_FACTOR
+    problems = []
+    if measurement.status != 200:
+        problems.append(f'status {measurement.status}')
+    if measurement.queries > budget.queries:
+        problems.append(f'{measurement.queries} queries > {budget.queries}')
+    if measurement.ms > ms:
+        problems.append(f'{measurement.ms:.0f} ms > {ms:.0f} ms')
+    return problems
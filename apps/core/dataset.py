@@ -0,0 +1,495 @@
+"""
+Synthetic production-scale dataset loaded with COPY.
+
+generate() fills categories, products, customers, guest sessions, orders
+and order lines and returns the number of rows per table. Rows are built
+in Python and streamed to PostgreSQL with COPY FROM STDIN, so millions of
+orders load in minutes instead of the hours ORM saves would take; order
+lines go in chunks of CHUNK_ORDERS orders, each in its own transaction.
+
+Everything comes from one random.Random(seed) (and Faker seeded with it),
+so the same size and seed give the same data; ids come from the table
+sequences and only repeat on empty tables (``generate_dataset --truncate``).
+
+What the data looks like:
+
+* products have Russian or English names and descriptions built from
+  coffee origins, roasts and tasting notes; popularity follows a Pareto
+  distribution, so a few products get most of the orders;
+* customers and guest sessions appear over time (ids grow with
+  date_joined) and only order after they exist; a few customers place
+  many orders; names and addresses come from Faker ru_RU and en_US, e-mails
+  are @example.com;
+* the number of orders per day follows the year (a December peak and a
+  summer dip), the week (weekends), the hour (morning and evening peaks)
+  and a growth trend; old orders are delivered or cancelled, recent ones
+  are still pending, processing or shipped.
+
+Signals are bypassed: orders carry their snapshot, total and items count,
+but per-user summaries and daily sales must be rebuilt afterwards
+(``generate_dataset`` does it), and no status history is written.
+"""
+import bisect
+import io
+import json
+import random
+from collections import namedtuple
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection as default_connection, transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from apps.orders import partitioning
+
+from . import page_cache
+
+DatasetSize = namedtuple('DatasetSize', ('categories', 'products', 'users', 'guests', 'orders', 'days'))
+DatasetSize.__new__.__defaults__ = (12, 500, 20000, 10000, 200000, 730)
+
+# Пароль всех сгенерированных покупателей
+PASSWORD = 'dataset-password'
+CHUNK_ORDERS = 50000
+PEOPLE_POOL = 5000
+LOCALES = ('ru_RU', 'en_US')
+RUSSIAN_SHARE = 0.75
+
+# Январь..декабрь: пик перед Новым годом, провал летом
+MONTH_WEIGHTS = (1.1, 0.95, 1.0, 0.95, 0.9, 0.8, 0.75, 0.8, 0.95, 1.05, 1.2, 1.5)
+# Понедельник..воскресенье
+WEEKDAY_WEIGHTS = (1.0, 0.95, 0.95, 1.0, 1.1, 1.25, 1.2)
+# Час по Москве: утренний и вечерний пики
+HOUR_WEIGHTS = (
+    0.3, 0.15, 0.1, 0.1, 0.1, 0.2, 0.6, 1.4, 2.2, 2.4, 2.0, 1.6,
+    1.7, 1.6, 1.3, 1.2, 1.3, 1.6, 2.0, 2.3, 2.1, 1.6, 1.0, 0.6,
+)
+LINES_PER_ORDER = ((1, 2, 3, 4, 5, 6), (40, 28, 16, 9, 5, 2))
+QUANTITIES = ((1, 2, 3, 4), (70, 20, 7, 3))
+GUEST_SHARE = 0.35
+# Доля покупателей, зарегистрированных до начала периода
+EARLY_USERS = 0.3
+
+CATEGORIES = (
+    ('Моносорта', 'Single origin'), ('Эспрессо-смеси', 'Espresso blends'), ('Декаф', 'Decaf'),
+    ('Фильтр-кофе', 'Filter coffee'), ('Капсулы', 'Capsules'), ('Дрип-пакеты', 'Drip bags'),
+    ('Зеленый кофе', 'Green coffee'), ('Чай', 'Tea'), ('Сиропы', 'Syrups'),
+    ('Аксессуары', 'Accessories'), ('Кофемолки', 'Grinders'), ('Подарочные наборы', 'Gift sets'),
+)
+ORIGINS = (
+    ('Эфиопия Иргачеффе', 'Ethiopia Yirgacheffe'), ('Эфиопия Сидамо', 'Ethiopia Sidamo'),
+    ('Колумбия Супремо', 'Colombia Supremo'), ('Бразилия Сантос', 'Brazil Santos'),
+    ('Кения AA', 'Kenya AA'), ('Гватемала Антигуа', 'Guatemala Antigua'),
+    ('Коста-Рика Тарразу', 'Costa Rica Tarrazu'), ('Руанда Бурбон', 'Rwanda Bourbon'),
+    ('Индонезия Суматра', 'Indonesia Sumatra'), ('Перу Куско', 'Peru Cusco'),
+    ('Никарагуа Хинотега', 'Nicaragua Jinotega'), ('Гондурас Маркала', 'Honduras Marcala'),
+)
+ROASTS = (('светлая', 'Light'), ('средняя', 'Medium'), ('темная', 'Dark'), ('эспрессо', 'Espresso'))
+PROCESSES = (('мытая', 'washed'), ('натуральная', 'natural'), ('хани', 'honey'))
+NOTES = (
+    ('шоколад', 'chocolate'), ('карамель', 'caramel'), ('цитрус', 'citrus'), ('ягоды', 'berries'),
+    ('орех', 'nuts'), ('жасмин', 'jasmine'), ('персик', 'peach'), ('мед', 'honey'),
+    ('специи', 'spices'), ('вишня', 'cherry'),
+)
+# (вес по-русски, по-английски, множитель цены)
+PACKS = (('250 г', '250 g', 1), ('500 г', '500 g', 1.9), ('1 кг', '1 kg', 3.5))
+
+Person = namedtuple('Person', ('first_name', 'last_name', 'city', 'address', 'postal_code', 'phone', 'login'))
+
+
+class CopyStream(io.RawIOBase):
+    """Read-only file over lines already in the COPY text format (without the newline)."""
+
+    def __init__(self, lines):
+        self.lines = iter(lines)
+        self.buffer = b''
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) < size:
+            line = next(self.lines, None)
+            if line is None:
+                break
+            self.buffer += (line + '\n').encode()
+        if size < 0:
+            size = len(self.buffer)
+        chunk, self.buffer = self.buffer[:size], self.buffer[size:]
+        return chunk
+
+
+def copy_value(value):
+    if value is None:
+        return '\\N'
+    if value is True or value is False:
+        return 't' if value else 'f'
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, str):
+        return value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+    return str(value)
+
+
+def copy_line(row):
+    return '\t'.join(map(copy_value, row))
+
+
+def copy_lines(cursor, table, columns, lines):
+    """COPY ``lines`` (see copy_line) into ``columns`` of ``table``."""
+    qn = cursor.db.ops.quote_name
+    cursor.copy_expert(
+        f'COPY {qn(table)} ({", ".join(map(qn, columns))}) FROM STDIN', CopyStream(lines)
+    )
+
+
+def _clean(value):
+    """``value`` on one line and without backslashes: safe in COPY lines as is."""
+    return ' '.join(value.replace('\\', '').split())
+
+
+def reserve_ids(cursor, table, count):
+    """First of ``count`` consecutive ids taken from the sequence of ``table``."""
+    cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+    sequence = cursor.fetchone()[0]
+    cursor.execute('SELECT nextval(%s)', [sequence])
+    first = cursor.fetchone()[0]
+    if count > 1:
+        cursor.execute('SELECT setval(%s, %s)', [sequence, first + count - 1])
+    return first
+
+
+def _cumulative(weights):
+    total = 0
+    result = []
+    for weight in weights:
+        total += weight
+        result.append(total)
+    return result
+
+
+def _pick(rng, cumulative, limit=None):
+    """Index drawn by the cumulative weights among the first ``limit`` items."""
+    limit = len(cumulative) if limit is None else limit
+    return min(bisect.bisect_right(cumulative, rng.random() * cumulative[limit - 1]), limit - 1)
+
+
+class Generator:
+    """Builds the rows; see the module docstring."""
+
+    def __init__(self, size, seed, until, connection):
+        from faker import Faker
+
+        self.size = size
+        self.rng = random.Random(seed)
+        self.connection = connection
+        self.now = timezone.now()
+        self.first_day = until - timedelta(days=size.days - 1)
+        self.until = until
+        self.start = self.local(self.first_day, time.min)
+        self.counts = {}
+
+        self.people = []
+        for locale in LOCALES:
+            fake = Faker(locale)
+            fake.seed_instance(seed)
+            count = round(PEOPLE_POOL * (RUSSIAN_SHARE if locale == 'ru_RU' else 1 - RUSSIAN_SHARE))
+            self.people += [
+                Person(*map(_clean, (
+                    fake.first_name(), fake.last_name(), fake.city(), fake.street_address(),
+                    fake.postcode(), fake.phone_number()[:20], fake.user_name(),
+                )))
+                for _ in range(count)
+            ]
+
+    @staticmethod
+    def local(day, moment):
+        return datetime.combine(day, moment, tzinfo=partitioning.TIME_ZONE)
+
+    def copy(self, table, columns, rows, formatted=False):
+        """COPY tuples, or lines already ``formatted`` by the caller."""
+        with transaction.atomic(using=self.connection.alias), self.connection.cursor() as cursor:
+            copy_lines(cursor, table, columns, rows if formatted else map(copy_line, rows))
+        self.counts[table] = self.counts.get(table, 0) + len(rows)
+
+    def reserve(self, table, count):
+        with self.connection.cursor() as cursor:
+            return reserve_ids(cursor, table, count)
+
+    def moment_before(self, days):
+        """A random moment up to ``days`` days before the first day."""
+        return self.start - timedelta(seconds=self.rng.randrange(max(1, days * 86400)))
+
+    def categories(self):
+        first_id = self.reserve('products_category', self.size.categories)
+        rows = []
+        for number in range(self.size.categories):
+            russian, english = CATEGORIES[number % len(CATEGORIES)]
+            if number >= len(CATEGORIES):
+                russian, english = f'{russian} {number // len(CATEGORIES) + 1}', f'{english} {number // len(CATEGORIES) + 1}'
+            created = self.moment_before(730)
+            rows.append((
+                first_id + number, created, created, russian, f'{slugify(english)}-{first_id + number}',
+                f'{russian} / {english}', None,
+            ))
+        self.copy('products_category', (
+            'id', 'created_at', 'updated_at', 'name', 'slug', 'description', 'image',
+        ), rows)
+        self.category_ids = [row[0] for row in rows]
+
+    def products(self):
+        rng = self.rng
+        first_id = self.reserve('products_product', self.size.products)
+        rows = []
+        for number in range(self.size.products):
+            product_id = first_id + number
+            origin = rng.choice(ORIGINS)
+            roast = rng.choice(ROASTS)
+            process = rng.choice(PROCESSES)
+            notes = rng.sample(NOTES, 3)
+            pack = rng.choice(PACKS)
+            if rng.random() < RUSSIAN_SHARE:
+                name = f'{origin[0]}, {roast[0]} обжарка, {pack[0]}'
+                description = (
+                    f'{origin[0]}, {process[0]} обработка, {roast[0]} обжарка. '
+                    f'В чашке: {notes[0][0]}, {notes[1][0]} и {notes[2][0]}.'
+                )
+            else:
+                name = f'{origin[1]} {roast[1]} Roast, {pack[1]}'
+                description = (
+                    f'{origin[1]}, {process[1]} process, {roast[1].lower()} roast. '
+                    f'Notes of {notes[0][1]}, {notes[1][1]} and {notes[2][1]}.'
+                )
+            price = Decimal(round(rng.randrange(45, 150) * pack[2]) * 10)
+            created = self.moment_before(365)
+            rows.append((
+                product_id, created, created, name, f'{slugify(f"{origin[1]} {roast[1]} {pack[1]}")}-{product_id}',
+                description, price, None, rng.random() > 0.05, rng.randrange(0, 200),
+                rng.choice(self.category_ids),
+            ))
+        self.copy('products_product', (
+            'id', 'created_at', 'updated_at', 'name', 'slug', 'description', 'price', 'image',
+            'is_available', 'stock', 'category_id',
+        ), rows)
+        self.products_by_index = [(row[0], row[4], row[3], row[6]) for row in rows]
+        self.product_weights = _cumulative(rng.paretovariate(1.1) for _ in rows)
+
+    def joined(self, count):
+        """Sorted join moments: EARLY_USERS before the period, the rest spread over it."""
+        span = self.size.days * 86400
+        moments = [
+            self.moment_before(365) if self.rng.random() < EARLY_USERS
+            else self.start + timedelta(seconds=self.rng.randrange(span))
+            for _ in range(count)
+        ]
+        return sorted(moments)
+
+    def users(self):
+        rng = self.rng
+        first_id = self.reserve('accounts_user', self.size.users)
+        password = make_password(PASSWORD, salt='dataset')
+        rows = []
+        self.customers = []
+        for number, joined in enumerate(self.joined(self.size.users)):
+            user_id = first_id + number
+            person = rng.choice(self.people)
+            email = f'{person.login}.{user_id}@example.com'
+            self.customers.append((user_id, joined, person, email))
+            rows.append((
+                user_id, password, joined, False, f'user{user_id}', person.first_name, person.last_name,
+                False, True, joined, joined, joined, email, 'CUSTOMER',
+                person.phone, f'{person.postal_code}, {person.city}, {person.address}',
+            ))
+        self.copy('accounts_user', (
+            'id', 'password', 'last_login', 'is_superuser', 'username', 'first_name', 'last_name',
+            'is_staff', 'is_active', 'date_joined', 'created_at', 'updated_at', 'email', 'role',
+            'phone', 'address',
+        ), rows)
+        self.customer_weights = _cumulative(rng.paretovariate(1.3) for _ in rows)
+
+    def guests(self):
+        rng = self.rng
+        first_id = self.reserve('accounts_guestsession', self.size.guests)
+        rows = []
+        for number, created in enumerate(self.joined(self.size.guests)):
+            guest_id = first_id + number
+            rows.append((
+                guest_id, created, created, f'{rng.getrandbits(128):032x}',
+                f'{rng.choice(self.people).login}.g{guest_id}@example.com',
+            ))
+        self.copy('accounts_guestsession', ('id', 'created_at', 'updated_at', 'session_key', 'email'), rows)
+        self.guest_sessions = [(row[0], row[1], row[4]) for row in rows]
+
+    def day_counts(self):
+        """Number of orders per day: seasonality, weekday, growth and noise."""
+        days = [self.first_day + timedelta(days=offset) for offset in range(self.size.days)]
+        weights = [
+            MONTH_WEIGHTS[day.month - 1] * WEEKDAY_WEIGHTS[day.weekday()]
+            * (0.6 + 0.4 * offset / max(1, len(days) - 1)) * self.rng.uniform(0.85, 1.15)
+            for offset, day in enumerate(days)
+        ]
+        total = sum(weights)
+        counts = []
+        carry = 0.0
+        for day, weight in zip(days, weights):
+            expected = self.size.orders * weight / total + carry
+            count = int(expected)
+            carry = expected - count
+            counts.append((day, count))
+        # Остаток от округления - в последний день
+        day, count = counts[-1]
+        counts[-1] = (day, count + self.size.orders - sum(count for _day, count in counts))
+        return counts
+
+    def status(self, created):
+        """Status and paid flag of an order placed at ``created``."""
+        rng = self.rng
+        age = (self.until - created.astimezone(partitioning.TIME_ZONE).date()).days
+        chance = rng.random()
+        if age > 14:
+            status = 'CANCELLED' if chance < 0.07 else 'DELIVERED'
+        elif age > 3:
+            status = 'CANCELLED' if chance < 0.05 else 'SHIPPED' if chance < 0.4 else 'DELIVERED'
+        else:
+            status = ('CANCELLED' if chance < 0.05 else 'PENDING' if chance < 0.45
+                      else 'PROCESSING' if chance < 0.8 else 'SHIPPED')
+        if status in ('PENDING', 'CANCELLED'):
+            return status, rng.random() < 0.3
+        return status, True
+
+    def orders(self, progress=None):
+        rng = self.rng
+        hours = _cumulative(HOUR_WEIGHTS)
+        line_counts, line_weights = LINES_PER_ORDER
+        quantities, quantity_weights = QUANTITIES
+        customer_joined = [customer[1] for customer in self.customers]
+        guest_created = [guest[1] for guest in self.guest_sessions]
+
+        order_id = self.reserve('orders_order', self.size.orders) if self.size.orders else None
+        orders, lines = [], []
+        loaded = 0
+        for day, count in self.day_counts():
+            moments = sorted(
+                self.local(day, time(_pick(rng, hours), rng.randrange(60), rng.randrange(60)))
+                for _ in range(count)
+            )
+            for created in moments:
+                known_customers = bisect.bisect_right(customer_joined, created)
+                known_guests = bisect.bisect_right(guest_created, created)
+                user_id = guest_id = None
+                if known_customers and (not known_guests or rng.random() >= GUEST_SHARE):
+                    user_id, _joined, person, email = self.customers[
+                        _pick(rng, self.customer_weights, known_customers)
+                    ]
+                elif known_guests:
+                    # Чаще заказывают недавно пришедшие гости
+                    guest_id, _created, email = self.guest_sessions[
+                        max(0, known_guests - 1 - int(rng.expovariate(1 / 50)))
+                    ]
+                    person = rng.choice(self.people)
+                else:
+                    person = rng.choice(self.people)
+                    email = f'{person.login}.o{order_id}@example.com'
+
+                products = {
+                    self.products_by_index[_pick(rng, self.product_weights)]
+                    for _ in range(rng.choices(line_counts, line_weights)[0])
+                }
+                # Строки COPY собираются здесь, а не через copy_line: на миллионах заказов
+                # форматирование значений по одному занимает больше времени, чем сама загрузка
+                stamp = created.isoformat()
+                snapshot_lines = []
+                total = Decimal('0')
+                for product_id, slug, name, price in sorted(products):
+                    quantity = rng.choices(quantities, quantity_weights)[0]
+                    cost = price * quantity
+                    total += cost
+                    snapshot_lines.append([product_id, slug, name, f'{price:.2f}', quantity, f'{cost:.2f}', ''])
+                    lines.append(f'{stamp}\t{stamp}\t{price}\t{quantity}\t{order_id}\t{product_id}')
+                snapshot = {'v': 2, 'lines': snapshot_lines, 'total': f'{total:.2f}'}
+
+                status, paid = self.status(created)
+                updated = min(created + timedelta(hours=rng.randrange(1, 96)), self.now)
+                orders.append('\t'.join((
+                    str(order_id), stamp, updated.isoformat(), person.first_name, person.last_name, email,
+                    person.address, person.postal_code, person.city, person.phone, status, 't' if paid else 'f',
+                    str(total), copy_value(guest_id), copy_value(user_id),
+                    copy_value(json.dumps(snapshot, ensure_ascii=False)),
+                    str(sum(line[4] for line in snapshot_lines)),
+                )))
+                order_id += 1
+
+            if len(orders) >= CHUNK_ORDERS:
+                loaded += self.flush_orders(orders, lines)
+                orders, lines = [], []
+                if progress:
+                    progress(loaded, self.size.orders)
+        if orders:
+            loaded += self.flush_orders(orders, lines)
+            if progress:
+                progress(loaded, self.size.orders)
+
+    def flush_orders(self, orders, lines):
+        self.copy('orders_order', (
+            'id', 'created_at', 'updated_at', 'first_name', 'last_name', 'email', 'address',
+            'postal_code', 'city', 'phone', 'status', 'paid', 'total_cost', 'guest_session_id', 'user_id',
+            'snapshot', 'items_count',
+        ), orders, formatted=True)
+        first_id = self.reserve('orders_orderitem', len(lines))
+        self.copy('orders_orderitem', (
+            'id', 'created_at', 'updated_at', 'price', 'quantity', 'order_id', 'product_id',
+        ), [f'{first_id + number}\t{line}' for number, line in enumerate(lines)], formatted=True)
+        return len(orders)
+
+
+def generate(size, seed=0, until=None, progress=None, connection=default_connection):
+    """
+    Load a dataset of ``size`` (a DatasetSize) whose last day is ``until``
+    (yesterday by default). ``progress(orders loaded, orders total)`` is
+    called after each chunk. Returns {table: rows loaded}.
+    """
+    if until is None:
+        until = timezone.now().astimezone(partitioning.TIME_ZONE).date() - timedelta(days=1)
+    generator = Generator(size, seed, until, connection)
+
+    # Секции на весь период, чтобы заказы не попали в секцию по умолчанию
+    months = (until.year - generator.first_day.year) * 12 + until.month - generator.first_day.month + 1
+    for table in partitioning.PARTITIONED_TABLES:
+        if partitioning.is_partitioned(table, connection):
+            partitioning.ensure_partitions(table, generator.first_day, months, connection)
+
+    generator.categories()
+    generator.products()
+    generator.users()
+    generator.guests()
+    generator.orders(progress)
+    with connection.cursor() as cursor:
+        for table in generator.counts:
+            cursor.execute(f'ANALYZE {connection.ops.quote_name(table)}')
+    # COPY минует сигналы моделей: страницы каталога в кэше устарели
+    page_cache.bump_catalog_version()
+    return generator.counts
+
+
+def truncate(connection=default_connection):
+    """
+    Delete the orders (archived ones included), the catalog, guest sessions
+    and every customer who is not staff, restarting the id sequences.
+    """
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        # TRUNCATE невозможен, пока в транзакции есть отложенные проверки внешних ключей
+        cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        cursor.execute(
+            'TRUNCATE orders_orderitem, orders_orderstatushistory, orders_order, orders_ordersummary, '
+            'orders_dailysales, orders_archivedorder, orders_orderstatusjob, products_product, '
+            'products_category, accounts_guestsession '
+            'RESTART IDENTITY CASCADE'
+        )
+        cursor.execute('DELETE FROM accounts_user WHERE NOT is_staff AND NOT is_superuser')
+        # Новые покупатели получат те же id, что и при прошлой генерации
+        cursor.execute(
+            "SELECT setval(pg_get_serial_sequence('accounts_user', 'id'), COALESCE(MAX(id), 0) + 1, false) "
+            "FROM accounts_user"
+        )
+    page_cache.bump_catalog_version()
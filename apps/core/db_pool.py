@@ -0,0 +1,122 @@
+"""
+Connection reuse statistics of this process, per database alias.
+
+settings.DATABASES configures one of three modes:
+
+- per-request: CONN_MAX_AGE = 0, a new connection for every request;
+- persistent: each worker thread keeps its connection for CONN_MAX_AGE
+  seconds and health-checks it before reuse (CONN_HEALTH_CHECKS);
+- pool: Django's psycopg 3 pool (OPTIONS['pool']); a request checks a
+  connection out of the pool and returns it when it finishes.
+
+stats() reports for any mode how many connections were handed out
+(checkouts), how many of them were physically opened (connects, each one
+paying the TCP/auth round trips), how often and how long a checkout
+waited for a free pooled connection, and the age of every open connection.
+Counters are per process: with several workers each reports its own.
+"""
+import threading
+import time
+from collections import defaultdict
+
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+
+_lock = threading.Lock()
+_counters = defaultdict(lambda: {'checkouts': 0, 'connects': 0})
+# (алиас, ключ соединения) -> (время открытия, DatabaseWrapper потока или None для пула)
+_opened_at = {}
+
+
+def _pool(connection):
+    if not connection.settings_dict['OPTIONS'].get('pool'):
+        return None
+    return connection.pool
+
+
+def mode(alias='default'):
+    """'pool', 'persistent' or 'per-request'."""
+    connection = connections[alias]
+    if connection.settings_dict['OPTIONS'].get('pool'):
+        return 'pool'
+    return 'persistent' if connection.settings_dict['CONN_MAX_AGE'] else 'per-request'
+
+
+def _on_connection_created(sender, connection, **kwargs):
+    now = time.monotonic()
+    with _lock:
+        counters = _counters[connection.alias]
+        counters['checkouts'] += 1
+        if connection.settings_dict['OPTIONS'].get('pool'):
+            # Сигнал приходит при каждой выдаче из пула; новое физическое соединение узнаём по pid
+            key = (connection.alias, connection.connection.info.backend_pid)
+            if key not in _opened_at:
+                _opened_at[key] = (now, None)
+                counters['connects'] += 1
+        else:
+            _opened_at[(connection.alias, threading.get_ident())] = (now, connection)
+            counters['connects'] += 1
+
+
+def _on_request_started(sender, **kwargs):
+    # Подключён после close_old_connections: открытое сейчас соединение достаётся запросу повторно
+    for connection in connections.all(initialized_only=True):
+        if connection.connection is not None and not connection.settings_dict['OPTIONS'].get('pool'):
+            with _lock:
+                _counters[connection.alias]['checkouts'] += 1
+
+
+def connect_signals():
+    connection_created.connect(_on_connection_created, dispatch_uid='db_pool_stats')
+    request_started.connect(_on_request_started, dispatch_uid='db_pool_stats')
+
+
+def reset():
+    """Forget all counters (used by tests and benchmarks)."""
+    with _lock:
+        _counters.clear()
+        _opened_at.clear()
+
+
+def stats(alias='default'):
+    """Connection statistics of this process for ``alias`` (see module docstring)."""
+    connection = connections[alias]
+    pool = _pool(connection)
+    now = time.monotonic()
+    with _lock:
+        result = dict(_counters[alias])
+        for key, (opened, wrapper) in list(_opened_at.items()):
+            if key[0] != alias:
+                continue
+            if pool is not None:
+                # Пул сам закрывает соединения старше max_lifetime (с разбросом до 5%)
+                closed = now - opened > pool.max_lifetime * 1.05
+            else:
+                closed = wrapper is None or wrapper.connection is None
+            if closed:
+                del _opened_at[key]
+        ages = sorted((now - opened for key, (opened, _) in _opened_at.items() if key[0] == alias), reverse=True)
+
+    result.update(
+        mode=mode(alias),
+        waits=0,
+        wait_ms=0,
+        open_connections=len(ages),
+        connection_ages=[round(age, 1) for age in ages],
+    )
+    if pool is not None:
+        pool_stats = pool.get_stats()
+        result.update(
+            connects=pool_stats.get('connections_num', result['connects']),
+            waits=pool_stats.get('requests_queued', 0),
+            wait_ms=pool_stats.get('requests_wait_ms', 0),
+            pool_size=pool_stats.get('pool_size', 0),
+            pool_available=pool_stats.get('pool_available', 0),
+            pool_min=pool.min_size,
+            pool_max=pool.max_size,
+        )
+    else:
+        result['conn_max_age'] = connection.settings_dict['CONN_MAX_AGE']
+    return result
@@ -0,0 +1,134 @@
+"""
+Routing of read-only page queries to a PostgreSQL read replica.
+
+Nothing goes to the replica by default. A view opts in with @replica_reads
+(function views) or ReplicaReadsMixin (class-based views); while it runs
+and renders, reads are sent to settings.REPLICA_ALIAS. Writes, reads inside
+a transaction and session reads always use the primary.
+
+Read-your-writes: a request that writes (any unsafe method, a modified
+session, or an explicit pin_to_primary() call) makes PrimaryPinMiddleware
+set a short-lived cookie. Until it expires (REPLICA_PIN_SECONDS, longer
+than the expected replication lag) that client reads from the primary
+even on replica views, so a just-placed order or a just-edited cart is
+never read back stale.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+PIN_COOKIE = 'primary_pin'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+# Модели этих приложений всегда читаются с основной базы
+PRIMARY_ONLY_APPS = {'sessions'}
+
+_replica_reads = ContextVar('replica_reads', default=False)
+_pinned = ContextVar('primary_pinned', default=False)
+
+
+def replica_alias():
+    """Alias reads may be sent to, or None when no replica is configured."""
+    alias = getattr(settings, 'REPLICA_ALIAS', None)
+    return alias if alias and alias in connections.settings else None
+
+
+@contextmanager
+def use_replica():
+    """Send reads in this block to the replica (unless the client is pinned)."""
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+@contextmanager
+def use_primary():
+    """Send every read in this block to the primary."""
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+def _render_on_replica(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        with use_replica():
+            response = view(*args, **kwargs)
+            # TemplateResponse рендерится позже, уже вне представления: делаем это здесь
+            if hasattr(response, 'render') and not getattr(response, 'is_rendered', True):
+                response.render()
+        return response
+    return wrapper
+
+
+def replica_reads(view):
+    """Decorator for read-only function views that may read from the replica."""
+    return _render_on_replica(view)
+
+
+class ReplicaReadsMixin:
+    """Mixin for read-only class-based views that may read from the replica."""
+
+    def dispatch(self, request, *args, **kwargs):
+        return _render_on_replica(super().dispatch)(request, *args, **kwargs)
+
+
+def pin_to_primary(request):
+    """Make the client read from the primary for the next REPLICA_PIN_SECONDS."""
+    request.pin_to_primary = True
+
+
+class ReplicaRouter:
+    """Database router: replica for opted-in reads, primary for everything else."""
+
+    def db_for_read(self, model, **hints):
+        if not _replica_reads.get() or _pinned.get():
+            return None
+        if model._meta.app_label in PRIMARY_ONLY_APPS:
+            return None
+        alias = replica_alias()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика содержит те же данные, что и основная база
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class PrimaryPinMiddleware:
+    """Pins clients that have just written to the primary (see module docstring)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _pinned.set(PIN_COOKIE in request.COOKIES)
+        try:
+            response = self.get_response(request)
+        finally:
+            _pinned.reset(token)
+        session = getattr(request, 'session', None)
+        if (
+            request.method not in SAFE_METHODS
+            or getattr(request, 'pin_to_primary', False)
+            or (session is not None and session.modified)
+        ):
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax'
+            )
+        return response
@@ -0,0 +1,26 @@
+"""
+Debug toolbar visibility.
+
+The toolbar is shown to INTERNAL_IPS and, when the project runs in Docker,
+to the gateway of each container network (the address the host's browser
+appears to come from). Resolving those addresses needs a DNS lookup, so it
+happens on the first request instead of at settings import.
+"""
+import socket
+from functools import cache
+
+from django.conf import settings
+
+
+@cache
+def internal_ips():
+    """INTERNAL_IPS plus the x.x.x.1 gateway of every local address."""
+    try:
+        _, _, ips = socket.gethostbyname_ex(socket.gethostname())
+    except OSError:
+        ips = []
+    return frozenset(settings.INTERNAL_IPS) | {ip[:ip.rfind('.')] + '.1' for ip in ips}
+
+
+def show_toolbar(request):
+    return settings.DEBUG and request.META.get('REMOTE_ADDR') in internal_ips()
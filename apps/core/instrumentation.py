@@ -0,0 +1,209 @@
+"""
+Per-request accounting of database, template and cache work.
+
+A middleware opens a RequestStats with track() for the duration of a
+request; the hooks installed by install() add to it:
+
+- SQL: an execute wrapper on every database connection (query count and
+  time), attached once per connection object;
+- templates: the Django backend's Template.render, i.e. top-level renders
+  (render(), TemplateResponse); includes are part of their parent;
+- cache: get()/get_many() of the configured cache backends (hits, misses).
+
+Requests sampled for the Server-Timing header (apps/core/server_timing.py)
+also get ``timings``, wall time per named phase: each template context
+processor (cp-<name>), session load and save, and code wrapped in
+phase() such as PDF rendering. A context processor that returns a lazy
+queryset is only charged for building it; the query runs in the template.
+
+Outside track() the hooks only check a context variable, so commands and
+Celery tasks pay nothing else.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+_current = ContextVar('request_stats', default=None)
+_MISSING = object()
+
+
+class RequestStats:
+    """Work done by one request."""
+
+    __slots__ = ('queries', 'db_time', 'template_time', 'cache_hits', 'cache_misses', 'timings', 'open_phases')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # {фаза: секунды}; None, пока запрос не выбран для Server-Timing
+        self.timings = None
+        self.open_phases = set()
+
+
+def current():
+    """RequestStats of the request being handled, or None."""
+    return _current.get()
+
+
+@contextmanager
+def track():
+    stats = RequestStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def phase(name):
+    """Charge the wall time of the block to ``name`` (if the request is timed)."""
+    stats = _current.get()
+    # Вложенный вызов той же фазы (save() внутри create()) не считаем дважды
+    if stats is None or stats.timings is None or name in stats.open_phases:
+        yield
+        return
+    stats.open_phases.add(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.timings[name] = stats.timings.get(name, 0.0) + time.perf_counter() - started
+        stats.open_phases.discard(name)
+
+
+def _in_phase(name, func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        stats = _current.get()
+        if stats is None or stats.timings is None:
+            return func(*args, **kwargs)
+        with phase(name):
+            return func(*args, **kwargs)
+    wrapper.instrumented = True
+    return wrapper
+
+
+def _execute_wrapper(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.db_time += time.perf_counter() - started
+        stats.queries += 1
+
+
+def _on_connection_created(sender, connection, **kwargs):
+    # В режиме пула сигнал приходит при каждой выдаче соединения: не добавляем обертку повторно
+    if _execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_execute_wrapper)
+
+
+def _timed_render(render):
+    @wraps(render)
+    def wrapper(self, context=None, request=None):
+        stats = _current.get()
+        if stats is None:
+            return render(self, context, request)
+        started = time.perf_counter()
+        try:
+            return render(self, context, request)
+        finally:
+            stats.template_time += time.perf_counter() - started
+    wrapper.instrumented = True
+    return wrapper
+
+
+def _counted_get(get):
+    @wraps(get)
+    def wrapper(self, key, default=None, version=None):
+        value = get(self, key, _MISSING, version=version)
+        stats = _current.get()
+        if value is _MISSING:
+            if stats is not None:
+                stats.cache_misses += 1
+            return default
+        if stats is not None:
+            stats.cache_hits += 1
+        return value
+    wrapper.instrumented = True
+    return wrapper
+
+
+def _counted_get_many(get_many):
+    @wraps(get_many)
+    def wrapper(self, keys, version=None):
+        keys = list(keys)
+        found = get_many(self, keys, version=version)
+        stats = _current.get()
+        if stats is not None:
+            stats.cache_hits += len(found)
+            stats.cache_misses += len(keys) - len(found)
+        return found
+    wrapper.instrumented = True
+    return wrapper
+
+
+def _patch(cls, name, decorator):
+    method = getattr(cls, name)
+    if not getattr(method, 'instrumented', False):
+        setattr(cls, name, decorator(method))
+
+
+def _instrument_context_processors():
+    from django.template import engines
+    from django.template.backends.django import DjangoTemplates
+    from django.template.engine import Engine
+    from django.utils.functional import cached_property
+
+    original = Engine.__dict__['template_context_processors']
+    if getattr(original, 'instrumented', False):
+        return
+
+    # template_context_processors - cached_property движка: подменяем на уровне класса,
+    # чтобы обертки получали и движки, пересозданные после override_settings(TEMPLATES=...)
+    def template_context_processors(engine):
+        return tuple(
+            _in_phase(f'cp-{processor.__name__}', processor) for processor in original.func(engine)
+        )
+
+    instrumented = cached_property(template_context_processors)
+    instrumented.__set_name__(Engine, 'template_context_processors')
+    instrumented.instrumented = True
+    Engine.template_context_processors = instrumented
+    for backend in engines.all():
+        if isinstance(backend, DjangoTemplates):
+            backend.engine.__dict__.pop('template_context_processors', None)
+
+
+def install():
+    """Attach the hooks (called once from CoreConfig.ready)."""
+    from django.core.cache import caches
+    from importlib import import_module
+
+    from django.core.cache.backends.base import BaseCache
+    from django.template.backends.django import Template
+
+    connection_created.connect(_on_connection_created, dispatch_uid='instrumentation')
+    _patch(Template, 'render', _timed_render)
+    for alias in settings.CACHES:
+        backend = type(caches[alias])
+        _patch(backend, 'get', _counted_get)
+        # Базовый get_many вызывает get для каждого ключа: их уже посчитали
+        if backend.get_many is not BaseCache.get_many:
+            _patch(backend, 'get_many', _counted_get_many)
+
+    session_store = import_module(settings.SESSION_ENGINE).SessionStore
+    _patch(session_store, 'load', lambda load: _in_phase('session-load', load))
+    _patch(session_store, 'save', lambda save: _in_phase('session-save', save))
+    _instrument_context_processors()
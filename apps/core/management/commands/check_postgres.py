@@ -0,0 +1,116 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_finished, request_started
+from django.db import DatabaseError, connections
+
+from apps.core import db_pool
+
+
+class Command(BaseCommand):
+    help = (
+        'Проверяет подключение к PostgreSQL (основная база и реплика) и показывает '
+        'состояние соединений: режим (пул или постоянные соединения), выдачи, '
+        'новые подключения, ожидания и возраст соединений'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checkouts', type=int, default=20,
+                            help='Сколько запросов сымитировать для замера выдачи соединения')
+        parser.add_argument('--database', action='append', dest='aliases',
+                            help='Алиас базы (можно несколько раз); по умолчанию все настроенные')
+
+    def handle(self, *args, **options):
+        aliases = options['aliases'] or list(connections.settings)
+        for alias in aliases:
+            if alias not in connections.settings:
+                raise CommandError(f'База "{alias}" не настроена в DATABASES')
+            self.check_alias(alias, options['checkouts'])
+
+    def check_alias(self, alias, checkouts):
+        connection = connections[alias]
+        settings_dict = connection.settings_dict
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{alias}: {settings_dict["HOST"]}:{settings_dict["PORT"]}/{settings_dict["NAME"]}'
+        ))
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT version(), current_database(), current_user, pg_is_in_recovery()')
+                version, database, user, in_recovery = cursor.fetchone()
+        except DatabaseError as e:
+            raise CommandError(
+                f'Не удалось подключиться к "{alias}": {e}\n'
+                'Проверьте, что PostgreSQL запущен, а DB_HOST/DB_PORT и POSTGRES_DB/POSTGRES_USER/'
+                'POSTGRES_PASSWORD в .env совпадают с сервером (docker compose up -d db)'
+            ) from e
+        self.stdout.write(f'  {version.split(",")[0]}')
+        self.stdout.write(f'  База: {database}, пользователь: {user}, {"реплика" if in_recovery else "основная"}')
+
+        mode = db_pool.mode(alias)
+        if mode == 'pool':
+            pool = settings_dict['OPTIONS']['pool']
+            self.stdout.write(
+                f'  Режим: пул psycopg (min {pool.get("min_size")}, max {pool.get("max_size")}, '
+                f'timeout {pool.get("timeout")} с, max_lifetime {pool.get("max_lifetime")} с)'
+            )
+        elif mode == 'persistent':
+            self.stdout.write(
+                f'  Режим: постоянные соединения (CONN_MAX_AGE {settings_dict["CONN_MAX_AGE"]} с, '
+                f'проверка перед использованием: {"да" if settings_dict["CONN_HEALTH_CHECKS"] else "нет"})'
+            )
+        else:
+            self.stdout.write('  Режим: новое соединение на каждый запрос (CONN_MAX_AGE 0)')
+
+        if checkouts > 0:
+            timings = self.simulate_requests(connection, checkouts)
+            self.stdout.write(
+                f'  Запрос с SELECT 1 ({len(timings)} раз): p50 {timings[len(timings) // 2]:.2f} мс, '
+                f'макс {timings[-1]:.2f} мс'
+            )
+
+        stats = db_pool.stats(alias)
+        self.stdout.write(
+            f'  Выдано соединений: {stats["checkouts"]}, новых подключений: {stats["connects"]}, '
+            f'ожиданий: {stats["waits"]} ({stats["wait_ms"]} мс)'
+        )
+        if mode == 'pool':
+            self.stdout.write(f'  В пуле: {stats["pool_size"]}, свободно: {stats["pool_available"]}')
+        ages = ', '.join(f'{age:.1f} с' for age in stats['connection_ages']) or 'нет'
+        self.stdout.write(f'  Открытые соединения процесса: {stats["open_connections"]} (возраст: {ages})')
+        self.report_server_side(connection)
+
+    def simulate_requests(self, connection, count):
+        """Times ``count`` request cycles, each running one query."""
+        timings = []
+        for _ in range(count):
+            started = time.perf_counter()
+            request_started.send(sender=self.__class__)
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            request_finished.send(sender=self.__class__)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        return timings
+
+    def report_server_side(self, connection):
+        """Connections of all application processes as the server sees them."""
+        application_name = connection.settings_dict['OPTIONS'].get('application_name')
+        if not application_name:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT state, count(*), EXTRACT(EPOCH FROM max(now() - backend_start))
+                FROM pg_stat_activity
+                WHERE application_name = %s AND datname = current_database()
+                GROUP BY state ORDER BY state
+                """,
+                [application_name]
+            )
+            rows = cursor.fetchall()
+            cursor.execute('SHOW max_connections')
+            max_connections = cursor.fetchone()[0]
+        total = sum(count for _, count, _ in rows)
+        self.stdout.write(f'  На сервере соединений "{application_name}": {total} из max_connections {max_connections}')
+        for state, count, oldest in rows:
+            self.stdout.write(f'    {state or "-"}: {count}, старейшее {oldest:.0f} с')
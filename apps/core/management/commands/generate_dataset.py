@@ -0,0 +1,74 @@
+from datetime import date
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core import dataset
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает через COPY синтетические данные: категории, товары, покупателей, гостевые '
+        'сессии и заказы с сезонностью (apps/core/dataset.py). С одним --seed данные одинаковы. '
+        f'Пароль покупателей - {dataset.PASSWORD}'
+    )
+
+    def add_arguments(self, parser):
+        defaults = dataset.DatasetSize()
+        parser.add_argument('--categories', type=int, default=defaults.categories,
+                            help='Количество категорий')
+        parser.add_argument('--products', type=int, default=defaults.products,
+                            help='Количество товаров')
+        parser.add_argument('--users', type=int, default=defaults.users,
+                            help='Количество зарегистрированных покупателей')
+        parser.add_argument('--guests', type=int, default=defaults.guests,
+                            help='Количество гостевых сессий')
+        parser.add_argument('--orders', type=int, default=defaults.orders,
+                            help='Количество заказов (например, 10000000)')
+        parser.add_argument('--days', type=int, default=defaults.days,
+                            help='За сколько дней создавать заказы')
+        parser.add_argument('--until', type=date.fromisoformat,
+                            help='Последний день заказов (ГГГГ-ММ-ДД), по умолчанию вчера')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Зерно генератора случайных чисел')
+        parser.add_argument('--truncate', action='store_true',
+                            help='Сначала удалить заказы, каталог, гостевые сессии и покупателей (кроме персонала)')
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive',
+                            help='Не спрашивать подтверждение для --truncate')
+        parser.add_argument('--skip-derived', action='store_true',
+                            help='Не пересчитывать сводки покупателей и ежедневные продажи')
+
+    def handle(self, *args, **options):
+        size = dataset.DatasetSize(
+            options['categories'], options['products'], options['users'],
+            options['guests'], options['orders'], options['days'],
+        )
+        if min(size.categories, size.products, size.days) < 1 or min(size.users, size.guests, size.orders) < 0:
+            raise CommandError('Нужны хотя бы одна категория, один товар и один день, остальное - не меньше 0')
+        if size.orders and not size.users and not size.guests:
+            # Заказы без покупателей и гостей допустимы, но обычно это опечатка
+            self.stdout.write(self.style.WARNING('Нет покупателей и гостей: все заказы будут анонимными'))
+
+        if options['truncate']:
+            if options['interactive']:
+                answer = input(
+                    f'Все заказы, товары и покупатели в базе {settings.DATABASES["default"]["NAME"]} '
+                    'будут удалены. Продолжить? (yes/no): '
+                )
+                if answer != 'yes':
+                    raise CommandError('Отменено')
+            dataset.truncate()
+            self.stdout.write('Таблицы очищены')
+
+        counts = dataset.generate(size, seed=options['seed'], until=options['until'], progress=self.progress)
+        for table, rows in counts.items():
+            self.stdout.write(f'{table}: {rows}')
+
+        if not options['skip_derived'] and size.orders:
+            call_command('rebuild_order_summaries', chunk_size=10000, stdout=self.stdout)
+            call_command('backfill_daily_sales', stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS('Данные загружены'))
+
+    def progress(self, loaded, total):
+        self.stdout.write(f'Заказов загружено: {loaded} из {total}')
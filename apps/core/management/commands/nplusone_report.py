@@ -0,0 +1,74 @@
+import json
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+def aggregate(lines):
+    """
+    Group N+1 records (JSON lines written by apps.core.nplusone) by site and query.
+
+    Returns [{site, shape, requests, queries, max, views}] ordered by the
+    number of repeated queries, worst first.
+    """
+    groups = {}
+    for line in lines:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        group = groups.setdefault((record['site'], record['shape']), {
+            'site': record['site'], 'shape': record['shape'],
+            'requests': 0, 'queries': 0, 'max': 0, 'views': defaultdict(int),
+        })
+        group['requests'] += 1
+        group['queries'] += record['count']
+        group['max'] = max(group['max'], record['count'])
+        group['views'][record['where']] += 1
+    result = sorted(groups.values(), key=lambda group: (-group['queries'], -group['requests']))
+    for group in result:
+        group['views'] = sorted(group['views'], key=lambda view: -group['views'][view])
+    return result
+
+
+class Command(BaseCommand):
+    help = (
+        'Сводка N+1 запросов, записанных в NPLUSONE_LOG (например, за прогон тестов '
+        'с NPLUSONE=log NPLUSONE_LOG=nplusone.jsonl): места с наибольшим числом повторов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', default=None,
+                            help='Файл JSON lines (по умолчанию NPLUSONE_LOG)')
+        parser.add_argument('--top', type=int, default=10,
+                            help='Сколько мест показать')
+        parser.add_argument('--json', action='store_true',
+                            help='Вывести результат в JSON (для CI)')
+
+    def handle(self, *args, **options):
+        path = options['file'] or settings.NPLUSONE_LOG
+        if not path:
+            raise CommandError('Не указан файл: задайте --file или NPLUSONE_LOG')
+        try:
+            with open(path) as f:
+                groups = aggregate(f)
+        except FileNotFoundError:
+            raise CommandError(f'Файл {path} не найден: N+1 не записывались')
+
+        top = groups[:options['top']]
+        if options['json']:
+            self.stdout.write(json.dumps(top, ensure_ascii=False, indent=2))
+            return
+        if not groups:
+            self.stdout.write(self.style.SUCCESS('N+1 запросов не найдено'))
+            return
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'N+1: {len(groups)} мест, {sum(group["requests"] for group in groups)} запросов с повторами'
+        ))
+        for group in top:
+            self.stdout.write(self.style.WARNING(
+                f'{group["site"]}: {group["queries"]} SQL-запросов за {group["requests"]} HTTP-запросов '
+                f'(до {group["max"]} за один)'
+            ))
+            self.stdout.write(f'    {group["shape"][:300]}')
+            self.stdout.write(f'    представления: {", ".join(group["views"][:5])}')
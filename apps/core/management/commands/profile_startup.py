@@ -0,0 +1,126 @@
+import json
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# Что замеряем: проверка проекта и загрузка WSGI-приложения (холодный старт воркера)
+TARGETS = {
+    'check': [str(settings.BASE_DIR / 'manage.py'), 'check'],
+    'wsgi': ['-c', 'from coffee_shop.wsgi import application'],
+}
+
+IMPORTTIME_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def parse_importtime(stderr):
+    """
+    Parse ``-X importtime`` output into (total us, entries, packages).
+
+    entries are [(cumulative us, module, importer)] for every point where
+    one package imports another (e.g. reportlab.platypus imported by
+    apps.orders.pdf_utils), most expensive first; packages is
+    {top-level package: self us of all its modules}.
+    """
+    lines = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            lines.append((len(indent), int(self_us), int(cumulative_us), module))
+
+    total, entries, packages, stack = 0, [], defaultdict(int), []
+    # Модуль печатается после своих зависимостей: идём с конца, и родитель встречается раньше детей
+    for depth, self_us, cumulative_us, module in reversed(lines):
+        while stack and stack[-1][0] >= depth:
+            stack.pop()
+        importer = stack[-1][1] if stack else None
+        stack.append((depth, module))
+        packages[module.split('.')[0]] += self_us
+        if importer is None:
+            total += cumulative_us
+        if importer is None or importer.split('.')[0] != module.split('.')[0]:
+            entries.append((cumulative_us, module, importer))
+    entries.sort(key=lambda entry: -entry[0])
+    return total, entries, dict(packages)
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет холодный старт: время "manage.py check" и загрузки WSGI-приложения '
+        'в отдельных процессах, и показывает самые дорогие импорты (python -X importtime). '
+        'Завершается с ошибкой, если время превышает бюджет STARTUP_BUDGET_MS'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('targets', nargs='*',
+                            help='Что замерять: check, wsgi (по умолчанию оба)')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Сколько запусков замерять (берется медиана)')
+        parser.add_argument('--top', type=int, default=15,
+                            help='Сколько самых дорогих импортов показать')
+        parser.add_argument('--json', action='store_true',
+                            help='Вывести результат в JSON (для CI)')
+
+    def run_target(self, target, importtime=False):
+        command = [sys.executable, *(['-X', 'importtime'] if importtime else []), *TARGETS[target]]
+        started = time.perf_counter()
+        result = subprocess.run(command, cwd=settings.BASE_DIR, capture_output=True, text=True)
+        elapsed = (time.perf_counter() - started) * 1000
+        if result.returncode:
+            raise CommandError(f'{" ".join(command)} завершился с ошибкой:\n{result.stderr[-2000:]}')
+        return elapsed, result.stderr
+
+    def handle(self, *args, **options):
+        unknown = set(options['targets']) - set(TARGETS)
+        if unknown:
+            raise CommandError(f'Неизвестные цели: {", ".join(sorted(unknown))}; доступны: {", ".join(TARGETS)}')
+        report = {}
+        for target in options['targets'] or TARGETS:
+            self.run_target(target)  # прогрев файлового кэша и .pyc
+            timings = [self.run_target(target)[0] for _ in range(max(1, options['repeat']))]
+            total, entries, packages = parse_importtime(self.run_target(target, importtime=True)[1])
+            report[target] = {
+                'median_ms': round(statistics.median(timings)),
+                'budget_ms': settings.STARTUP_BUDGET_MS.get(target),
+                'imports_ms': round(total / 1000),
+                'top_imports': [
+                    [module, importer, round(us / 1000, 1)] for us, module, importer in entries[:options['top']]
+                ],
+                'top_packages': [
+                    [package, round(us / 1000, 1)]
+                    for package, us in sorted(packages.items(), key=lambda item: -item[1])[:options['top']]
+                ],
+            }
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+        else:
+            for target, result in report.items():
+                self.print_target(target, result)
+
+        over = [
+            f'{target}: {result["median_ms"]} мс > {result["budget_ms"]} мс'
+            for target, result in report.items()
+            if result['budget_ms'] is not None and result['median_ms'] > result['budget_ms']
+        ]
+        if over:
+            raise CommandError('Превышен бюджет холодного старта: ' + '; '.join(over))
+
+    def print_target(self, target, result):
+        budget = f', бюджет {result["budget_ms"]} мс' if result['budget_ms'] is not None else ''
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{target}: {result["median_ms"]} мс (медиана{budget}), импорты {result["imports_ms"]} мс'
+        ))
+        self.stdout.write('  Импорты пакетов (с зависимостями):')
+        for module, importer, ms in result['top_imports']:
+            self.stdout.write(f'    {ms:>8.1f} мс  {module}' + (f' <- {importer}' if importer else ''))
+        self.stdout.write('  Пакеты (собственное время модулей):')
+        for package, ms in result['top_packages']:
+            self.stdout.write(f'    {ms:>8.1f} мс  {package}')
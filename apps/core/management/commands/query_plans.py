@@ -0,0 +1,81 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from django.utils import timezone
+
+from apps.core import query_plans
+
+
+class Command(BaseCommand):
+    help = (
+        'Снимает планы (EXPLAIN) запросов основных страниц на текущей базе и сравнивает их с '
+        'сохраненными: завершается с ошибкой, если узлы плана изменились или стоимость выросла '
+        'больше порога. Базовые планы снимаются на данных generate_dataset'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*',
+                            help=f'Запросы (по умолчанию все): {", ".join(query_plans.QUERIES)}')
+        parser.add_argument('--baseline', default=settings.QUERY_PLANS_BASELINE,
+                            help='Файл с базовыми планами')
+        parser.add_argument('--threshold', type=float, default=query_plans.COST_THRESHOLD,
+                            help='Во сколько раз может вырасти стоимость плана')
+        parser.add_argument('--update-baseline', action='store_true',
+                            help='Сохранить текущие планы как базовые')
+        parser.add_argument('--json', action='store_true',
+                            help='Вывести изменения в JSON (для CI)')
+
+    def handle(self, *args, **options):
+        unknown = set(options['names']) - set(query_plans.QUERIES)
+        if unknown:
+            raise CommandError(f'Нет такого запроса: {", ".join(sorted(unknown))}')
+        names = options['names'] or list(query_plans.QUERIES)
+
+        # Поиск N+1 добавил бы свои запросы к замеряемым
+        with override_settings(NPLUSONE='off'):
+            try:
+                data = query_plans.sample()
+                current = {name: query_plans.capture(name, data) for name in names}
+            except query_plans.QueryPlanError as e:
+                raise CommandError(str(e))
+
+        if options['update_baseline']:
+            query_plans.save(
+                options['baseline'], current, date=timezone.now().isoformat(timespec='seconds'),
+                database=settings.DATABASES['default']['NAME'],
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f'Сохранено планов: {sum(map(len, current.values()))} в {options["baseline"]}'
+            ))
+            return
+
+        baseline = query_plans.load(options['baseline'])
+        if not baseline:
+            raise CommandError(f'Нет базовых планов в {options["baseline"]}: запустите с --update-baseline')
+        changes = query_plans.diff(current, {name: baseline.get(name, {}) for name in names}, options['threshold'])
+
+        if options['json']:
+            self.stdout.write(json.dumps([
+                dict(change._asdict(), regression=query_plans.is_regression(change)) for change in changes
+            ], ensure_ascii=False, indent=2))
+        else:
+            self.print_plans(current, baseline, changes)
+
+        regressions = [change for change in changes if query_plans.is_regression(change)]
+        if regressions:
+            raise CommandError(f'Планы ухудшились: {", ".join(sorted({change.query for change in regressions}))}')
+
+    def print_plans(self, current, baseline, changes):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'{"запрос":<28}{"SQL":>6}{"стоимость":>14}{"базовая":>14}'))
+        for name, plans in current.items():
+            cost = sum(plan.cost for plan in plans.values())
+            base = sum(plan.cost for plan in baseline.get(name, {}).values())
+            self.stdout.write(f'{name:<28}{len(plans):>6}{cost:>14.0f}{base:>14.0f}')
+        for change in changes:
+            style = self.style.ERROR if query_plans.is_regression(change) else self.style.WARNING
+            self.stdout.write(style(f'{change.query}: {change.kind}: {change.detail}'))
+            self.stdout.write(f'    {change.fingerprint[:300]}')
+        if not changes:
+            self.stdout.write(self.style.SUCCESS('Планы не изменились'))
@@ -0,0 +1,90 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client, override_settings
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+
+from apps.core import budgets
+
+
+class Rollback(Exception):
+    """Откат тестовых данных после замеров."""
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет число SQL-запросов и время ответа основных страниц на тестовых данных '
+        '(apps/core/budgets.py) во временной тестовой базе и показывает их рядом с бюджетами. '
+        'Завершается с ошибкой, если страница превышает бюджет'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url_names', nargs='*',
+                            help='Имена URL (по умолчанию все из BUDGETS)')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Сколько запросов замерять (берется медиана времени)')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='Не пересоздавать тестовую базу между запусками')
+        parser.add_argument('--json', action='store_true',
+                            help='Вывести результат в JSON (для CI)')
+
+    def handle(self, *args, **options):
+        unknown = set(options['url_names']) - set(budgets.BUDGETS)
+        if unknown:
+            raise CommandError(f'Нет бюджета для: {", ".join(sorted(unknown))}')
+
+        # Как в тестах: DEBUG выключен, поэтому нет debug toolbar и его запросов
+        setup_test_environment(debug=False)
+        databases = setup_databases(verbosity=0, interactive=False, keepdb=options['keepdb'], aliases={'default'})
+        try:
+            # Реплика не видит незакоммиченных тестовых данных; поиск N+1 замедляет запросы;
+            # бюджеты - для рендеринга страниц, а не для ответов из кэша страниц
+            with override_settings(REPLICA_ALIAS=None, NPLUSONE='off', PAGE_CACHE_ENABLED=False):
+                measurements = self.measure(options['url_names'] or budgets.BUDGETS, options['repeat'])
+        finally:
+            teardown_databases(databases, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        if options['json']:
+            self.stdout.write(json.dumps({
+                measurement.url_name: {
+                    'status': measurement.status,
+                    'queries': measurement.queries,
+                    'queries_budget': measurement.budget.queries,
+                    'ms': round(measurement.ms, 1),
+                    'ms_budget': measurement.budget.ms,
+                    'over': budgets.over_budget(measurement),
+                }
+                for measurement in measurements
+            }, ensure_ascii=False, indent=2))
+        else:
+            self.print_table(measurements)
+
+        over = [m.url_name for m in measurements if budgets.over_budget(m)]
+        if over:
+            raise CommandError(f'Превышен бюджет: {", ".join(over)}')
+
+    def measure(self, url_names, repeat):
+        measurements = []
+        try:
+            with transaction.atomic():
+                data = budgets.seed()
+                client = Client()
+                measurements = [budgets.measure(client, url_name, data, repeat) for url_name in url_names]
+                raise Rollback
+        except Rollback:
+            pass
+        return measurements
+
+    def print_table(self, measurements):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{"URL":<36}{"запросы":>10}{"бюджет":>8}{"мс":>10}{"бюджет":>8}'
+        ))
+        for measurement in measurements:
+            line = (
+                f'{measurement.url_name:<36}{measurement.queries:>10}{measurement.budget.queries:>8}'
+                f'{measurement.ms:>10.1f}{measurement.budget.ms:>8}'
+            )
+            problems = budgets.over_budget(measurement)
+            self.stdout.write(self.style.ERROR(f'{line}  {"; ".join(problems)}') if problems else line)
@@ -0,0 +1,193 @@
+"""
+Per-view request metrics in the Prometheus text format.
+
+MetricsMiddleware records for every request, labelled by URL name
+(resolver_match.view_name, "<unresolved>" for 404s outside the URLconf):
+
+- django_http_request_duration_seconds: latency histogram (view, method, status);
+- SQL query count and time, top-level template render time, cache hits and
+  misses (counters, see apps/core/instrumentation.py).
+
+Values are kept in plain per-process dicts behind one lock, a few
+microseconds per request. With several worker processes (gunicorn) set
+METRICS_DIR: each process then writes a snapshot of its counters to
+METRICS_DIR/<pid>.json at most every METRICS_FLUSH_SECONDS and on exit,
+and the /metrics view sums the files of all processes. Empty the
+directory on deploy, as with prometheus_client's multiprocess mode.
+"""
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import db_pool, instrumentation
+
+
+# Границы корзин гистограммы задержки, секунды
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_DURATION = 'django_http_request_duration_seconds'
+
+# Счётчик -> (метка, описание)
+COUNTERS = {
+    'django_db_queries_total': ('view', 'SQL queries executed while handling requests'),
+    'django_db_query_seconds_total': ('view', 'Time spent in SQL queries'),
+    'django_template_render_seconds_total': ('view', 'Time spent rendering top-level templates'),
+    'django_cache_hits_total': ('view', 'Cache lookups that found a value'),
+    'django_cache_misses_total': ('view', 'Cache lookups that found nothing'),
+    'django_db_connection_checkouts_total': ('database', 'Database connections handed to requests'),
+    'django_db_connections_opened_total': ('database', 'Physical database connections opened'),
+}
+
+UNRESOLVED = '<unresolved>'
+# Прочие методы пишем как "other", чтобы клиенты не плодили ряды метрик
+METHODS = frozenset(('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'))
+
+_lock = threading.Lock()
+# (view, method, status) -> [запросов в каждой корзине..., в +Inf, сумма секунд]
+_latency = {}
+# (счётчик, значение метки) -> число
+_counters = {}
+_last_flush = 0.0
+
+
+def observe(view, method, status, duration, stats):
+    """Record one request."""
+    with _lock:
+        key = (view, method, status)
+        values = _latency.get(key)
+        if values is None:
+            values = _latency[key] = [0] * (len(BUCKETS) + 2)
+        values[bisect_left(BUCKETS, duration)] += 1
+        values[-1] += duration
+        for name, value in (
+            ('django_db_queries_total', stats.queries),
+            ('django_db_query_seconds_total', stats.db_time),
+            ('django_template_render_seconds_total', stats.template_time),
+            ('django_cache_hits_total', stats.cache_hits),
+            ('django_cache_misses_total', stats.cache_misses),
+        ):
+            if value:
+                _counters[name, view] = _counters.get((name, view), 0) + value
+
+
+def snapshot():
+    """JSON-ready copy of this process's metrics."""
+    from django.db import connections
+
+    with _lock:
+        result = {
+            'latency': [[*key, values] for key, values in _latency.items()],
+            'counters': [[*key, value] for key, value in _counters.items()],
+        }
+    for alias in connections.settings:
+        stats = db_pool.stats(alias)
+        result['counters'].append(['django_db_connection_checkouts_total', alias, stats['checkouts']])
+        result['counters'].append(['django_db_connections_opened_total', alias, stats['connects']])
+    return result
+
+
+def flush():
+    """Write this process's snapshot to METRICS_DIR (multiprocess mode)."""
+    global _last_flush
+    directory = settings.METRICS_DIR
+    if not directory:
+        return
+    _last_flush = time.monotonic()
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(snapshot(), f)
+    os.replace(tmp_path, os.path.join(directory, f'{os.getpid()}.json'))
+
+
+def collect():
+    """Metrics of all processes (or of this one without METRICS_DIR), summed."""
+    if not settings.METRICS_DIR:
+        snapshots = [snapshot()]
+    else:
+        flush()
+        snapshots = []
+        for name in os.listdir(settings.METRICS_DIR):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(settings.METRICS_DIR, name)) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                # Файл процесса, который только что завершился или перезаписывается
+                continue
+
+    latency, counters = {}, {}
+    for data in snapshots:
+        for view, method, status, values in data['latency']:
+            merged = latency.setdefault((view, method, status), [0] * len(values))
+            for i, value in enumerate(values):
+                merged[i] += value
+        for name, label, value in data['counters']:
+            counters[name, label] = counters.get((name, label), 0) + value
+    return latency, counters
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render():
+    """Prometheus text exposition of collect()."""
+    latency, counters = collect()
+    lines = [
+        f'# HELP {REQUEST_DURATION} Request latency by URL name',
+        f'# TYPE {REQUEST_DURATION} histogram',
+    ]
+    for (view, method, status), values in sorted(latency.items()):
+        labels = f'view="{_label(view)}",method="{_label(method)}",status="{status}"'
+        cumulative = 0
+        for bound, count in zip((*BUCKETS, '+Inf'), values):
+            cumulative += count
+            lines.append(f'{REQUEST_DURATION}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{REQUEST_DURATION}_sum{{{labels}}} {values[-1]:.6f}')
+        lines.append(f'{REQUEST_DURATION}_count{{{labels}}} {cumulative}')
+    for name, (label_name, help_text) in COUNTERS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} counter')
+        for (counter, label), value in sorted(counters.items()):
+            if counter == name:
+                lines.append(f'{name}{{{label_name}="{_label(label)}"}} {value:g}')
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    """Forget this process's metrics (used by tests)."""
+    with _lock:
+        _latency.clear()
+        _counters.clear()
+
+
+class MetricsMiddleware:
+    """Times every request and records its metrics (see module docstring)."""
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if settings.METRICS_DIR:
+            atexit.register(flush)
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        with instrumentation.track() as stats:
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+        match = request.resolver_match
+        method = request.method if request.method in METHODS else 'other'
+        observe(match.view_name if match else UNRESOLVED, method, response.status_code, duration, stats)
+        if settings.METRICS_DIR and time.monotonic() - _last_flush >= settings.METRICS_FLUSH_SECONDS:
+            flush()
+        return response
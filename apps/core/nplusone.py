@@ -0,0 +1,173 @@
+"""
+Detection of N+1 queries: the same query shape repeated from one place
+within a request.
+
+Every SQL statement is fingerprinted by its normalized shape (literals,
+numbers and IN lists replaced by "?") and by where it was issued: the
+innermost template node being rendered ("orders/order_detail.html:42")
+or else the innermost project source line ("apps/shop_cart/cart.py:26").
+A (shape, site) pair seen NPLUSONE_THRESHOLD or more times in one request
+is reported:
+
+- logged as a warning (logger "apps.core.nplusone") with the site and SQL;
+- appended to NPLUSONE_LOG (JSON lines) if set, for the nplusone_report
+  command that ranks the worst offenders across a test run;
+- raised as NPlusOneError when NPLUSONE = "raise" (useful in tests).
+
+NPLUSONE_ALLOW lists fnmatch patterns of sites or SQL to ignore. The
+detector walks the stack for each query, so it is meant for development,
+staging and tests: NPLUSONE = "off" (default unless DEBUG), "log" or
+"raise". In tests detect() checks a block of code directly.
+"""
+import fnmatch
+import json
+import logging
+import os
+import re
+import sys
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.base import Node
+
+logger = logging.getLogger(__name__)
+
+MODES = ('off', 'log', 'raise')
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)')
+_SPACES = re.compile(r'\s+')
+
+# Обертки запросов и рендеринга, которые не бывают источником N+1
+_HOOK_FILES = {
+    os.path.abspath(__file__),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instrumentation.py'),
+}
+
+
+class NPlusOneError(AssertionError):
+    """A query repeated from one site within a request."""
+
+
+def fingerprint(sql):
+    """Normalized shape of ``sql``: the same for every N+1 iteration."""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _PLACEHOLDER_LIST.sub('(?)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+def _project_file(filename):
+    filename = os.path.abspath(filename)
+    base = str(settings.BASE_DIR)
+    return (
+        filename.startswith(base + os.sep)
+        and filename not in _HOOK_FILES
+        and 'site-packages' not in filename
+    )
+
+
+def call_site():
+    """Template node or project source line that issued the current query."""
+    frame = sys._getframe(2)
+    source = None
+    while frame is not None:
+        node = frame.f_locals.get('self')
+        # Запрос из шаблона: ближайший узел шаблона важнее строки Python-кода под ним
+        # type(), а не isinstance(): isinstance вычисляет ленивые объекты (request.user) прямо здесь
+        if issubclass(type(node), Node) and getattr(node, 'origin', None) is not None and node.token is not None:
+            return f'{node.origin.template_name or node.origin.name}:{node.token.lineno}'
+        if source is None and _project_file(frame.f_code.co_filename):
+            source = f'{os.path.relpath(frame.f_code.co_filename, settings.BASE_DIR)}:{frame.f_lineno}'
+        frame = frame.f_back
+    return source or '<unknown>'
+
+
+class QueryLog:
+    """Queries of one request or detect() block, grouped by (shape, site)."""
+
+    def __init__(self):
+        self.counts = Counter()
+        self.samples = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        key = (fingerprint(sql), call_site())
+        self.counts[key] += 1
+        self.samples.setdefault(key, sql)
+        return execute(sql, params, many, context)
+
+    def repeated(self, threshold=None):
+        """[(count, shape, site, sample sql)] above the threshold, allow-list applied, worst first."""
+        threshold = threshold or settings.NPLUSONE_THRESHOLD
+        found = [
+            (count, shape, site, self.samples[shape, site])
+            for (shape, site), count in self.counts.items()
+            if count >= threshold and not _allowed(shape, site)
+        ]
+        found.sort(key=lambda item: -item[0])
+        return found
+
+
+def _allowed(shape, site):
+    return any(
+        fnmatch.fnmatchcase(site, pattern) or fnmatch.fnmatchcase(shape, pattern)
+        for pattern in settings.NPLUSONE_ALLOW
+    )
+
+
+@contextmanager
+def capture():
+    """Log every query run in the block on every configured database."""
+    log = QueryLog()
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(log))
+        yield log
+
+
+def report(log, where, raise_errors=False):
+    """Log (and record, and optionally raise) the repeated queries of ``log``."""
+    found = log.repeated()
+    if not found:
+        return found
+    for count, shape, site, sql in found:
+        logger.warning('N+1 in %s: %d x at %s: %s', where, count, site, sql)
+    if settings.NPLUSONE_LOG:
+        with open(settings.NPLUSONE_LOG, 'a') as f:
+            for count, shape, site, sql in found:
+                f.write(json.dumps({'where': where, 'count': count, 'site': site, 'shape': shape}) + '\n')
+    if raise_errors:
+        count, shape, site, sql = found[0]
+        raise NPlusOneError(f'{where}: query repeated {count} times at {site}: {sql}')
+    return found
+
+
+@contextmanager
+def detect(where='block', raise_errors=True):
+    """Check a block of code for N+1 queries (for tests)."""
+    with capture() as log:
+        yield log
+    report(log, where, raise_errors=raise_errors)
+
+
+class NPlusOneMiddleware:
+    """Reports N+1 queries of each request (see module docstring)."""
+
+    def __init__(self, get_response):
+        if settings.NPLUSONE not in MODES:
+            raise ValueError(f'NPLUSONE must be one of {MODES}, not {settings.NPLUSONE!r}')
+        if settings.NPLUSONE == 'off':
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with capture() as log:
+            response = self.get_response(request)
+        match = request.resolver_match
+        where = match.view_name if match else request.path
+        report(log, where, raise_errors=settings.NPLUSONE == 'raise')
+        return response
@@ -0,0 +1,194 @@
+"""
+Full-page cache of anonymous catalog pages.
+
+@page_cache wraps a view (see apps/products/urls.py). GET and HEAD requests
+of anonymous users are served from the PAGE_CACHE_ALIAS cache, keyed by
+the path, the normalized query string (sorted, without empty values and
+utm_* and other tracking parameters) and the active language set by
+LocaleMiddleware:
+
+- every key contains the catalog version; saving or deleting a product or
+  a category bumps it (apps/products/receivers.py), so stale pages are
+  never read again and simply expire;
+- an entry is fresh for PAGE_CACHE_TIMEOUT seconds and kept
+  PAGE_CACHE_GRACE seconds longer. Expiry is probabilistic (XFetch): a
+  request recomputes the page early with a probability that grows towards
+  expiry and with the time the page took to render, so hot keys do not
+  all expire at one moment;
+- rebuilds are single-flight: only the request that takes the key's lock
+  (cache.add) renders. The others get the stale page while there is one,
+  or wait for the new one on a cold key, so a cold key under load is
+  rendered exactly once.
+
+A cached page must be the same for every visitor. While it is rendered
+request.page_cache is set: base.html leaves the cart badge and messages
+empty and static/js/page_fragments.js fills them in, together with the
+CSRF token of the visitor, from the page_fragments view. The CSRF fields
+of the cached page hold CSRF_PLACEHOLDER (see csrf_placeholder()), never
+someone's real token.
+"""
+import hashlib
+import math
+import random
+import time
+from collections import namedtuple
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.translation import get_language
+
+VERSION_KEY = 'page:catalog-version'
+CSRF_PLACEHOLDER = 'page-cache'
+# Параметры рекламных ссылок не меняют страницу
+IGNORED_PARAMS = ('utm_', 'gclid', 'yclid', 'fbclid', '_openstat')
+# Как часто ждущий запрос проверяет, появилась ли страница
+WAIT_INTERVAL = 0.025
+
+Entry = namedtuple('Entry', 'content content_type delta expires')
+
+
+def cache():
+    return caches[settings.PAGE_CACHE_ALIAS]
+
+
+def catalog_version():
+    version = cache().get(VERSION_KEY)
+    if version is None:
+        cache().add(VERSION_KEY, time.time_ns(), None)
+        version = cache().get(VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    """Invalidate every cached page (called when the catalog changes)."""
+    # Время, а не счетчик: версия не повторится, даже если ключ был вытеснен
+    cache().set(VERSION_KEY, time.time_ns(), None)
+
+
+def normalize_query(query):
+    """Query string with sorted parameters, without empty and tracking ones."""
+    params = sorted(
+        (name, value) for name, values in query.lists() for value in values
+        if value and not name.startswith(IGNORED_PARAMS)
+    )
+    return urlencode(params)
+
+
+def cache_key(request, version=None):
+    url = f'{request.path}?{normalize_query(request.GET)}'
+    digest = hashlib.sha1(url.encode()).hexdigest()
+    if version is None:
+        version = catalog_version()
+    return f'page:{version}:{get_language()}:{digest}'
+
+
+def should_recompute(entry, now=None, beta=None):
+    """XFetch: whether to rebuild the entry now, possibly before it expires."""
+    now = time.time() if now is None else now
+    beta = settings.PAGE_CACHE_BETA if beta is None else beta
+    # log(random) < 0: чем дольше рендер (delta), тем раньше возможное обновление
+    return now - entry.delta * beta * math.log(1 - random.random()) >= entry.expires
+
+
+def is_cacheable(request):
+    return (
+        settings.PAGE_CACHE_ENABLED
+        and request.method in ('GET', 'HEAD')
+        and not request.user.is_authenticated
+    )
+
+
+def csrf_placeholder(request):
+    """Context processor: no real CSRF token in a page that goes to the cache."""
+    if getattr(request, 'page_cache', False):
+        return {'csrf_token': CSRF_PLACEHOLDER}
+    return {}
+
+
+def _render(view, request, args, kwargs):
+    request.page_cache = True
+    started = time.perf_counter()
+    response = view(request, *args, **kwargs)
+    if hasattr(response, 'render') and not getattr(response, 'is_rendered', True):
+        response.render()
+    return response, time.perf_counter() - started
+
+
+def _storable(response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.has_header('Set-Cookie')
+        and 'private' not in response.get('Cache-Control', '')
+        and 'no-store' not in response.get('Cache-Control', '')
+    )
+
+
+def _store(key, response, delta):
+    entry = Entry(response.content, response['Content-Type'], delta, time.time() + settings.PAGE_CACHE_TIMEOUT)
+    cache().set(key, entry, settings.PAGE_CACHE_TIMEOUT + settings.PAGE_CACHE_GRACE)
+
+
+def _respond(entry, status):
+    response = HttpResponse(entry.content, content_type=entry.content_type)
+    response['X-Page-Cache'] = status
+    return response
+
+
+def _wait(key):
+    """Entry rendered by the request holding the lock, or None if it gave up."""
+    deadline = time.monotonic() + settings.PAGE_CACHE_LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_INTERVAL)
+        entry = cache().get(key)
+        if entry is not None:
+            return entry
+        if cache().get(f'{key}:lock') is None:
+            return None
+    return None
+
+
+def _rebuild(view, request, args, kwargs, key, lock, seen):
+    try:
+        # Страницу могли пересобрать между чтением и блокировкой
+        current = cache().get(key)
+        if current is not None and (seen is None or current.expires > seen.expires):
+            return _respond(current, 'HIT')
+        response, delta = _render(view, request, args, kwargs)
+        if _storable(response):
+            _store(key, response, delta)
+    finally:
+        cache().delete(lock)
+    response['X-Page-Cache'] = 'MISS'
+    return response
+
+
+def page_cache(view):
+    """Serve anonymous GET requests of the view from the page cache (see module docstring)."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not is_cacheable(request):
+            return view(request, *args, **kwargs)
+        key = cache_key(request)
+        lock = f'{key}:lock'
+        entry = cache().get(key)
+        if entry is not None and not should_recompute(entry):
+            response = _respond(entry, 'HIT')
+        elif cache().add(lock, 1, settings.PAGE_CACHE_LOCK_TIMEOUT):
+            response = _rebuild(view, request, args, kwargs, key, lock, entry)
+        elif entry is not None:
+            # Страницу уже пересобирает другой запрос: отдаем прежнюю
+            response = _respond(entry, 'STALE')
+        else:
+            entry = _wait(key)
+            if entry is not None:
+                response = _respond(entry, 'HIT')
+            else:
+                # Запрос с блокировкой не справился: рендерим сами, не сохраняя
+                response, _ = _render(view, request, args, kwargs)
+                response['X-Page-Cache'] = 'MISS'
+        return response
+    return wrapper
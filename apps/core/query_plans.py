@@ -0,0 +1,263 @@
+"""
+Query plans of the hot code paths and their stored baselines.
+
+QUERIES names the code paths whose plans matter: the catalog and category
+listings, search, cart hydration, order history and both admin reports.
+Each entry calls the real view (or Cart) with a RequestFactory request on
+the current database; every SELECT it issues is explained with
+EXPLAIN (FORMAT JSON) and summarized as a Plan: the estimated total cost,
+rows and the set of plan nodes ("Index Scan on orders_order using
+order_user_created_idx"). Queries are keyed by their fingerprint, so a
+different date or user in the sample gives the same key.
+
+diff() compares plans with a baseline and reports node changes (an index
+scan turning into a sequential scan) and cost increases above a threshold.
+Plans depend on the data volume: baselines are taken on the dataset loaded
+by ``manage.py generate_dataset`` (see ``manage.py query_plans``). Monthly
+partitions are folded into their table, so the plans do not change every
+time a new month is created.
+"""
+import json
+import re
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.backends.signed_cookies import SessionStore
+from django.db import connection
+from django.db.models import Count
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.core.db_routing import use_primary
+from apps.core.nplusone import fingerprint
+from apps.orders import partitioning
+
+Plan = namedtuple('Plan', ('sql', 'cost', 'rows', 'nodes'))
+# kind: 'nodes' и 'cost' - регрессии, 'new' и 'missing' - изменения набора запросов
+Change = namedtuple('Change', ('query', 'fingerprint', 'kind', 'detail'))
+
+COST_THRESHOLD = 1.5
+CART_ITEMS = 5
+
+_PARTITION = re.compile(
+    r'^(%s)_(?:p\d{6}|history|default)' % '|'.join(sorted(partitioning.PARTITIONED_TABLES, key=len, reverse=True))
+)
+
+
+class QueryPlanError(Exception):
+    """A registry entry could not run (no data to sample, an error response)."""
+
+
+def _request(user=None, params=None, cart=()):
+    request = RequestFactory().get('/', params)
+    request.session = SessionStore()
+    request.user = user or AnonymousUser()
+    if cart:
+        request.session[settings.CART_SESSION_ID] = {
+            str(product.pk): {'quantity': 1, 'price': str(product.price)} for product in cart
+        }
+    return request
+
+
+def _render(response):
+    if response.status_code != 200:
+        raise QueryPlanError(f'response status {response.status_code}')
+    if hasattr(response, 'render'):
+        response.render()
+    return response
+
+
+def sample():
+    """Arguments of the registry entries, taken from the current database."""
+    from apps.orders.models import OrderSummary
+    from apps.products.models import Category, Product
+
+    category = Category.objects.annotate(product_count=Count('products')).order_by('-product_count', 'pk').first()
+    products = list(Product.objects.order_by('pk')[:CART_ITEMS])
+    summary = OrderSummary.objects.select_related('user').order_by('-order_count', 'user_id').first()
+    if category is None or not products or summary is None:
+        raise QueryPlanError('no data: load a dataset first (manage.py generate_dataset)')
+    # Персонал не обязан быть в базе: отчеты проверяют только is_staff
+    staff = get_user_model()(email='query-plans@example.com', username='query-plans', is_staff=True)
+    today = timezone.localdate()
+    return {
+        'category': category,
+        'products': products,
+        'term': products[0].name.split()[0].strip(','),
+        'customer': summary.user,
+        'staff': staff,
+        'date_from': (today - timedelta(days=30)).isoformat(),
+        'date_to': today.isoformat(),
+    }
+
+
+def product_list(data):
+    from apps.products.views import ProductListView
+    _render(ProductListView.as_view()(_request()))
+
+
+def product_list_by_category(data):
+    from apps.products.views import ProductListView
+    _render(ProductListView.as_view()(_request(), category_slug=data['category'].slug))
+
+
+def search(data):
+    from apps.products.views import ProductSearchView
+    _render(ProductSearchView.as_view()(_request(params={'q': data['term']})))
+
+
+def cart(data):
+    from apps.shop_cart.cart import Cart
+    list(Cart(_request(cart=data['products'])))
+
+
+def order_history(data):
+    from apps.orders.views import OrderListView
+    # Первая страница и следующая по курсору
+    response = _render(OrderListView.as_view()(_request(data['customer'])))
+    cursor = response.context_data['next_cursor']
+    if cursor:
+        _render(OrderListView.as_view()(_request(data['customer'], {'cursor': cursor})))
+
+
+def admin_order_report(data):
+    from apps.orders.views import admin_order_report
+    _render(admin_order_report(_request(data['staff'])))
+    _render(admin_order_report(_request(data['staff'], {
+        'date_from': data['date_from'], 'date_to': data['date_to'], 'page': 2,
+    })))
+
+
+def admin_sales_report(data):
+    from apps.orders.views import admin_sales_report
+    _render(admin_sales_report(_request(data['staff'])))
+    _render(admin_sales_report(_request(data['staff'], {
+        'date_from': data['date_from'], 'date_to': data['date_to'],
+    })))
+
+
+QUERIES = {
+    'product_list': product_list,
+    'product_list_by_category': product_list_by_category,
+    'search': search,
+    'cart': cart,
+    'order_history': order_history,
+    'admin_order_report': admin_order_report,
+    'admin_sales_report': admin_sales_report,
+}
+
+
+def _table(name):
+    return _PARTITION.sub(r'\1', name)
+
+
+def _index(name):
+    # Индексы секции history переименованы в <имя>_history (см. partitioning)
+    return _table(name).removesuffix('_history')
+
+
+def summarize(sql, plan):
+    """Plan of ``sql`` from the output of EXPLAIN (FORMAT JSON)."""
+    nodes = set()
+
+    def walk(node):
+        label = node['Node Type']
+        if 'Relation Name' in node:
+            label += f' on {_table(node["Relation Name"])}'
+        if 'Index Name' in node:
+            label += f' using {_index(node["Index Name"])}'
+        nodes.add(label)
+        for child in node.get('Plans', ()):
+            walk(child)
+
+    root = plan[0]['Plan']
+    walk(root)
+    return Plan(sql, root['Total Cost'], root['Plan Rows'], sorted(nodes))
+
+
+def explain(sql):
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return summarize(sql, plan)
+
+
+def capture(name, data):
+    """{fingerprint: Plan} of the SELECTs run by registry entry ``name``."""
+    with use_primary(), CaptureQueriesContext(connection) as captured:
+        QUERIES[name](data)
+    plans = {}
+    for query in captured:
+        sql = query['sql']
+        if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+            continue
+        key = fingerprint(sql)
+        if key not in plans:
+            plans[key] = explain(sql)
+    return plans
+
+
+def diff(current, baseline, threshold=COST_THRESHOLD):
+    """
+    Changes between ``current`` and ``baseline`` plans
+    ({query name: {fingerprint: Plan}}), regressions first.
+    """
+    changes = []
+    for name, plans in current.items():
+        base_plans = baseline.get(name, {})
+        for key, plan in plans.items():
+            base = base_plans.get(key)
+            if base is None:
+                changes.append(Change(name, key, 'new', f'cost {plan.cost:.0f}'))
+                continue
+            added = sorted(set(plan.nodes) - set(base.nodes))
+            removed = sorted(set(base.nodes) - set(plan.nodes))
+            if added or removed:
+                changes.append(Change(name, key, 'nodes', '; '.join(
+                    [f'+ {node}' for node in added] + [f'- {node}' for node in removed]
+                )))
+            if base.cost and plan.cost > base.cost * threshold:
+                changes.append(Change(
+                    name, key, 'cost', f'cost {base.cost:.0f} -> {plan.cost:.0f} (x{plan.cost / base.cost:.1f})'
+                ))
+        for key in base_plans.keys() - plans.keys():
+            changes.append(Change(name, key, 'missing', 'not run any more'))
+    return sorted(changes, key=lambda change: not is_regression(change))
+
+
+def is_regression(change):
+    return change.kind in ('nodes', 'cost')
+
+
+def load(path):
+    """Baseline plans stored by save(), {} if there is no file."""
+    try:
+        with open(path) as f:
+            stored = json.load(f)
+    except FileNotFoundError:
+        return {}
+    return {
+        name: {key: Plan(**plan) for key, plan in plans.items()}
+        for name, plans in stored['plans'].items()
+    }
+
+
+def save(path, plans, **meta):
+    """Store ``plans`` as the baseline in ``path``, merging with the plans already there."""
+    merged = load(path)
+    merged.update(plans)
+    with open(path, 'w') as f:
+        json.dump({
+            **meta,
+            'plans': {
+                name: {key: plan._asdict() for key, plan in sorted(entries.items())}
+                for name, entries in sorted(merged.items())
+            },
+        }, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write('\n')
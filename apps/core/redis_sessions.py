@@ -0,0 +1,315 @@
+"""
+Session engine keeping every session in a Redis hash.
+
+SESSION_ENGINE = 'apps.core.redis_sessions' replaces the django_session
+table, which is read on every authenticated request and rewritten on every
+cart change:
+
+- a session is one hash, SESSION_REDIS_PREFIX + session key, with one
+  field per top-level session key, so the cart, messages and auth data
+  are written independently of each other;
+- save() writes only the fields whose serialized value differs from what
+  was loaded (HSET) and removes the deleted ones (HDEL). When nothing
+  changed, even if a view set session.modified (the cart does it on every
+  add, with or without a change), it only refreshes the TTL (EXPIRE);
+- values of SESSION_REDIS_COMPRESS_MIN bytes and more are zlib-compressed;
+- like the database backend, the hash is read only when the session is
+  first accessed, with one HGETALL; a request that never touches the
+  session never reaches Redis;
+- expiry is the TTL of the key, so clearsessions has nothing to do.
+
+SESSION_REDIS_URL = 'local://' selects LocalRedis, an in-process stand-in
+with the same commands, for tests and for development without Redis.
+"""
+import logging
+import threading
+import time
+import zlib
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.sessions.backends.base import CreateError, SessionBase
+
+logger = logging.getLogger(__name__)
+
+# Служебное поле: хеш без полей в Redis не существует, а пустая сессия должна
+MARKER = b'__session__'
+COMPRESSED = b'Z:'  # JSON не может начинаться с "Z"
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(url=None):
+    """Redis client (one per URL and process) for SESSION_REDIS_URL or ``url``."""
+    url = url or settings.SESSION_REDIS_URL
+    client = _clients.get(url)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(url)
+            if client is None:
+                if url.startswith('local://'):
+                    client = LocalRedis()
+                else:
+                    import redis
+                    client = redis.Redis.from_url(url)
+                _clients[url] = client
+    return client
+
+
+def pack(data):
+    """Serialized value as stored in Redis: compressed when it is large and it pays off."""
+    if len(data) >= settings.SESSION_REDIS_COMPRESS_MIN:
+        compressed = zlib.compress(data)
+        if len(compressed) + len(COMPRESSED) < len(data):
+            return COMPRESSED + compressed
+    return data
+
+
+def unpack(raw):
+    if raw.startswith(COMPRESSED):
+        return zlib.decompress(raw[len(COMPRESSED):])
+    return raw
+
+
+class SessionStore(SessionBase):
+    """Session in a Redis hash; see the module docstring."""
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        # Поле -> сериализованное значение в том виде, в каком оно сейчас в Redis
+        self._stored = {}
+
+    @property
+    def client(self):
+        return get_client()
+
+    def redis_key(self, session_key):
+        return settings.SESSION_REDIS_PREFIX + session_key
+
+    def dumps(self, value):
+        return self.serializer().dumps(value)
+
+    def load(self):
+        if not self._session_key:
+            return {}
+        raw = self.client.hgetall(self.redis_key(self._session_key))
+        if not raw.pop(MARKER, None):
+            # Сессия истекла, удалена или ключ подобран: начинаем новую
+            self._session_key = None
+            self._stored = {}
+            return {}
+        session = {}
+        self._stored = {}
+        for field, value in raw.items():
+            field = field.decode()
+            try:
+                data = unpack(value)
+                session[field] = self.serializer().loads(data)
+            except (ValueError, zlib.error):
+                logger.warning('Session %s: corrupted field %s dropped', self._session_key[:8], field)
+                # Пустое значение не совпадет ни с каким: при сохранении поле удалится
+                data = b''
+            self._stored[field] = data
+        return session
+
+    def exists(self, session_key):
+        return bool(self.client.exists(self.redis_key(session_key)))
+
+    def create(self):
+        while True:
+            self._session_key = self._get_new_session_key()
+            try:
+                self.save(must_create=True)
+            except CreateError:
+                continue
+            self.modified = True
+            return
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        key = self.redis_key(self._session_key)
+        if must_create:
+            if not self.client.hsetnx(key, MARKER, b'1'):
+                raise CreateError
+            self._stored = {}
+        data = self._get_session(no_load=must_create)
+        changed = {}
+        for field, value in data.items():
+            dumped = self.dumps(value)
+            if self._stored.get(field) != dumped:
+                changed[field] = dumped
+        removed = [field for field in self._stored if field not in data]
+        age = self.get_expiry_age()
+        if not changed and not removed and not must_create:
+            # Срок сессии продлевается при каждом save(), как в базе; если ключ уже
+            # истек, EXPIRE вернет 0 и сессия будет записана заново целиком
+            if self.client.expire(key, age):
+                return
+
+        pipeline = self.client.pipeline()
+        pipeline.hsetnx(key, MARKER, b'1')
+        if changed:
+            pipeline.hset(key, mapping={field: pack(dumped) for field, dumped in changed.items()})
+        if removed:
+            pipeline.hdel(key, *removed)
+        pipeline.expire(key, age)
+        recreated = pipeline.execute()[0] and not must_create
+        if recreated:
+            # Ключ истек или удален после загрузки: неизмененные поля тоже нужно записать
+            unchanged = {field: self.dumps(value) for field, value in data.items() if field not in changed}
+            if unchanged:
+                self.client.hset(key, mapping={field: pack(dumped) for field, dumped in unchanged.items()})
+                changed.update(unchanged)
+        for field in removed:
+            del self._stored[field]
+        self._stored.update(changed)
+
+    def delete(self, session_key=None):
+        if session_key is None:
+            if self.session_key is None:
+                return
+            session_key = self.session_key
+        self.client.delete(self.redis_key(session_key))
+
+    @classmethod
+    def clear_expired(cls):
+        # Redis удаляет истекшие сессии сам (TTL ключа)
+        pass
+
+
+class LocalRedis:
+    """
+    In-process stand-in for the Redis commands used by SessionStore.
+
+    Keys expire like in Redis. ``calls`` counts the commands executed (a
+    pipeline counts each of its commands), for tests and benchmarks.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._expires = {}
+        self._lock = threading.RLock()
+        self.calls = Counter()
+
+    def _hash(self, key, create=False):
+        expires = self._expires.get(key)
+        if expires is not None and expires <= time.monotonic():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        if create:
+            return self._data.setdefault(key, {})
+        return self._data.get(key)
+
+    @staticmethod
+    def _bytes(value):
+        return value if isinstance(value, bytes) else str(value).encode()
+
+    def _drop_if_empty(self, key):
+        if not self._data.get(key):
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+
+    def hgetall(self, key):
+        with self._lock:
+            self.calls['hgetall'] += 1
+            return dict(self._hash(key) or {})
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        with self._lock:
+            self.calls['hset'] += 1
+            items = dict(mapping or {})
+            if field is not None:
+                items[field] = value
+            data = self._hash(key, create=True)
+            added = 0
+            for name, item in items.items():
+                name = self._bytes(name)
+                added += name not in data
+                data[name] = self._bytes(item)
+            return added
+
+    def hsetnx(self, key, field, value):
+        with self._lock:
+            self.calls['hsetnx'] += 1
+            data = self._hash(key, create=True)
+            field = self._bytes(field)
+            if field in data:
+                return 0
+            data[field] = self._bytes(value)
+            return 1
+
+    def hdel(self, key, *fields):
+        with self._lock:
+            self.calls['hdel'] += 1
+            data = self._hash(key) or {}
+            removed = sum(data.pop(self._bytes(field), None) is not None for field in fields)
+            self._drop_if_empty(key)
+            return removed
+
+    def expire(self, key, seconds):
+        with self._lock:
+            self.calls['expire'] += 1
+            if self._hash(key) is None:
+                return 0
+            if seconds <= 0:
+                self._data.pop(key)
+                self._expires.pop(key, None)
+            else:
+                self._expires[key] = time.monotonic() + seconds
+            return 1
+
+    def ttl(self, key):
+        with self._lock:
+            self.calls['ttl'] += 1
+            if self._hash(key) is None:
+                return -2
+            expires = self._expires.get(key)
+            return -1 if expires is None else max(0, round(expires - time.monotonic()))
+
+    def exists(self, *keys):
+        with self._lock:
+            self.calls['exists'] += 1
+            return sum(self._hash(key) is not None for key in keys)
+
+    def delete(self, *keys):
+        with self._lock:
+            self.calls['delete'] += 1
+            removed = 0
+            for key in keys:
+                removed += self._hash(key) is not None
+                self._data.pop(key, None)
+                self._expires.pop(key, None)
+            return removed
+
+    def flushall(self):
+        with self._lock:
+            self._data.clear()
+            self._expires.clear()
+            self.calls.clear()
+
+    def pipeline(self, transaction=True):
+        return LocalPipeline(self)
+
+
+class LocalPipeline:
+    """Queued commands of LocalRedis executed atomically by execute()."""
+
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        method = getattr(self.client, name)
+
+        def queue(*args, **kwargs):
+            self.commands.append((method, args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        with self.client._lock:
+            results = [method(*args, **kwargs) for method, args, kwargs in self.commands]
+        self.commands = []
+        return results
@@ -0,0 +1,86 @@
+"""
+Server-Timing response header with a breakdown of where a request spent time.
+
+Example (browser devtools show it in the Timing tab of a request):
+
+    Server-Timing: total;dur=84.2, db;dur=31.0;desc="SQL (12)",
+        tpl;dur=40.1;desc="Templates", cp-categories;dur=0.1,
+        cp-cart;dur=2.3, session-load;dur=1.2, cache;desc="hits 3, misses 1"
+
+SERVER_TIMING selects who gets the header: "off" (default), "staff" or
+"all". SERVER_TIMING_SAMPLE_RATE (0..1) times only that share of requests,
+the rest pass through untouched. Phases are measured by the hooks in
+apps/core/instrumentation.py; they overlap (session-load is also SQL), so
+they do not add up to total.
+"""
+import random
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import instrumentation
+
+
+MODES = ('off', 'staff', 'all')
+
+# Фазы с фиксированными описаниями
+DESCRIPTIONS = {
+    'session-load': 'Session load',
+    'session-save': 'Session save',
+    'pdf': 'PDF rendering',
+}
+
+
+def _ms(seconds):
+    return f'{seconds * 1000:.1f}'
+
+
+def header(stats, total):
+    """Server-Timing value for ``stats`` of a request that took ``total`` seconds."""
+    metrics = [
+        f'total;dur={_ms(total)}',
+        f'db;dur={_ms(stats.db_time)};desc="SQL ({stats.queries})"',
+        f'tpl;dur={_ms(stats.template_time)};desc="Templates"',
+    ]
+    for name, seconds in (stats.timings or {}).items():
+        description = DESCRIPTIONS.get(name)
+        metrics.append(f'{name};dur={_ms(seconds)}' + (f';desc="{description}"' if description else ''))
+    if stats.cache_hits or stats.cache_misses:
+        metrics.append(f'cache;desc="hits {stats.cache_hits}, misses {stats.cache_misses}"')
+    return ', '.join(metrics)
+
+
+class ServerTimingMiddleware:
+    """Adds the Server-Timing header to sampled requests (see module docstring)."""
+
+    def __init__(self, get_response):
+        if settings.SERVER_TIMING not in MODES:
+            raise ValueError(f'SERVER_TIMING must be one of {MODES}, not {settings.SERVER_TIMING!r}')
+        if settings.SERVER_TIMING == 'off':
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.SERVER_TIMING_SAMPLE_RATE:
+            return self.get_response(request)
+        stats = instrumentation.current()
+        if stats is None:
+            # MetricsMiddleware выключен: собираем сами
+            with instrumentation.track() as stats:
+                return self.timed(request, stats)
+        return self.timed(request, stats)
+
+    def timed(self, request, stats):
+        stats.timings = {}
+        started = time.perf_counter()
+        response = self.get_response(request)
+        total = time.perf_counter() - started
+        if settings.SERVER_TIMING == 'all' or self.is_staff(request):
+            response['Server-Timing'] = header(stats, total)
+        return response
+
+    @staticmethod
+    def is_staff(request):
+        user = getattr(request, 'user', None)
+        return user is not None and user.is_active and user.is_staff
@@ -0,0 +1,28 @@
+from django.test import TestCase
+
+from .. import budgets
+
+
+class ViewBudgetTest(TestCase):
+    """Test that the main pages stay within their query budgets."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = budgets.seed()
+    
+    def test_pages_within_budget(self):
+        """Test every page in BUDGETS for its status and query count; time is left to view_budgets."""
+        for url_name in budgets.BUDGETS:
+            with self.subTest(url_name):
+                # Время ответа зависит от машины, его проверяет manage.py view_budgets
+                measurement = budgets.measure(self.client, url_name, self.data, repeat=1)
+                self.assertEqual(measurement.status, 200, url_name)
+                self.assertLessEqual(measurement.queries, measurement.budget.queries, url_name)
+    
+    def test_extra_query_is_over_budget(self):
+        """Test that one query over the budget is reported."""
+        measurement = budgets.measure(self.client, 'orders:order_history', self.data, repeat=1)
+        tighter = measurement._replace(budget=measurement.budget._replace(queries=measurement.queries - 1))
+        self.assertEqual(
+            budgets.over_budget(tighter), [f'{measurement.queries} queries > {measurement.queries - 1}']
+        )
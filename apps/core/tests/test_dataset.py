@@ -0,0 +1,107 @@
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models import Count, Sum
+from django.test import TestCase
+
+from apps.accounts.models import GuestSession, User
+from apps.orders.models import DailySales, Order, OrderItem, OrderSummary
+from apps.products.models import Category, Product
+
+from .. import dataset
+
+
+class GenerateDatasetTest(TestCase):
+    """Test the COPY-based synthetic dataset generator."""
+    
+    SIZE = dataset.DatasetSize(categories=3, products=20, users=15, guests=10, orders=300, days=60)
+    UNTIL = date(2026, 1, 31)
+    
+    def order_signature(self):
+        return [
+            (order.created_at, order.email, order.total_cost, order.items_count, order.status, order.paid)
+            for order in Order.objects.order_by('id')
+        ]
+    
+    def test_generates_requested_rows(self):
+        """Test that every table gets the requested number of consistent rows."""
+        counts = dataset.generate(self.SIZE, seed=1, until=self.UNTIL)
+    
+        self.assertEqual(counts['orders_order'], 300)
+        self.assertEqual(Category.objects.count(), 3)
+        self.assertEqual(Product.objects.count(), 20)
+        self.assertEqual(User.objects.count(), 15)
+        self.assertEqual(GuestSession.objects.count(), 10)
+        self.assertEqual(Order.objects.count(), 300)
+        self.assertEqual(OrderItem.objects.count(), counts['orders_orderitem'])
+        first = Order.objects.order_by('created_at').first().created_at.date()
+        last = Order.objects.order_by('created_at').last().created_at.date()
+        self.assertGreaterEqual(first, date(2025, 12, 2))
+        self.assertLessEqual(last, self.UNTIL)
+        # Снимок, итог и число единиц совпадают со строками заказа
+        items = {
+            row['order']: row
+            for row in OrderItem.objects.values('order').annotate(units=Sum('quantity'), lines_count=Count('id'))
+        }
+        for order in Order.objects.all():
+            self.assertEqual(order.items_count, items[order.pk]['units'])
+            self.assertEqual(len(order.lines), items[order.pk]['lines_count'])
+            self.assertEqual(sum((line.cost for line in order.lines), Decimal('0')), order.total_cost)
+    
+    def test_customers_order_after_joining(self):
+        """Test that no order is placed before its customer or guest session existed."""
+        dataset.generate(self.SIZE, seed=1, until=self.UNTIL)
+    
+        for order in Order.objects.select_related('user', 'guest_session'):
+            if order.user:
+                self.assertGreaterEqual(order.created_at, order.user.date_joined)
+            if order.guest_session:
+                self.assertGreaterEqual(order.created_at, order.guest_session.created_at)
+        self.assertTrue(Order.objects.filter(user__isnull=False).exists())
+        self.assertTrue(Order.objects.filter(guest_session__isnull=False).exists())
+    
+    def test_same_seed_same_data(self):
+        """Test that the same seed reproduces the data and another seed does not."""
+        # Id из последовательностей входят в e-mail: повторяются только после очистки
+        dataset.truncate()
+        dataset.generate(self.SIZE, seed=1, until=self.UNTIL)
+        first = self.order_signature()
+        names = list(User.objects.order_by('id').values_list('first_name', 'last_name'))
+    
+        dataset.truncate()
+        dataset.generate(self.SIZE, seed=1, until=self.UNTIL)
+        self.assertEqual(self.order_signature(), first)
+        self.assertEqual(list(User.objects.order_by('id').values_list('first_name', 'last_name')), names)
+    
+        dataset.truncate()
+        dataset.generate(self.SIZE, seed=2, until=self.UNTIL)
+        self.assertNotEqual(self.order_signature(), first)
+    
+    def test_truncate_keeps_staff(self):
+        """Test that truncating keeps staff accounts."""
+        User.objects.create_superuser(email='admin@example.com', password='adminpass123', username='admin')
+        dataset.generate(self.SIZE, seed=1, until=self.UNTIL)
+    
+        dataset.truncate()
+    
+        self.assertEqual(list(User.objects.values_list('email', flat=True)), ['admin@example.com'])
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(Product.objects.exists())
+    
+    def test_command_rebuilds_derived_tables(self):
+        """Test that the command rebuilds order summaries and daily sales."""
+        out = StringIO()
+        call_command(
+            'generate_dataset', categories=2, products=10, users=5, guests=5, orders=100, days=10,
+            until=self.UNTIL, stdout=out,
+        )
+    
+        self.assertEqual(Order.objects.count(), 100)
+        self.assertEqual(
+            OrderSummary.objects.filter(order_count__gt=0).count(),
+            Order.objects.filter(user__isnull=False).values('user').distinct().count()
+        )
+        self.assertTrue(DailySales.objects.exists())
+        self.assertIn('Данные загружены', out.getvalue())
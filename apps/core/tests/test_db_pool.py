@@ -0,0 +1,57 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TransactionTestCase
+
+from .. import db_pool
+
+
+class ConnectionStatsTest(TransactionTestCase):
+    """
+    Test the connection statistics and the check_postgres command.
+    
+    Simulated requests close obsolete connections like real ones do, which
+    is not allowed inside TestCase's transaction: TransactionTestCase.
+    """
+    databases = {'default'}
+    available_apps = ['apps.core']
+    
+    def _check(self, checkouts=5):
+        out = StringIO()
+        call_command('check_postgres', checkouts=checkouts, aliases=['default'], stdout=out)
+        return out.getvalue()
+    
+    def test_persistent_connection_is_reused(self):
+        """Test that requests reuse one persistent connection."""
+        connection.ensure_connection()
+        before = db_pool.stats()
+        output = self._check()
+        after = db_pool.stats()
+        self.assertEqual(after['mode'], 'persistent')
+        self.assertEqual(after['connects'], before['connects'])
+        self.assertGreaterEqual(after['checkouts'] - before['checkouts'], 5)
+        self.assertEqual(after['open_connections'], 1)
+        self.assertIn('Режим: постоянные соединения', output)
+        self.assertIn('новых подключений', output)
+    
+    def test_per_request_mode_reconnects(self):
+        """Test that without CONN_MAX_AGE every request opens a new connection."""
+        connection.close()
+        with mock.patch.dict(connection.settings_dict, CONN_MAX_AGE=0):
+            before = db_pool.stats()
+            output = self._check()
+            after = db_pool.stats()
+        self.assertEqual(after['mode'], 'per-request')
+        self.assertGreaterEqual(after['connects'] - before['connects'], 5)
+        self.assertIn('новое соединение на каждый запрос', output)
+    
+    def test_closed_connections_are_forgotten(self):
+        """Test that connection ages only cover connections that are still open."""
+        connection.ensure_connection()
+        self.assertEqual(db_pool.stats()['open_connections'], 1)
+        connection.close()
+        stats = db_pool.stats()
+        self.assertEqual(stats['open_connections'], 0)
+        self.assertEqual(stats['connection_ages'], [])
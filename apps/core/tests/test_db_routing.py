@@ -0,0 +1,127 @@
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+from django.test import RequestFactory, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.products.models import Category, Product
+from apps.products.views import ProductListView
+from ..db_routing import PIN_COOKIE, ReplicaRouter, use_replica
+
+User = get_user_model()
+
+
+@override_settings(REPLICA_ALIAS='replica')
+class ReplicaRoutingTest(TransactionTestCase):
+    """
+    Test routing of catalog and report reads to the replica alias.
+    
+    The replica is a test mirror of the primary (a separate connection), so
+    the data is committed: TransactionTestCase instead of TestCase.
+    """
+    databases = {'default', 'replica'}
+    # С available_apps очистка таблиц между тестами идёт через TRUNCATE ... CASCADE
+    available_apps = [
+        'django.contrib.admin', 'django.contrib.auth', 'django.contrib.contenttypes',
+        'django.contrib.sessions', 'django.contrib.messages',
+        'apps.core', 'apps.accounts', 'apps.products', 'apps.orders', 'apps.shop_cart',
+    ]
+    
+    def setUp(self):
+        category = Category.objects.create(name="Coffee", slug="coffee")
+        self.product = Product.objects.create(
+            name="Arabica", slug="arabica", description="Arabica beans",
+            price=Decimal('450.00'), category=category, stock=10
+        )
+        User.objects.create_superuser(email="admin@example.com", password="adminpass123", username="admin")
+        self.client.login(email="admin@example.com", password="adminpass123")
+        self._wait_for_replica()
+    
+    @staticmethod
+    def _wait_for_replica(timeout=5):
+        """With a real streaming replica (DB_REPLICA_HOST), wait until it has replayed our writes."""
+        with connections['replica'].cursor() as cursor:
+            cursor.execute('SELECT pg_is_in_recovery()')
+            if not cursor.fetchone()[0]:
+                return
+            with connections['default'].cursor() as primary:
+                primary.execute('SELECT pg_current_wal_lsn()')
+                lsn = primary.fetchone()[0]
+            deadline = time.monotonic() + timeout
+            while time.monotonic() < deadline:
+                cursor.execute('SELECT pg_last_wal_replay_lsn() >= %s::pg_lsn', [lsn])
+                if cursor.fetchone()[0]:
+                    return
+                time.sleep(0.01)
+        raise AssertionError('Replica did not catch up')
+    
+    def _capture(self, request):
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            response = request()
+        self.assertEqual(response.status_code, 200)
+        return (
+            response,
+            ' '.join(query['sql'] for query in primary.captured_queries),
+            ' '.join(query['sql'] for query in replica.captured_queries),
+        )
+    
+    def _get_report(self):
+        return self._capture(lambda: self.client.get(reverse('orders:admin_sales_report')))[1:]
+    
+    @override_settings(TEMPLATES=[{
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'OPTIONS': {'loaders': [('django.template.loaders.locmem.Loader', {
+            'catalog.html': '{% for product in products %}{{ product.name }}{% endfor %}'
+                            '/{% for category in categories %}{{ category.name }}{% endfor %}',
+        })]},
+    }])
+    def test_catalog_reads_go_to_replica(self):
+        """Test that the product list, including lazy querysets rendered by the template, reads from the replica."""
+        view = ProductListView.as_view(template_name='catalog.html')
+        response, primary, replica = self._capture(lambda: view(RequestFactory().get('/', {'q': 'arab'})))
+        self.assertEqual(response.content, b'Arabica/Coffee')
+        self.assertIn('"products_product"', replica)
+        self.assertIn('"products_category"', replica)
+        self.assertEqual(primary, '')
+    
+    def test_admin_reports_read_from_replica(self):
+        """Test that the sales report reads its facts from the replica and the session from the primary."""
+        primary, replica = self._get_report()
+        self.assertIn('"orders_dailysales"', replica)
+        self.assertNotIn('"orders_dailysales"', primary)
+        self.assertIn('"django_session"', primary)
+        self.assertNotIn('"django_session"', replica)
+    
+    def test_writes_pin_client_to_primary(self):
+        """Test that after a cart edit the client reads its own writes from the primary."""
+        response = self.client.post(reverse('cart:cart_add', kwargs={'product_id': self.product.pk}), {'quantity': 1})
+        self.assertIn(PIN_COOKIE, response.cookies)
+        primary, replica = self._get_report()
+        self.assertEqual(replica, '')
+        self.assertIn('"orders_dailysales"', primary)
+        
+        # После истечения окна чтение снова идёт с реплики
+        del self.client.cookies[PIN_COOKIE]
+        primary, replica = self._get_report()
+        self.assertIn('"orders_dailysales"', replica)
+    
+    def test_router_keeps_writes_and_transactions_on_primary(self):
+        """Test that writes and reads inside a transaction never use the replica."""
+        router = ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Product))
+        with use_replica():
+            self.assertEqual(router.db_for_read(Product), 'replica')
+            self.assertEqual(router.db_for_write(Product), 'default')
+            with transaction.atomic():
+                self.assertIsNone(router.db_for_read(Product))
+    
+    @override_settings(REPLICA_ALIAS=None)
+    def test_without_replica_everything_reads_primary(self):
+        """Test that annotated views use the primary when no replica is configured."""
+        primary, replica = self._get_report()
+        self.assertEqual(replica, '')
+        self.assertIn('"orders_dailysales"', primary)
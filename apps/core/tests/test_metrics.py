@@ -0,0 +1,88 @@
+import json
+import os
+import re
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import instrumentation, metrics
+
+User = get_user_model()
+
+
+class MetricsTest(TestCase):
+    """Test per-view request metrics and the /metrics endpoint."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_superuser(email="admin@example.com", password="adminpass123", username="admin")
+    
+    def setUp(self):
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+    
+    def _value(self, text, series):
+        match = re.search(rf'^{re.escape(series)} (\S+)$', text, re.MULTILINE)
+        self.assertIsNotNone(match, f'{series} not in output')
+        return float(match.group(1))
+    
+    def test_request_is_recorded_per_view(self):
+        """Test that latency, queries and template time are recorded under the URL name."""
+        self.client.force_login(self.staff)
+        self.client.get(reverse('orders:admin_sales_report'))
+        self.client.get(reverse('orders:admin_sales_report'))
+        text = metrics.render()
+        labels = 'view="orders:admin_sales_report",method="GET",status="200"'
+        self.assertEqual(self._value(text, f'django_http_request_duration_seconds_count{{{labels}}}'), 2)
+        self.assertEqual(self._value(text, f'django_http_request_duration_seconds_bucket{{{labels},le="+Inf"}}'), 2)
+        self.assertGreater(self._value(text, 'django_db_queries_total{view="orders:admin_sales_report"}'), 0)
+        self.assertGreater(
+            self._value(text, 'django_template_render_seconds_total{view="orders:admin_sales_report"}'), 0
+        )
+    
+    def test_cache_hits_and_misses(self):
+        """Test that cache lookups are counted without changing what they return."""
+        with instrumentation.track() as stats:
+            self.assertIsNone(cache.get('metrics-test'))
+            self.assertEqual(cache.get('metrics-test', 'default'), 'default')
+            self.assertEqual(cache.get_or_set('metrics-test', 'value'), 'value')
+            self.assertEqual(cache.get('metrics-test'), 'value')
+            self.assertEqual(cache.get_many(['metrics-test', 'metrics-missing']), {'metrics-test': 'value'})
+        self.assertEqual((stats.cache_hits, stats.cache_misses), (3, 4))
+    
+    @override_settings(METRICS_TOKEN='secret')
+    def test_endpoint_is_staff_only(self):
+        """Test that /metrics is served to staff and to the scraper token only."""
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertIn('# TYPE django_http_request_duration_seconds histogram', response.content.decode())
+    
+    def test_multiprocess_snapshots_are_summed(self):
+        """Test that with METRICS_DIR the endpoint adds up the snapshots of all worker processes."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        other_worker = {
+            'latency': [['metrics', 'GET', 200, [1] + [0] * (len(metrics.BUCKETS) + 1)]],
+            'counters': [['django_db_queries_total', 'metrics', 5]],
+        }
+        with open(os.path.join(directory, '999999.json'), 'w') as f:
+            json.dump(other_worker, f)
+        self.client.force_login(self.staff)
+        with override_settings(METRICS_DIR=directory):
+            self.client.get(reverse('metrics'))
+            self.assertTrue(os.path.exists(os.path.join(directory, f'{os.getpid()}.json')))
+            text = metrics.render()
+        labels = 'view="metrics",method="GET",status="200"'
+        self.assertEqual(self._value(text, f'django_http_request_duration_seconds_count{{{labels}}}'), 2)
+        self.assertGreater(self._value(text, 'django_db_queries_total{view="metrics"}'), 5)
@@ -0,0 +1,125 @@
+import json
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.template import loader
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils.functional import SimpleLazyObject
+
+from apps.products.models import Category, Product
+from ..nplusone import NPlusOneError, NPlusOneMiddleware, detect, fingerprint
+
+LOCMEM_TEMPLATES = [{
+    'BACKEND': 'django.template.backends.django.DjangoTemplates',
+    'OPTIONS': {
+        'loaders': [('django.template.loaders.locmem.Loader', {
+            'categories.html': '{% for product in products %}\n{{ product.category.name }}\n{% endfor %}',
+        })],
+    },
+}]
+
+
+@override_settings(NPLUSONE_THRESHOLD=3, NPLUSONE_ALLOW=[], NPLUSONE_LOG=None)
+class NPlusOneTest(TestCase):
+    """Test detection of repeated queries within a request."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = []
+        for number in range(4):
+            category = Category.objects.create(name=f"Category {number}", slug=f"category-{number}")
+            cls.products.append(Product.objects.create(
+                name=f"Coffee {number}", slug=f"coffee-{number}", description="Beans",
+                price=Decimal('100.00'), category=category, stock=10
+            ))
+    
+    def test_fingerprint_ignores_literals(self):
+        """Test that queries differing only in values share a fingerprint."""
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id = 1 AND name = 'a''b' AND x IN (%s, %s)"),
+            fingerprint("SELECT  * FROM t WHERE id = 25 AND name = 'c' AND x IN (%s, %s, %s)"),
+        )
+    
+    def test_loop_in_code_reports_line(self):
+        """Test that a query in a loop is reported with the line that issues it."""
+        with self.assertRaises(NPlusOneError) as raised:
+            with detect('loop'):
+                for product in self.products:
+                    Product.objects.get(pk=product.pk)  # line of the N+1
+        with open(__file__) as f:
+            line = next(number for number, text in enumerate(f, 1) if '# line of the N+1' in text)
+        self.assertIn(f'apps/core/tests/test_nplusone.py:{line}', str(raised.exception))
+        self.assertIn('4 times', str(raised.exception))
+    
+    def test_below_threshold_and_single_query_pass(self):
+        """Test that a prefetched loop and short repeats are not reported."""
+        with detect() as log:
+            for product in Product.objects.select_related('category'):
+                product.category.name
+            Product.objects.get(pk=self.products[0].pk)
+            Product.objects.get(pk=self.products[1].pk)
+        self.assertEqual(log.repeated(), [])
+    
+    @override_settings(TEMPLATES=LOCMEM_TEMPLATES)
+    def test_template_loop_reports_template_line(self):
+        """Test that a query triggered from a template names the template and line."""
+        products = list(Product.objects.all())
+        with self.assertRaisesMessage(NPlusOneError, 'categories.html:2'):
+            with detect('template'):
+                loader.render_to_string('categories.html', {'products': products})
+    
+    def test_lazy_objects_on_stack_are_not_evaluated(self):
+        """Test that looking for the call site does not evaluate a lazy object issuing the query."""
+        lazy = SimpleLazyObject(lambda: Product.objects.get(pk=self.products[0].pk))
+        with detect() as log:
+            lazy.name
+        self.assertEqual(sum(log.counts.values()), 1)
+    
+    @override_settings(NPLUSONE_ALLOW=['apps/core/tests/*'])
+    def test_allow_list_suppresses_report(self):
+        """Test that allow-listed sites are not reported."""
+        with detect() as log:
+            for product in self.products:
+                Product.objects.get(pk=product.pk)
+        self.assertEqual(log.repeated(), [])
+    
+    def test_middleware_logs_and_report_command_aggregates(self):
+        """Test that the middleware records offenders and the report ranks them."""
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        path = os.path.join(root, 'nplusone.jsonl')
+    
+        def view(request):
+            for product in self.products[:int(request.GET['n'])]:
+                Product.objects.get(pk=product.pk)
+    
+        with override_settings(NPLUSONE='log', NPLUSONE_LOG=path):
+            middleware = NPlusOneMiddleware(view)
+            with self.assertLogs('apps.core.nplusone', 'WARNING'):
+                middleware(RequestFactory().get('/a/', {'n': 4}))
+                middleware(RequestFactory().get('/b/', {'n': 3}))
+            middleware(RequestFactory().get('/c/', {'n': 2}))
+    
+        with open(path) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual([record['where'] for record in records], ['/a/', '/b/'])
+    
+        out = StringIO()
+        call_command('nplusone_report', file=path, json=True, stdout=out)
+        [group] = json.loads(out.getvalue())
+        self.assertEqual((group['requests'], group['queries'], group['max']), (2, 7, 4))
+        self.assertEqual(group['views'], ['/a/', '/b/'])
+    
+    @override_settings(NPLUSONE='raise')
+    def test_raise_mode(self):
+        """Test that the middleware raises in raise mode."""
+        def view(request):
+            for product in self.products:
+                Product.objects.get(pk=product.pk)
+    
+        with self.assertRaises(NPlusOneError):
+            NPlusOneMiddleware(view)(RequestFactory().get('/'))
@@ -0,0 +1,174 @@
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from apps.products.models import Category, Product
+
+from .. import page_cache
+
+
+@override_settings(PAGE_CACHE_ENABLED=True, PAGE_CACHE_TIMEOUT=300, PAGE_CACHE_GRACE=60, PAGE_CACHE_LOCK_TIMEOUT=5)
+class PageCacheTest(TestCase):
+    """Test the full-page cache of anonymous catalog pages."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Coffee', slug='coffee')
+        cls.product = Product.objects.create(
+            name='Espresso', slug='espresso', description='Beans', price=450, category=cls.category, stock=10,
+        )
+    
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('products:product_list')
+    
+    def test_second_anonymous_request_is_served_from_cache(self):
+        """Test that the page rendered for one visitor is served to a new one without queries."""
+        first = self.client.get(self.url)
+        self.assertEqual(first['X-Page-Cache'], 'MISS')
+    
+        with self.assertNumQueries(0):
+            second = self.client_class().get(self.url)
+    
+        self.assertEqual(second['X-Page-Cache'], 'HIT')
+        self.assertEqual(second.content, first.content)
+        self.assertContains(second, 'Espresso')
+    
+    def test_authenticated_requests_are_not_cached(self):
+        """Test that pages of signed-in users are rendered every time."""
+        user = get_user_model().objects.create_user(email='c@example.com', username='c', password='pass12345')
+        self.client.force_login(user)
+    
+        response = self.client.get(self.url)
+    
+        self.assertFalse(response.has_header('X-Page-Cache'))
+        self.assertContains(response, 'c@example.com')
+    
+    def test_key_uses_normalized_query_and_language(self):
+        """Test that parameter order and tracking parameters do not change the key, the language does."""
+        self.client.get(self.url, {'page': '1', 'q': 'Esp'})
+    
+        response = self.client.get(f'{self.url}?q=Esp&utm_source=mail&page=1&sort=')
+        self.assertEqual(response['X-Page-Cache'], 'HIT')
+        response = self.client.get(f'{self.url}?q=Esp&page=1', HTTP_ACCEPT_LANGUAGE='en')
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+    
+    def test_catalog_change_invalidates_pages(self):
+        """Test that saving a product bumps the catalog version after commit."""
+        detail = self.product.get_absolute_url()
+        self.client.get(detail)
+        self.assertEqual(self.client.get(detail)['X-Page-Cache'], 'HIT')
+    
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.name = 'Ristretto'
+            self.product.save()
+    
+        response = self.client.get(detail)
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertContains(response, 'Ristretto')
+    
+    def test_cached_page_has_no_personal_data(self):
+        """Test that the cart, messages and CSRF token are left to the fragments request."""
+        self.client.post(reverse('cart:cart_add', args=[self.product.id]), {'quantity': 2})
+    
+        response = self.client.get(self.product.get_absolute_url())
+    
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertContains(response, f'value="{page_cache.CSRF_PLACEHOLDER}"')
+        self.assertContains(response, 'data-fragment="cart-count"></span>')
+        self.assertContains(response, reverse('page_fragments'))
+        self.assertNotIn('csrftoken', response.cookies)
+    
+    def test_fragments_return_personal_data(self):
+        """Test that the fragments view returns the cart count, messages and a CSRF token."""
+        self.client.post(reverse('cart:cart_add', args=[self.product.id]), {'quantity': 2})
+    
+        data = self.client.get(reverse('page_fragments')).json()
+    
+        self.assertEqual(data['cart_count'], 2)
+        self.assertTrue(data['messages'])
+        self.assertTrue(data['csrf_token'])
+        self.assertIn('csrftoken', self.client.cookies)
+        self.assertEqual(self.client.get(reverse('page_fragments')).json()['messages'], [])
+    
+    def test_early_expiry_is_probabilistic(self):
+        """Test that XFetch never recomputes far from expiry and always after it."""
+        entry = page_cache.Entry(b'', 'text/html', 0.5, 1000.0)
+    
+        self.assertFalse(any(page_cache.should_recompute(entry, now=900.0, beta=1) for _ in range(100)))
+        self.assertTrue(all(page_cache.should_recompute(entry, now=1000.0, beta=1) for _ in range(100)))
+        early = sum(page_cache.should_recompute(entry, now=999.5, beta=1) for _ in range(1000))
+        self.assertTrue(0 < early < 1000)
+
+
+@override_settings(PAGE_CACHE_ENABLED=True, PAGE_CACHE_TIMEOUT=300, PAGE_CACHE_GRACE=60, PAGE_CACHE_LOCK_TIMEOUT=5)
+class SingleFlightTest(TestCase):
+    """Test that a page is rebuilt by one request at a time."""
+    
+    def setUp(self):
+        cache.clear()
+        self.renders = 0
+        self.lock = threading.Lock()
+    
+        def view(request):
+            with self.lock:
+                self.renders += 1
+                number = self.renders
+            time.sleep(0.2)
+            return HttpResponse(f'render {number}')
+        self.view = page_cache.page_cache(view)
+    
+    def request(self):
+        request = RequestFactory().get('/catalog/')
+        request.user = AnonymousUser()
+        return request
+    
+    def test_cold_key_is_rendered_once(self):
+        """Test that concurrent requests for a cold key wait for a single render."""
+        responses = []
+        barrier = threading.Barrier(8)
+    
+        def worker():
+            barrier.wait()
+            responses.append(self.view(self.request()))
+    
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    
+        self.assertEqual(self.renders, 1)
+        self.assertEqual({response.content for response in responses}, {b'render 1'})
+        self.assertEqual(sorted(response['X-Page-Cache'] for response in responses), ['HIT'] * 7 + ['MISS'])
+    
+    def test_stale_page_is_served_during_rebuild(self):
+        """Test that an expired page is served while another request holds the rebuild lock."""
+        self.view(self.request())
+        key = page_cache.cache_key(self.request())
+        cache.set(key, cache.get(key)._replace(expires=time.time() - 1))
+        cache.add(f'{key}:lock', 1)
+    
+        response = self.view(self.request())
+    
+        self.assertEqual(response['X-Page-Cache'], 'STALE')
+        self.assertEqual(response.content, b'render 1')
+        self.assertEqual(self.renders, 1)
+    
+    def test_expired_page_is_rebuilt(self):
+        """Test that the request taking the lock rebuilds an expired page."""
+        self.view(self.request())
+        key = page_cache.cache_key(self.request())
+        cache.set(key, cache.get(key)._replace(expires=time.time() - 1))
+    
+        response = self.view(self.request())
+    
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertEqual(response.content, b'render 2')
+        self.assertEqual(self.view(self.request())['X-Page-Cache'], 'HIT')
@@ -0,0 +1,103 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from .. import budgets, query_plans
+
+
+class QueryPlansTest(TestCase):
+    """Test capturing and comparing the plans of the hot queries."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        budgets.seed()
+    
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.json')
+        os.close(handle)
+        os.unlink(self.path)
+        self.addCleanup(lambda: os.path.exists(self.path) and os.unlink(self.path))
+    
+    def plan(self, cost=10.0, nodes=('Index Scan on orders_order using order_user_created_idx', 'Limit')):
+        return query_plans.Plan('SELECT 1', cost, 10, list(nodes))
+    
+    def test_every_entry_is_explained(self):
+        """Test that every registry entry runs and yields plans of its SELECTs."""
+        data = query_plans.sample()
+        for name in query_plans.QUERIES:
+            with self.subTest(name):
+                plans = query_plans.capture(name, data)
+                self.assertTrue(plans)
+                for plan in plans.values():
+                    self.assertGreater(plan.cost, 0)
+                    self.assertTrue(plan.nodes)
+    
+    def test_order_history_uses_index(self):
+        """Test that the order history is read with the (user, created_at) index."""
+        plans = query_plans.capture('order_history', query_plans.sample())
+        nodes = {node for plan in plans.values() for node in plan.nodes}
+        self.assertIn('Index Scan on orders_order using order_user_created_idx', nodes)
+    
+    def test_partitions_are_folded_into_table(self):
+        """Test that partition and partition index names map to their table."""
+        plan = query_plans.summarize('SELECT 1', [{'Plan': {
+            'Node Type': 'Append', 'Total Cost': 5.0, 'Plan Rows': 2, 'Plans': [
+                {'Node Type': 'Index Scan', 'Relation Name': 'orders_order_history',
+                 'Index Name': 'order_user_created_idx_history'},
+                {'Node Type': 'Index Scan', 'Relation Name': 'orders_orderitem_p202610',
+                 'Index Name': 'orders_orderitem_p202610_order_id_idx'},
+            ],
+        }}])
+        self.assertEqual(plan.nodes, [
+            'Append',
+            'Index Scan on orders_order using order_user_created_idx',
+            'Index Scan on orders_orderitem using orders_orderitem_order_id_idx',
+        ])
+    
+    def test_diff_flags_node_change_and_cost_increase(self):
+        """Test that a sequential scan and a cost above the threshold are regressions."""
+        baseline = {'history': {'q': self.plan()}}
+        current = {'history': {'q': self.plan(cost=20.0, nodes=('Seq Scan on orders_order', 'Limit'))}}
+    
+        changes = query_plans.diff(current, baseline, threshold=1.5)
+    
+        self.assertEqual([change.kind for change in changes], ['nodes', 'cost'])
+        self.assertIn('+ Seq Scan on orders_order', changes[0].detail)
+        self.assertIn('- Index Scan on orders_order using order_user_created_idx', changes[0].detail)
+        self.assertTrue(all(query_plans.is_regression(change) for change in changes))
+    
+    def test_diff_ignores_cost_within_threshold(self):
+        """Test that a cost increase below the threshold and new queries are not regressions."""
+        baseline = {'history': {'q': self.plan(), 'gone': self.plan()}}
+        current = {'history': {'q': self.plan(cost=14.0), 'added': self.plan()}}
+    
+        changes = query_plans.diff(current, baseline, threshold=1.5)
+    
+        self.assertEqual(sorted(change.kind for change in changes), ['missing', 'new'])
+        self.assertFalse(any(query_plans.is_regression(change) for change in changes))
+    
+    def test_command_compares_with_baseline(self):
+        """Test that the command saves a baseline and finds no changes on the same data."""
+        call_command('query_plans', 'cart', 'order_history', baseline=self.path, update_baseline=True,
+                     stdout=StringIO())
+        with open(self.path) as f:
+            self.assertEqual(sorted(json.load(f)['plans']), ['cart', 'order_history'])
+    
+        out = StringIO()
+        call_command('query_plans', 'cart', 'order_history', baseline=self.path, json=True, stdout=out)
+        self.assertEqual(json.loads(out.getvalue()), [])
+    
+    def test_command_fails_on_regression(self):
+        """Test that the command fails when a plan got more expensive than the baseline."""
+        data = query_plans.sample()
+        cheaper = {
+            key: plan._replace(cost=plan.cost / 10) for key, plan in query_plans.capture('cart', data).items()
+        }
+        query_plans.save(self.path, {'cart': cheaper})
+    
+        with self.assertRaisesMessage(CommandError, 'cart'):
+            call_command('query_plans', 'cart', baseline=self.path, stdout=StringIO())
@@ -0,0 +1,174 @@
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from apps.products.models import Category, Product
+
+from .. import redis_sessions
+from ..redis_sessions import SessionStore
+
+
+@override_settings(
+    SESSION_ENGINE='apps.core.redis_sessions', SESSION_REDIS_URL='local://tests', SESSION_REDIS_COMPRESS_MIN=512,
+)
+class RedisSessionTest(TestCase):
+    """Test the Redis hash session engine on the in-process stand-in."""
+    
+    def setUp(self):
+        self.redis = redis_sessions.get_client()
+        self.redis.flushall()
+    
+    def stored(self, session):
+        return self.redis.hgetall(settings.SESSION_REDIS_PREFIX + session.session_key)
+    
+    def test_save_and_load(self):
+        """Test that a saved session is loaded by another store with the same key."""
+        session = SessionStore()
+        session['cart'] = {'1': {'quantity': 2, 'price': '450.00'}}
+        session['_auth_user_id'] = '7'
+        session.save()
+    
+        loaded = SessionStore(session.session_key)
+        self.assertEqual(loaded['cart'], {'1': {'quantity': 2, 'price': '450.00'}})
+        self.assertEqual(loaded['_auth_user_id'], '7')
+        self.assertTrue(loaded.exists(session.session_key))
+        self.assertLessEqual(self.redis.ttl(settings.SESSION_REDIS_PREFIX + session.session_key),
+                             settings.SESSION_COOKIE_AGE)
+    
+    def test_load_is_lazy(self):
+        """Test that Redis is not read until the session is accessed."""
+        session = SessionStore()
+        session['cart'] = {}
+        session.save()
+        self.redis.calls.clear()
+    
+        loaded = SessionStore(session.session_key)
+        self.assertEqual(self.redis.calls['hgetall'], 0)
+        loaded.get('cart')
+        loaded.get('_auth_user_id')
+        self.assertEqual(self.redis.calls['hgetall'], 1)
+    
+    def test_unchanged_session_only_refreshes_expiry(self):
+        """Test that saving a modified-flagged but unchanged session only refreshes its TTL."""
+        session = SessionStore()
+        session['cart'] = {'1': {'quantity': 1, 'price': '450.00'}}
+        session.save()
+        loaded = SessionStore(session.session_key)
+        loaded['cart']['1']['quantity'] = 1
+        loaded.modified = True
+        self.redis.calls.clear()
+    
+        loaded.save()
+    
+        self.assertEqual(self.redis.calls, {'expire': 1})
+    
+    def test_only_changed_fields_are_written(self):
+        """Test that a save does not overwrite fields another request changed meanwhile."""
+        session = SessionStore()
+        session['cart'] = {}
+        session['_messages'] = '[]'
+        session.save()
+        first = SessionStore(session.session_key)
+        first['cart']
+        second = SessionStore(session.session_key)
+        second['_messages'] = '["done"]'
+        second.save()
+    
+        first['cart']['1'] = {'quantity': 1, 'price': '450.00'}
+        first.modified = True
+        first.save()
+    
+        loaded = SessionStore(session.session_key)
+        self.assertEqual(loaded['cart'], {'1': {'quantity': 1, 'price': '450.00'}})
+        self.assertEqual(loaded['_messages'], '["done"]')
+    
+    def test_deleted_key_is_removed(self):
+        """Test that a key deleted from the session is deleted from the hash."""
+        session = SessionStore()
+        session['cart'] = {}
+        session['coupon'] = 'COFFEE10'
+        session.save()
+        loaded = SessionStore(session.session_key)
+        del loaded['coupon']
+        loaded.save()
+    
+        self.assertNotIn(b'coupon', self.stored(session))
+        self.assertNotIn('coupon', SessionStore(session.session_key))
+    
+    def test_large_values_are_compressed(self):
+        """Test that large values are stored compressed and loaded back."""
+        cart = {str(pk): {'quantity': 1, 'price': '450.00'} for pk in range(100)}
+        session = SessionStore()
+        session['cart'] = cart
+        session['_auth_user_id'] = '7'
+        session.save()
+    
+        stored = self.stored(session)
+        self.assertTrue(stored[b'cart'].startswith(redis_sessions.COMPRESSED))
+        self.assertFalse(stored[b'_auth_user_id'].startswith(redis_sessions.COMPRESSED))
+        self.assertEqual(SessionStore(session.session_key)['cart'], cart)
+    
+    def test_expired_session_is_written_whole(self):
+        """Test that a session that expired after loading is saved with all its fields."""
+        session = SessionStore()
+        session['cart'] = {}
+        session['_auth_user_id'] = '7'
+        session.save()
+        loaded = SessionStore(session.session_key)
+        loaded['cart']['1'] = {'quantity': 1, 'price': '450.00'}
+        self.redis.delete(settings.SESSION_REDIS_PREFIX + session.session_key)
+    
+        loaded.modified = True
+        loaded.save()
+    
+        self.assertEqual(SessionStore(session.session_key)['_auth_user_id'], '7')
+    
+    def test_unchanged_expired_session_is_written_whole(self):
+        """Test that an unchanged session whose key expired after loading is saved again."""
+        session = SessionStore()
+        session['_auth_user_id'] = '7'
+        session.save()
+        loaded = SessionStore(session.session_key)
+        loaded['_auth_user_id']
+        self.redis.delete(settings.SESSION_REDIS_PREFIX + session.session_key)
+    
+        loaded.modified = True
+        loaded.save()
+    
+        self.assertEqual(SessionStore(session.session_key)['_auth_user_id'], '7')
+    
+    def test_cycle_key_and_flush(self):
+        """Test that cycling the key moves the data and flushing deletes it."""
+        session = SessionStore()
+        session['cart'] = {'1': {'quantity': 1, 'price': '450.00'}}
+        session.save()
+        old_key = session.session_key
+    
+        session.cycle_key()
+        self.assertFalse(session.exists(old_key))
+        self.assertEqual(SessionStore(session.session_key)['cart'], {'1': {'quantity': 1, 'price': '450.00'}})
+    
+        new_key = session.session_key
+        session.flush()
+        self.assertFalse(session.exists(new_key))
+    
+    def test_unknown_key_starts_new_session(self):
+        """Test that an unknown session key gives an empty session with a new key."""
+        session = SessionStore('x' * 32)
+        self.assertEqual(dict(session.items()), {})
+        session['cart'] = {}
+        session.save()
+        self.assertNotEqual(session.session_key, 'x' * 32)
+    
+    def test_cart_through_views(self):
+        """Test that the cart survives requests with the Redis engine."""
+        category = Category.objects.create(name='Coffee', slug='coffee')
+        product = Product.objects.create(
+            name='Espresso', slug='espresso', description='Beans', price=450, category=category, stock=10,
+        )
+    
+        self.client.post(reverse('cart:cart_add', args=[product.id]), {'quantity': 2})
+        response = self.client.get(reverse('cart:cart_detail'))
+    
+        self.assertContains(response, 'Espresso')
+        self.assertEqual(self.client.session['cart'][str(product.id)]['quantity'], 2)
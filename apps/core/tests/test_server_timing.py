@@ -0,0 +1,84 @@
+import shutil
+import tempfile
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from apps.orders import documents
+from apps.orders.models import Order
+from apps.products.models import Category, Product
+from .. import instrumentation
+from ..server_timing import header
+
+User = get_user_model()
+
+
+def _metrics(response):
+    return {item.split(';')[0]: item for item in response['Server-Timing'].split(', ')}
+
+
+@override_settings(SERVER_TIMING='staff', SERVER_TIMING_SAMPLE_RATE=1.0)
+class ServerTimingTest(TestCase):
+    """Test the Server-Timing breakdown of request time."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_superuser(email="admin@example.com", password="adminpass123", username="admin")
+        cls.buyer = User.objects.create_user(email="buyer@example.com", password="testpass123", username="buyer")
+    
+    def test_staff_get_phase_breakdown(self):
+        """Test that a staff page lists SQL, templates, context processors and the session load."""
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('orders:admin_sales_report'))
+        metrics = _metrics(response)
+        for name in ('total', 'db', 'tpl', 'cp-categories', 'cp-cart', 'session-load'):
+            self.assertIn(name, metrics)
+        self.assertRegex(metrics['db'], r'^db;dur=[\d.]+;desc="SQL \(\d+\)"$')
+    
+    def test_other_users_get_no_header(self):
+        """Test that in staff mode customers and anonymous visitors get no header."""
+        self.assertNotIn('Server-Timing', self.client.get(reverse('orders:order_history_json')))
+        self.client.force_login(self.buyer)
+        self.assertNotIn('Server-Timing', self.client.get(reverse('orders:order_history_json')))
+        with override_settings(SERVER_TIMING='all'):
+            self.assertIn('Server-Timing', self.client.get(reverse('orders:order_history_json')))
+    
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=0.0)
+    def test_unsampled_requests_are_not_timed(self):
+        """Test that requests outside the sample pass through without a header."""
+        self.client.force_login(self.staff)
+        self.assertNotIn('Server-Timing', self.client.get(reverse('orders:admin_sales_report')))
+    
+    def test_pdf_rendering_is_a_phase(self):
+        """Test that rendering an invoice is reported as the pdf phase."""
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        category = Category.objects.create(name="Coffee", slug="coffee")
+        product = Product.objects.create(
+            name="Arabica", slug="arabica", description="Arabica beans",
+            price=Decimal('450.00'), category=category, stock=10
+        )
+        order = Order.objects.create(
+            user=self.staff, first_name="Ivan", last_name="Petrov", email="admin@example.com",
+            address="Moscow", postal_code="101000", city="Moscow", phone="+7999"
+        )
+        order.add_items_from_cart([{'product': product, 'price': product.price, 'quantity': 1}])
+        self.client.force_login(self.staff)
+        renderer = mock.Mock(return_value=b'%PDF-fake')
+        with override_settings(DOCUMENTS_ROOT=root), mock.patch.dict(documents.RENDERERS, invoice=renderer):
+            response = self.client.get(reverse('orders:order_invoice_pdf', kwargs={'order_id': order.pk}))
+        self.assertIn('pdf;dur=', _metrics(response)['pdf'])
+    
+    def test_nested_phase_is_counted_once(self):
+        """Test that re-entering a phase does not double its time."""
+        with instrumentation.track() as stats:
+            stats.timings = {}
+            with instrumentation.phase('pdf'):
+                with instrumentation.phase('pdf'):
+                    pass
+        self.assertEqual(list(stats.timings), ['pdf'])
+        self.assertIn('pdf;dur=', header(stats, 0.01))
+        self.assertNotIn('cache', header(stats, 0.01))
@@ -0,0 +1,69 @@
+import json
+import os
+import subprocess
+import sys
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from .. import debug
+from ..management.commands.profile_startup import parse_importtime
+
+HEAVY_MODULES = ('reportlab', 'openpyxl', 'numpy', 'pandas', 'import_export.admin', 'debug_toolbar')
+
+IMPORTTIME_SAMPLE = """\
+import time: self [us] | cumulative | imported package
+import time:       300 |        300 |     reportlab.lib
+import time:       700 |       1000 |   reportlab.platypus
+import time:       200 |       1200 | apps.orders.pdf_utils
+import time:       100 |        100 | json
+"""
+
+
+class StartupTest(SimpleTestCase):
+    """Test that process startup does not import heavy modules and the startup budget."""
+    
+    def test_wsgi_load_skips_heavy_modules(self):
+        """Test that loading the WSGI application imports no PDF, spreadsheet or toolbar modules."""
+        code = (
+            'import json, sys\n'
+            'from coffee_shop.wsgi import application\n'
+            f'print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))\n'
+        )
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'coffee_shop.settings', 'DEBUG': 'False'}
+        result = subprocess.run(
+            [sys.executable, '-c', code], cwd=settings.BASE_DIR, env=env, capture_output=True, text=True
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(json.loads(result.stdout), [])
+    
+    def test_parse_importtime_ranks_package_boundaries(self):
+        """Test that imports are attributed to the module that pulled their package in."""
+        total, entries, packages = parse_importtime(IMPORTTIME_SAMPLE)
+        self.assertEqual(total, 1300)
+        self.assertEqual(entries, [
+            (1200, 'apps.orders.pdf_utils', None),
+            (1000, 'reportlab.platypus', 'apps.orders.pdf_utils'),
+            (100, 'json', None),
+        ])
+        self.assertEqual(packages, {'reportlab': 1000, 'apps': 200, 'json': 100})
+    
+    @override_settings(STARTUP_BUDGET_MS={'wsgi': 1})
+    def test_budget_is_enforced(self):
+        """Test that the command fails when startup is over budget."""
+        with self.assertRaisesMessage(CommandError, 'wsgi'):
+            call_command('profile_startup', 'wsgi', repeat=1, json=True, stdout=StringIO())
+    
+    def test_toolbar_only_for_internal_ips(self):
+        """Test that the debug toolbar is shown only to internal addresses in debug mode."""
+        debug.internal_ips.cache_clear()
+        self.addCleanup(debug.internal_ips.cache_clear)
+        factory = RequestFactory()
+        with override_settings(DEBUG=True, INTERNAL_IPS=['127.0.0.1']):
+            self.assertTrue(debug.show_toolbar(factory.get('/', REMOTE_ADDR='127.0.0.1')))
+            self.assertFalse(debug.show_toolbar(factory.get('/', REMOTE_ADDR='203.0.113.5')))
+        with override_settings(DEBUG=False):
+            self.assertFalse(debug.show_toolbar(factory.get('/', REMOTE_ADDR='127.0.0.1')))
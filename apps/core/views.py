@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.contrib.messages import get_messages
+from django.http import HttpResponse, JsonResponse
+from django.middleware.csrf import get_token
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.cache import never_cache
+
+from apps.shop_cart.cart import Cart
+
+from . import metrics as metrics_registry
+
+
+def metrics(request):
+    """
+    Метрики в текстовом формате Prometheus.
+    Доступны персоналу и сборщику с заголовком "Authorization: Bearer <METRICS_TOKEN>".
+    """
+    token = settings.METRICS_TOKEN
+    authorized = request.user.is_active and request.user.is_staff
+    if not authorized and token:
+        authorized = constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+    if not authorized:
+        raise PermissionDenied
+    return HttpResponse(metrics_registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@never_cache
+def page_fragments(request):
+    """
+    Персональные части страницы из кэша (apps/core/page_cache.py): число товаров в
+    корзине, сообщения и CSRF-токен посетителя. Запрашивается static/js/page_fragments.js.
+    """
+    return JsonResponse({
+        'cart_count': len(Cart(request)),
+        'messages': [{'tags': message.tags, 'text': str(message)} for message in get_messages(request)],
+        'csrf_token': get_token(request),
+    })
@@ -1,8 +1,48 @@
-from django.contrib import admin
+import logging
+
+from django.contrib import admin, messages
+from django.db import transaction
+from django.http import HttpResponseRedirect, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from import_export.admin import ImportExportModelAdmin
 
-from .models import Order, OrderItem
+from apps.core.pagination import EstimatedCountPaginator
+from .invoice_export import iter_invoice_zip
+from .models import Order, OrderItem, OrderStatusHistory, OrderStatusJob, OrderSummary
+from .tasks import run_order_status_job
+
+logger = logging.getLogger(__name__)
+
+# Процессов для выгрузки из админки: она идёт внутри веб-воркера
+ADMIN_EXPORT_WORKERS = 2
+# Больше номеров заказов (bigint) не бывает
+MAX_ORDER_NUMBER = 2 ** 63 - 1
+
+
+class OrderNumberSearchMixin:
+    """
+    Search the changelist by order number without casting the key to text.
+
+    A '=id' search field compiles to UPPER(id::text) = UPPER(%s), which no
+    index serves, and being ORed with the text fields it makes every search
+    scan all partitions. Here a term of digits only is compared as an
+    integer with ``order_number_field``; any other term goes to
+    search_fields, which list only trigram-indexed columns.
+    """
+    order_number_field = 'id'
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if term.isascii() and term.isdigit():
+            number = int(term)
+            if number > MAX_ORDER_NUMBER:
+                return queryset.none(), False
+            return queryset.filter(**{self.order_number_field: number}), False
+        return super().get_search_results(request, queryset, search_term)
 
 
 class OrderItemInline(admin.TabularInline):
@@ -12,35 +52,105 @@ class OrderItemInline(admin.TabularInline):
     can_delete = False
 
 
+class OrderStatusHistoryInline(admin.TabularInline):
+    model = OrderStatusHistory
+    extra = 0
+    readonly_fields = ('old_status', 'new_status', 'changed_by', 'created_at')
+    can_delete = False
+    
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+# Выбор больше этого размера обрабатывается фоновой задачей
+BACKGROUND_STATUS_THRESHOLD = 2000
+
+
+def change_status(modeladmin, request, queryset, status):
+    """Change the status in pk-ordered chunks, in the background for large selections."""
+    order_ids = list(queryset.order_by('pk').values_list('pk', flat=True))
+    if len(order_ids) > BACKGROUND_STATUS_THRESHOLD:
+        job = OrderStatusJob.objects.create(status=status, total=len(order_ids), created_by=request.user)
+        
+        def enqueue():
+            try:
+                run_order_status_job.delay(job.pk, order_ids)
+            except Exception as e:
+                # Без брокера задачу никто не выполнит: задание не должно висеть в ожидании
+                logger.warning('Could not enqueue status job %s', job.pk, exc_info=True)
+                OrderStatusJob.objects.filter(pk=job.pk).update(
+                    state=OrderStatusJob.State.FAILED, error=f'Could not enqueue: {e}', updated_at=timezone.now()
+                )
+                modeladmin.message_user(
+                    request, _('The background status change could not be started, try again later.'),
+                    messages.ERROR
+                )
+        transaction.on_commit(enqueue)
+        return HttpResponseRedirect(reverse('admin:orders_order_status_job', args=[job.pk]))
+    
+    skipped = 0
+    if status != Order.Status.CANCELLED:
+        # Отмененные заказы в работу не возвращаются (Order.set_status)
+        skipped = Order.objects.filter(pk__in=order_ids, status=Order.Status.CANCELLED).count()
+    changed = Order.bulk_set_status(order_ids, status, changed_by=request.user)
+    modeladmin.message_user(
+        request,
+        _('Status changed for %(changed)d of %(total)d orders.') % {'changed': changed, 'total': len(order_ids)},
+        messages.SUCCESS
+    )
+    if skipped:
+        modeladmin.message_user(
+            request,
+            _('%(skipped)d cancelled orders were skipped.') % {'skipped': skipped},
+            messages.WARNING
+        )
+
+
 def mark_as_processing(modeladmin, request, queryset):
-    queryset.update(status=Order.Status.PROCESSING)
+    return change_status(modeladmin, request, queryset, Order.Status.PROCESSING)
 mark_as_processing.short_description = _("Mark selected orders as processing")
 
 
 def mark_as_shipped(modeladmin, request, queryset):
-    queryset.update(status=Order.Status.SHIPPED)
+    return change_status(modeladmin, request, queryset, Order.Status.SHIPPED)
 mark_as_shipped.short_description = _("Mark selected orders as shipped")
 
 
 def mark_as_delivered(modeladmin, request, queryset):
-    queryset.update(status=Order.Status.DELIVERED)
+    return change_status(modeladmin, request, queryset, Order.Status.DELIVERED)
 mark_as_delivered.short_description = _("Mark selected orders as delivered")
 
 
 def mark_as_cancelled(modeladmin, request, queryset):
-    queryset.update(status=Order.Status.CANCELLED)
+    # Отмена рассылает order_cancelled по каждому заказу, чтобы обновились сводки
+    return change_status(modeladmin, request, queryset, Order.Status.CANCELLED)
 mark_as_cancelled.short_description = _("Cancel selected orders")
 
 
+def export_invoices(modeladmin, request, queryset):
+    # Архив отдаётся потоком по мере рендеринга, целиком в памяти он не собирается
+    response = StreamingHttpResponse(
+        iter_invoice_zip(queryset, workers=ADMIN_EXPORT_WORKERS),
+        content_type='application/zip'
+    )
+    filename = f'invoices_{timezone.localdate():%Y%m%d}.zip'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+export_invoices.short_description = _("Download invoices for selected orders (ZIP)")
+
+
 @admin.register(Order)
-class OrderAdmin(ImportExportModelAdmin):
+class OrderAdmin(OrderNumberSearchMixin, ImportExportModelAdmin):
     list_display = ('id', 'email', 'status', 'total_cost', 'created_at', 'paid')
     list_filter = ('status', 'paid', 'created_at')
-    search_fields = ('id', 'email', 'first_name', 'last_name')
+    # Номер заказа ищет OrderNumberSearchMixin, текст — по триграммным индексам
+    search_fields = ('email', 'first_name', 'last_name')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     list_editable = ('status', 'paid')
     readonly_fields = ('created_at', 'updated_at', 'total_cost')
-    inlines = [OrderItemInline]
-    actions = [mark_as_processing, mark_as_shipped, mark_as_delivered, mark_as_cancelled]
+    inlines = [OrderItemInline, OrderStatusHistoryInline]
+    actions = [mark_as_processing, mark_as_shipped, mark_as_delivered, mark_as_cancelled, export_invoices]
     
     fieldsets = (
         (None, {
@@ -61,6 +171,57 @@ class OrderAdmin(ImportExportModelAdmin):
         }),
     )
     
+    def save_model(self, request, obj, form, change):
+        # Оплата, снятие оплаты и смена статуса из админки (и из list_editable) проходят
+        # через методы модели: они обновляют сводки и ежедневные продажи
+        paid_changed = change and 'paid' in form.changed_data
+        new_status = obj.status if change and 'status' in form.changed_data else None
+        if paid_changed:
+            obj.paid = form.initial['paid']
+        if new_status:
+            obj.status = form.initial['status']
+        super().save_model(request, obj, form, change)
+        if paid_changed:
+            if form.cleaned_data['paid']:
+                obj.mark_paid()
+            else:
+                obj.mark_unpaid()
+        if new_status and not obj.set_status(new_status, changed_by=request.user):
+            self.message_user(
+                request,
+                _('Order %(id)s is cancelled and cannot be reopened.') % {'id': obj.pk},
+                messages.WARNING
+            )
+    
+    def get_urls(self):
+        return [
+            path(
+                'status-jobs/<int:job_id>/',
+                self.admin_site.admin_view(self.status_job_view),
+                name='orders_order_status_job'
+            ),
+        ] + super().get_urls()
+    
+    def status_job_view(self, request, job_id):
+        """Progress of a background status change"""
+        job = get_object_or_404(OrderStatusJob, pk=job_id)
+        if request.GET.get('format') == 'json':
+            return JsonResponse({
+                'state': job.state,
+                'total': job.total,
+                'processed': job.processed,
+                'changed': job.changed,
+                'percent': job.percent,
+                'error': job.error,
+            })
+        context = {
+            **self.admin_site.each_context(request),
+            'title': _('Order status change'),
+            'opts': self.model._meta,
+            'job': job,
+        }
+        return TemplateResponse(request, 'admin/orders/status_job.html', context)
+    
     def get_readonly_fields(self, request, obj=None):
         if obj:  # Редактирование существующего объекта
             return self.readonly_fields + ('user', 'guest_session', 'first_name', 'last_name', 'email', 'phone', 
@@ -69,12 +230,24 @@ class OrderAdmin(ImportExportModelAdmin):
 
 
 @admin.register(OrderItem)
-class OrderItemAdmin(admin.ModelAdmin):
+class OrderItemAdmin(OrderNumberSearchMixin, admin.ModelAdmin):
     list_display = ('order', 'product', 'price', 'quantity', 'get_cost')
+    list_select_related = ('order', 'product')
     list_filter = ('created_at',)
-    search_fields = ('order__id', 'product__name')
+    search_fields = ('product__name',)
+    order_number_field = 'order_id'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     readonly_fields = ('order', 'product', 'price', 'quantity', 'created_at', 'updated_at')
     
     def get_cost(self, obj):
         return obj.get_cost()
     get_cost.short_description = _('Cost')
+
+
+@admin.register(OrderSummary)
+class OrderSummaryAdmin(admin.ModelAdmin):
+    list_display = ('user', 'order_count', 'total_spent', 'last_order_at')
+    list_select_related = ('user',)
+    search_fields = ('user__email',)
+    readonly_fields = ('user', 'order_count', 'total_spent', 'last_order_at', 'last_order_ids', 'updated_at')
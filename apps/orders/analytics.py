@@ -0,0 +1,247 @@
+"""
+Columnar analytics store for order lines.
+
+Order lines are exported to ANALYTICS_ROOT/order_lines/<YYYY-MM>/<column>.npy,
+one partition per month of the order date (Europe/Moscow); <YYYY-MM> is a
+symlink to the current version of the partition. Reports open only the
+partitions overlapping the requested range, memory-mapped, and answer with
+vectorized NumPy operations. Only the export functions touch the
+database; reports take product names from the products.json dictionary
+written alongside the partitions.
+"""
+import json
+import os
+import shutil
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+
+from apps.products.models import Product
+from .models import DailySales, Order, OrderItem
+
+
+LINES_DIR = 'order_lines'
+PRODUCTS_FILE = 'products.json'
+
+# Колонки партиции и их типы
+COLUMNS = {
+    'order_id': np.int64,
+    'local_day': 'datetime64[D]',
+    'product_id': np.int64,
+    'category_id': np.int64,
+    'quantity': np.int32,
+    'price_cents': np.int64,
+    'revenue_cents': np.int64,
+    'paid': np.bool_,
+    'cancelled': np.bool_,
+}
+
+
+def month_key(day):
+    return f'{day.year:04d}-{day.month:02d}'
+
+
+def month_range(date_from, date_to):
+    """Month keys 'YYYY-MM' covering [date_from, date_to]."""
+    months = []
+    current = date(date_from.year, date_from.month, 1)
+    while current <= date_to:
+        months.append(month_key(current))
+        current = (current + timedelta(days=32)).replace(day=1)
+    return months
+
+
+def _cents(value):
+    return int(value * 100)
+
+
+class OrderLinesStore:
+    """Month-partitioned, memory-mapped columns of order lines."""
+
+    def __init__(self, root=None):
+        self.root = root or settings.ANALYTICS_ROOT
+
+    @property
+    def lines_root(self):
+        return os.path.join(self.root, LINES_DIR)
+
+    def months(self):
+        """Exported month partitions, sorted."""
+        if not os.path.isdir(self.lines_root):
+            return []
+        return sorted(name for name in os.listdir(self.lines_root) if not name.startswith('.'))
+
+    def write_partition(self, month, columns):
+        """
+        Atomically replace one month partition with the given column arrays.
+
+        Every export is written to a new hidden version directory; <month> is
+        a symlink to the current one, switched with os.replace, so readers see
+        either the old or the new partition and nothing is left to collide
+        with the next export.
+        """
+        os.makedirs(self.lines_root, exist_ok=True)
+        version_dir = tempfile.mkdtemp(prefix=f'.{month}-', dir=self.lines_root)
+        for name, dtype in COLUMNS.items():
+            np.save(os.path.join(version_dir, f'{name}.npy'), np.asarray(columns[name], dtype=dtype))
+        target = os.path.join(self.lines_root, month)
+        previous = None
+        if os.path.islink(target):
+            previous = os.path.join(self.lines_root, os.readlink(target))
+        elif os.path.isdir(target):
+            # Партиция, выгруженная до перехода на симлинки: убираем ее в скрытый каталог
+            previous = tempfile.mkdtemp(prefix=f'.{month}-', dir=self.lines_root)
+            os.rename(target, previous)
+        link = version_dir + '.link'
+        os.symlink(os.path.basename(version_dir), link)
+        os.replace(link, target)
+        if previous:
+            shutil.rmtree(previous, ignore_errors=True)
+
+    def write_products(self, products):
+        """Store the {product_id: name} dictionary used to label reports."""
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, PRODUCTS_FILE)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({str(pk): name for pk, name in products.items()}, f, ensure_ascii=False)
+        os.replace(path + '.tmp', path)
+
+    def product_names(self):
+        try:
+            with open(os.path.join(self.root, PRODUCTS_FILE), encoding='utf-8') as f:
+                return {int(pk): name for pk, name in json.load(f).items()}
+        except FileNotFoundError:
+            return {}
+
+    def load(self, date_from, date_to, columns, include_unpaid=False):
+        """
+        Return {column: array} for lines dated within [date_from, date_to].
+
+        Only partitions overlapping the range are opened; by default only
+        lines of paid, non-cancelled orders are returned.
+        """
+        wanted = set(columns) | {'local_day', 'paid', 'cancelled'}
+        available = set(self.months())
+        parts = {name: [] for name in wanted}
+        for month in month_range(date_from, date_to):
+            if month not in available:
+                continue
+            # Одна версия партиции на все колонки, даже если ее сейчас заменяют
+            part_dir = os.path.realpath(os.path.join(self.lines_root, month))
+            for name in wanted:
+                parts[name].append(np.load(os.path.join(part_dir, f'{name}.npy'), mmap_mode='r'))
+
+        data = {
+            name: np.concatenate(arrays) if arrays else np.empty(0, dtype=COLUMNS[name])
+            for name, arrays in parts.items()
+        }
+        days = data['local_day']
+        mask = (days >= np.datetime64(date_from, 'D')) & (days <= np.datetime64(date_to, 'D'))
+        if not include_unpaid:
+            mask &= data['paid'] & ~data['cancelled']
+        return {name: data[name][mask] for name in columns}
+
+
+def export_month(month_start, store=None, chunk_size=5000):
+    """
+    Rewrite the partition of the month starting at ``month_start`` from the
+    database. Returns the number of exported lines.
+    """
+    store = store or OrderLinesStore()
+    month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    start, end = DailySales.day_bounds(month_start, month_end)
+    columns = {name: [] for name in COLUMNS}
+    rows = (
+        OrderItem.objects
+        .filter(created_at__gte=start, order__created_at__gte=start, order__created_at__lt=end)
+        .order_by('order_id', 'id')
+        .values_list('order_id', 'order__created_at', 'product_id', 'product__category_id',
+                     'quantity', 'price', 'order__paid', 'order__status')
+        .iterator(chunk_size=chunk_size)
+    )
+    for order_id, created_at, product_id, category_id, quantity, price, paid, status in rows:
+        price_cents = _cents(price)
+        columns['order_id'].append(order_id)
+        columns['local_day'].append(DailySales.local_date(created_at))
+        columns['product_id'].append(product_id)
+        columns['category_id'].append(category_id)
+        columns['quantity'].append(quantity)
+        columns['price_cents'].append(price_cents)
+        columns['revenue_cents'].append(price_cents * quantity)
+        columns['paid'].append(paid)
+        columns['cancelled'].append(status == Order.Status.CANCELLED)
+    store.write_partition(month_key(month_start), columns)
+    return len(columns['order_id'])
+
+
+def export_products(store=None):
+    store = store or OrderLinesStore()
+    store.write_products(dict(Product.objects.values_list('id', 'name')))
+
+
+def _period_starts(days, period):
+    if period == 'day':
+        return days
+    if period == 'week':
+        # 1970-01-01 был четвергом: сдвигаем к понедельнику
+        ordinals = days.astype(np.int64)
+        return (ordinals - (ordinals + 3) % 7).astype('datetime64[D]')
+    if period == 'month':
+        return days.astype('datetime64[M]').astype('datetime64[D]')
+    raise ValueError(f'Unknown period: {period}')
+
+
+def revenue_by_period(date_from, date_to, period='day', store=None):
+    """
+    Revenue of paid orders per day/week/month: [(period_start, revenue, orders), ...].
+    """
+    store = store or OrderLinesStore()
+    data = store.load(date_from, date_to, ['local_day', 'order_id', 'revenue_cents'])
+    if not len(data['order_id']):
+        return []
+    periods, inverse = np.unique(_period_starts(data['local_day'], period), return_inverse=True)
+    revenue = np.bincount(inverse, weights=data['revenue_cents'], minlength=len(periods))
+    # Количество различных заказов в периоде: уникальные пары (период, заказ)
+    pairs = np.unique(np.stack([inverse, data['order_id']]), axis=1)
+    orders = np.bincount(pairs[0], minlength=len(periods))
+    return [
+        (periods[i].astype(date), Decimal(int(round(revenue[i]))) / 100, int(orders[i]))
+        for i in range(len(periods))
+    ]
+
+
+def top_products(date_from, date_to, limit=10, store=None):
+    """
+    Best-selling products by revenue: [(product_id, name, units, revenue), ...].
+    """
+    store = store or OrderLinesStore()
+    data = store.load(date_from, date_to, ['product_id', 'quantity', 'revenue_cents'])
+    if not len(data['product_id']):
+        return []
+    product_ids, inverse = np.unique(data['product_id'], return_inverse=True)
+    revenue = np.bincount(inverse, weights=data['revenue_cents'], minlength=len(product_ids))
+    units = np.bincount(inverse, weights=data['quantity'], minlength=len(product_ids))
+    order = np.argsort(-revenue, kind='stable')[:limit]
+    names = store.product_names()
+    return [
+        (int(product_ids[i]), names.get(int(product_ids[i]), ''), int(units[i]),
+         Decimal(int(round(revenue[i]))) / 100)
+        for i in order
+    ]
+
+
+def basket_size_distribution(date_from, date_to, store=None):
+    """
+    Number of orders per basket size (units in the order): [(units, orders), ...].
+    """
+    store = store or OrderLinesStore()
+    data = store.load(date_from, date_to, ['order_id', 'quantity'])
+    if not len(data['order_id']):
+        return []
+    _order_ids, inverse = np.unique(data['order_id'], return_inverse=True)
+    basket_sizes = np.bincount(inverse, weights=data['quantity']).astype(np.int64)
+    sizes, counts = np.unique(basket_sizes, return_counts=True)
+    return [(int(size), int(count)) for size, count in zip(sizes, counts)]
@@ -3,4 +3,7 @@ from django.apps import AppConfig
 class OrdersConfig(AppConfig):
 	default_auto_field = 'django.db.models.BigAutoField'
 	name = 'apps.orders'
-	verbose_name = 'Заказы'
\ No newline at end of file
+	verbose_name = 'Заказы'
+
+	def ready(self):
+		from . import receivers  # noqa: F401
@@ -0,0 +1,214 @@
+"""
+Archive of cold orders in compressed JSON Lines files.
+
+archive_orders() moves delivered and cancelled orders created before a
+cutoff out of the live tables. Each pk-ordered chunk of one Moscow month
+is written to ORDER_ARCHIVE_ROOT/<YYYY-MM>/<first id>-<last id>.jsonl.gz
+and deleted from orders_order, orders_orderitem and the status history in
+the same transaction that creates its ArchivedOrder index rows.
+
+A file is a concatenation of gzip members of BLOCK_SIZE orders each (a
+valid .gz file for zcat and friends). ArchivedOrder stores the offset and
+length of the member holding an order, so load() reads and decompresses
+one block instead of the whole file.
+
+Aggregates are not touched: OrderSummary and DailySales keep counting the
+archived orders, and OrderSummary.rebuild() reads ArchivedOrder as well.
+"""
+import gzip
+import json
+import os
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+
+from .models import ArchivedOrder, DailySales, Order, OrderItem, OrderStatusHistory
+
+
+# Статусы, после которых заказ больше не меняется
+ARCHIVE_STATUSES = (Order.Status.DELIVERED, Order.Status.CANCELLED)
+
+ORDER_FIELDS = (
+    'id', 'user_id', 'guest_session_id', 'first_name', 'last_name', 'email', 'address',
+    'postal_code', 'city', 'phone', 'status', 'paid', 'total_cost', 'items_count',
+    'snapshot', 'created_at', 'updated_at',
+)
+
+# Заказов в одном gzip-блоке: чем меньше, тем быстрее поиск и хуже сжатие
+BLOCK_SIZE = 64
+
+
+def _month_start(day):
+    return day.replace(day=1)
+
+
+def _next_month(day):
+    return (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def order_record(order, items, history):
+    """JSON-ready dict with everything needed to restore ``order``."""
+    record = {name: getattr(order, name) for name in ORDER_FIELDS}
+    record['items'] = [
+        [item.product_id, item.price, item.quantity, item.created_at] for item in items
+    ]
+    record['status_history'] = [
+        [entry.old_status, entry.new_status, entry.changed_by_id, entry.created_at] for entry in history
+    ]
+    return record
+
+
+def _encode(record):
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':'), default=str)
+
+
+def order_from_record(record):
+    """Unsaved, read-only Order restored from an archive record."""
+    fields = {name: record[name] for name in ORDER_FIELDS}
+    fields['created_at'] = parse_datetime(fields['created_at'])
+    fields['updated_at'] = parse_datetime(fields['updated_at'])
+    order = Order(**fields)
+    order.archived = True
+    order.archived_items = record['items']
+    order.archived_status_history = record['status_history']
+    return order
+
+
+class OrderArchive:
+    """Reads and writes the archive files under ``root``."""
+
+    def __init__(self, root=None):
+        self.root = root or settings.ORDER_ARCHIVE_ROOT
+
+    def write_chunk(self, records):
+        """
+        Write ``records`` (pk-ordered, one month) to a new file.
+        Returns unsaved ArchivedOrder rows and the number of bytes written.
+        """
+        first = records[0]
+        relative = os.path.join(
+            f'{DailySales.local_date(first["created_at"]):%Y-%m}', f'{first["id"]}-{records[-1]["id"]}.jsonl.gz'
+        )
+        path = os.path.join(self.root, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        entries = []
+        offset = 0
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for start in range(0, len(records), BLOCK_SIZE):
+                    block = records[start:start + BLOCK_SIZE]
+                    member = gzip.compress(
+                        ''.join(_encode(record) + '\n' for record in block).encode(), compresslevel=6
+                    )
+                    f.write(member)
+                    entries.extend(
+                        ArchivedOrder(
+                            id=record['id'], user_id=record['user_id'], created_at=record['created_at'],
+                            status=record['status'], paid=record['paid'], total_cost=record['total_cost'],
+                            items_count=record['items_count'], path=relative, offset=offset, length=len(member),
+                        )
+                        for record in block
+                    )
+                    offset += len(member)
+                f.flush()
+                # Файл должен лечь на диск до того, как заказы удалятся из базы
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return entries, offset
+
+    def read(self, entry):
+        """The archive record of ``entry`` (an ArchivedOrder)."""
+        with open(os.path.join(self.root, entry.path), 'rb') as f:
+            f.seek(entry.offset)
+            block = gzip.decompress(f.read(entry.length))
+        prefix = f'{{"id":{entry.id},'.encode()
+        for line in block.splitlines():
+            if line.startswith(prefix):
+                return json.loads(line)
+        raise LookupError(f'Order {entry.id} is missing from {entry.path}')
+
+    def load(self, order_id, **filters):
+        """
+        The archived order ``order_id`` as an unsaved Order, or None.
+        ``filters`` restrict the lookup, e.g. user=request.user.
+        """
+        entry = ArchivedOrder.objects.filter(pk=order_id, **filters).first()
+        if entry is None:
+            return None
+        return order_from_record(self.read(entry))
+
+
+def table_sizes(tables=('orders_order', 'orders_orderitem', 'orders_orderstatushistory')):
+    """{table: bytes on disk including indexes and all partitions}."""
+    sizes = {}
+    with connection.cursor() as cursor:
+        for table in tables:
+            cursor.execute(
+                "SELECT COALESCE(SUM(pg_total_relation_size(relid)), 0) FROM pg_partition_tree(%s::regclass)",
+                [table]
+            )
+            sizes[table] = cursor.fetchone()[0] or 0
+    return sizes
+
+
+def archive_orders(cutoff, chunk_size=500, archive=None, progress=None):
+    """
+    Move orders with a final status created before ``cutoff`` into the archive.
+
+    Works month by month and, within a month, in pk-ordered chunks; every
+    chunk is locked, written, indexed and deleted in one short transaction.
+    ``progress(month, archived, bytes)`` is called after each chunk.
+    Returns (orders archived, compressed bytes written).
+    """
+    archive = archive or OrderArchive()
+    eligible = Order.objects.filter(created_at__lt=cutoff, status__in=ARCHIVE_STATUSES)
+    first = eligible.order_by('created_at').values_list('created_at', flat=True).first()
+    archived = written = 0
+    if first is None:
+        return archived, written
+
+    month = _month_start(DailySales.local_date(first))
+    while True:
+        start, end = DailySales.day_bounds(month, _next_month(month) - timedelta(days=1))
+        if start >= cutoff:
+            break
+        month_orders = eligible.filter(created_at__gte=start, created_at__lt=min(end, cutoff))
+        last_pk = 0
+        while True:
+            with transaction.atomic():
+                orders = list(
+                    month_orders.select_for_update().filter(pk__gt=last_pk).order_by('pk')[:chunk_size]
+                )
+                if not orders:
+                    break
+                last_pk = orders[-1].pk
+                ids = [order.pk for order in orders]
+                # created_at__gte отсекает секции старше месяца
+                items, history = {}, {}
+                for item in OrderItem.objects.filter(order_id__in=ids, created_at__gte=start).order_by('id'):
+                    items.setdefault(item.order_id, []).append(item)
+                for entry in OrderStatusHistory.objects.filter(order_id__in=ids).order_by('id'):
+                    history.setdefault(entry.order_id, []).append(entry)
+                records = [
+                    order_record(order, items.get(order.pk, ()), history.get(order.pk, ()))
+                    for order in orders
+                ]
+                entries, size = archive.write_chunk(records)
+                ArchivedOrder.objects.bulk_create(entries)
+                OrderStatusHistory.objects.filter(order_id__in=ids).delete()
+                OrderItem.objects.filter(order_id__in=ids, created_at__gte=start).delete()
+                Order.objects.filter(pk__in=ids, created_at__gte=start, created_at__lt=end).delete()
+            archived += len(orders)
+            written += size
+            if progress:
+                progress(month, archived, written)
+        month = _next_month(month)
+    return archived, written
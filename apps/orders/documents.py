@@ -0,0 +1,76 @@
+"""
+Content-addressed cache of rendered order documents (invoices and receipts).
+
+A document is stored under DOCUMENTS_ROOT/<kind>/<aa>/<sha256>.pdf, where the
+hash covers the renderer version and every order field the document shows.
+A changed order therefore gets a new file, while repeat downloads of an
+unchanged order are a plain file read. Concurrent misses are collapsed with
+one lock file per <aa> directory, so a document is rendered at most once and
+the lock files do not pile up next to the documents.
+"""
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+
+from django.conf import settings
+
+from apps.core.instrumentation import phase
+from .pdf_utils import generate_invoice_pdf, generate_receipt_pdf
+
+
+# Увеличивать при любом изменении вёрстки документов
+RENDERER_VERSION = 3
+
+RENDERERS = {
+    'invoice': generate_invoice_pdf,
+    'receipt': generate_receipt_pdf,
+}
+
+
+def document_key(order, kind):
+    """SHA-256 of everything the ``kind`` document of ``order`` depends on."""
+    content = [
+        kind, RENDERER_VERSION, order.pk, order.created_at.isoformat(),
+        order.get_full_name(), order.phone, order.email, order.address,
+        order.snapshot,
+    ]
+    if kind == 'receipt':
+        content.append(order.paid)
+    raw = json.dumps(content, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def document_path(order, kind):
+    key = document_key(order, kind)
+    return os.path.join(settings.DOCUMENTS_ROOT, kind, key[:2], f'{key}.pdf')
+
+
+def get_document(order, kind):
+    """
+    Return the path of the rendered ``kind`` document, rendering it on a miss.
+    """
+    if kind not in RENDERERS:
+        raise ValueError(f'Unknown document kind: {kind}')
+    path = document_path(order, kind)
+    if os.path.exists(path):
+        return path
+
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    # Один файл блокировки на каталог: их не больше 256 на вид документа
+    with open(os.path.join(directory, '.lock'), 'w') as lock:
+        # Ждём, пока другой процесс дорисует тот же документ
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            if not os.path.exists(path):
+                with phase('pdf'):
+                    pdf = RENDERERS[kind](order)
+                fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(pdf)
+                os.replace(tmp_path, path)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+    return path
@@ -0,0 +1,87 @@
+import random
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from apps.orders.archive import ARCHIVE_STATUSES, OrderArchive, archive_orders, table_sizes
+from apps.orders.models import ArchivedOrder, DailySales, Order
+
+
+def _mb(size):
+    return f'{size / 1024 / 1024:.1f} МБ'
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит выполненные и отмененные заказы старше заданного срока '
+        'в сжатый архив (gzip JSONL по месяцам) и удаляет их из рабочих таблиц'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=730,
+                            help='Архивировать заказы старше стольких дней (по умолчанию два года)')
+        parser.add_argument('--before', type=datetime.fromisoformat,
+                            help='Граница по дате заказа (ГГГГ-ММ-ДД), вместо --older-than-days')
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Заказов в одной транзакции и одном файле')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только посчитать подходящие заказы')
+        parser.add_argument('--vacuum', action='store_true',
+                            help='Выполнить VACUUM ANALYZE таблиц после переноса')
+        parser.add_argument('--sample', type=int, default=200,
+                            help='Сколько архивных заказов прочитать для замера задержки поиска')
+
+    def handle(self, *args, **options):
+        if options['before']:
+            cutoff = options['before'].replace(tzinfo=DailySales.TIME_ZONE)
+        else:
+            cutoff = timezone.now() - timedelta(days=options['older_than_days'])
+        if cutoff > timezone.now():
+            raise CommandError('Граница архивации в будущем')
+
+        eligible = Order.objects.filter(created_at__lt=cutoff, status__in=ARCHIVE_STATUSES)
+        if options['dry_run']:
+            self.stdout.write(f'Подходящих заказов до {cutoff:%Y-%m-%d}: {eligible.count()}')
+            return
+
+        before = table_sizes()
+
+        def progress(month, archived, written):
+            self.stdout.write(f'{month:%Y-%m}: перенесено {archived}, архив {_mb(written)}')
+
+        archive = OrderArchive()
+        archived, written = archive_orders(cutoff, chunk_size=options['chunk_size'], archive=archive, progress=progress)
+        self.stdout.write(self.style.SUCCESS(f'Перенесено заказов: {archived}, записано {_mb(written)} ({archive.root})'))
+        if not archived:
+            return
+
+        if options['vacuum']:
+            with connection.cursor() as cursor:
+                for table in before:
+                    cursor.execute(f'VACUUM ANALYZE {connection.ops.quote_name(table)}')
+        after = table_sizes()
+        for table, size in before.items():
+            self.stdout.write(f'{table}: {_mb(size)} -> {_mb(after[table])}')
+        if not options['vacuum']:
+            self.stdout.write(
+                'Место удаленных строк освобождается после VACUUM и переиспользуется '
+                'под новые строки; файлы на диске уменьшает только VACUUM FULL/pg_repack'
+            )
+        self.report_lookup_latency(archive, options['sample'])
+
+    def report_lookup_latency(self, archive, sample):
+        ids = list(ArchivedOrder.objects.order_by('-archived_at').values_list('id', flat=True)[:sample * 10])
+        if not ids or sample <= 0:
+            return
+        timings = []
+        for order_id in random.sample(ids, min(sample, len(ids))):
+            started = time.perf_counter()
+            archive.load(order_id)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        p50 = timings[len(timings) // 2]
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(f'Поиск в архиве ({len(timings)} заказов): p50 {p50:.2f} мс, p95 {p95:.2f} мс')
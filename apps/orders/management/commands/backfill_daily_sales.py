@@ -0,0 +1,47 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+
+from apps.orders.models import ArchivedOrder, DailySales, Order
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает таблицу ежедневных продаж из заказов (повторный запуск безопасен)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date-from', type=date.fromisoformat,
+                            help='Первый день (ГГГГ-ММ-ДД), по умолчанию дата первого заказа')
+        parser.add_argument('--date-to', type=date.fromisoformat,
+                            help='Последний день (ГГГГ-ММ-ДД), по умолчанию сегодня')
+        parser.add_argument('--chunk-days', type=int, default=31,
+                            help='Количество дней, пересчитываемых за одну транзакцию')
+
+    def handle(self, *args, **options):
+        date_to = options['date_to'] or DailySales.local_date(timezone.now())
+        date_from = options['date_from']
+        if date_from is None:
+            first_order_at = Order.objects.aggregate(first=Min('created_at'))['first']
+            if first_order_at is None:
+                self.stdout.write('Заказов нет, пересчитывать нечего')
+                return
+            date_from = DailySales.local_date(first_order_at)
+        if date_from > date_to:
+            raise CommandError('--date-from позже --date-to')
+        # Архивных заказов нет в таблицах, по которым идёт пересчёт
+        archived_until = ArchivedOrder.last_day()
+        if archived_until and date_from <= archived_until:
+            raise CommandError(
+                f'Заказы по {archived_until} включительно в архиве, укажите --date-from позже этой даты'
+            )
+
+        rows = 0
+        chunk_start = date_from
+        while chunk_start <= date_to:
+            chunk_end = min(chunk_start + timedelta(days=options['chunk_days'] - 1), date_to)
+            rows += DailySales.rebuild_range(chunk_start, chunk_end)
+            self.stdout.write(f'{chunk_start} — {chunk_end}: готово')
+            chunk_start = chunk_end + timedelta(days=1)
+
+        self.stdout.write(self.style.SUCCESS(f'Готово, строк: {rows}'))
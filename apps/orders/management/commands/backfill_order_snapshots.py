@@ -0,0 +1,51 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.orders.models import Order, OrderItem
+
+
+class Command(BaseCommand):
+    help = 'Строит снимки строк для заказов, оформленных до появления поля snapshot'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Количество заказов, обрабатываемых за одну транзакцию')
+        parser.add_argument('--force', action='store_true',
+                            help='Пересобрать снимки и для заказов, у которых они уже есть')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        orders = Order.objects.order_by('pk')
+        if not options['force']:
+            orders = orders.filter(snapshot={})
+
+        processed = 0
+        last_pk = 0
+        while True:
+            chunk = list(orders.filter(pk__gt=last_pk).only('pk')[:chunk_size])
+            if not chunk:
+                break
+            last_pk = chunk[-1].pk
+
+            lines = defaultdict(list)
+            items = OrderItem.objects.filter(
+                order_id__in=[order.pk for order in chunk]
+            ).select_related('product').order_by('order_id', 'id')
+            for item in items:
+                lines[item.order_id].append(
+                    (item.product_id, item.product.slug, item.product.name, item.price, item.quantity,
+                     item.product.image.name)
+                )
+
+            for order in chunk:
+                order.apply_snapshot(Order.build_snapshot(lines[order.pk]))
+
+            with transaction.atomic():
+                Order.objects.bulk_update(chunk, ['snapshot', 'total_cost', 'items_count'])
+
+            processed += len(chunk)
+            self.stdout.write(f'Обработано заказов: {processed}')
+
+        self.stdout.write(self.style.SUCCESS(f'Готово, снимков построено: {processed}'))
@@ -0,0 +1,35 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.orders.models import ArchivedOrder, DailySales
+
+
+class Command(BaseCommand):
+    help = 'Сверяет таблицу ежедневных продаж с исходными заказами'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date-from', type=date.fromisoformat,
+                            help='Первый день (ГГГГ-ММ-ДД), по умолчанию 30 дней назад')
+        parser.add_argument('--date-to', type=date.fromisoformat,
+                            help='Последний день (ГГГГ-ММ-ДД), по умолчанию сегодня')
+
+    def handle(self, *args, **options):
+        date_to = options['date_to'] or DailySales.local_date(timezone.now())
+        date_from = options['date_from'] or date_to - timedelta(days=30)
+        # Архивных заказов нет в таблицах, по которым идёт пересчёт
+        archived_until = ArchivedOrder.last_day()
+        if archived_until and date_from <= archived_until:
+            raise CommandError(
+                f'Заказы по {archived_until} включительно в архиве, укажите --date-from позже этой даты'
+            )
+
+        mismatches = DailySales.find_mismatches(date_from, date_to)
+        for (day, category_id), stored, expected in mismatches:
+            self.stdout.write(
+                f'{day} категория={category_id or "все"}: в таблице {stored}, по заказам {expected}'
+            )
+        if mismatches:
+            raise CommandError(f'Расхождений: {len(mismatches)}. Запустите backfill_daily_sales за этот период.')
+        self.stdout.write(self.style.SUCCESS(f'{date_from} — {date_to}: расхождений нет'))
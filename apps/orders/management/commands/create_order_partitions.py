@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+from django.utils import timezone
+
+from apps.orders import partitioning
+
+
+class Command(BaseCommand):
+    help = (
+        'Заранее создает месячные секции таблиц заказов и позиций заказов. '
+        'Запускать по расписанию (например, раз в сутки), чтобы новые заказы '
+        'не попадали в секцию по умолчанию'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, default=partitioning.PREMAKE_MONTHS,
+                            help='На сколько месяцев вперед, начиная с текущего, создавать секции')
+
+    def handle(self, *args, **options):
+        if options['months'] < 1:
+            raise CommandError('--months должен быть положительным')
+        today = timezone.now().astimezone(partitioning.TIME_ZONE).date()
+        first_month = partitioning.month_start(today)
+
+        for table in partitioning.PARTITIONED_TABLES:
+            if not partitioning.is_partitioned(table):
+                raise CommandError(f'Таблица {table} не секционирована, сначала примените миграции')
+            try:
+                created = partitioning.ensure_partitions(table, first_month, options['months'])
+            except DatabaseError as e:
+                # Обычно это строки нужного месяца, уже попавшие в секцию по умолчанию
+                raise CommandError(f'{table}: не удалось создать секцию: {e}')
+            for name in created:
+                self.stdout.write(f'Создана секция {name}')
+
+        self.stdout.write(self.style.SUCCESS('Секции созданы'))
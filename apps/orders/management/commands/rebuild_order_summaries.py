@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.accounts.models import User
+from apps.orders.models import OrderSummary
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает сводки по заказам пользователей из таблицы заказов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Количество пользователей, пересчитываемых за одну транзакцию')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        users = User.objects.order_by('pk').values_list('pk', flat=True)
+
+        processed = 0
+        last_pk = 0
+        while True:
+            user_ids = list(users.filter(pk__gt=last_pk)[:chunk_size])
+            if not user_ids:
+                break
+            last_pk = user_ids[-1]
+
+            with transaction.atomic():
+                processed += OrderSummary.rebuild(user_ids)
+            self.stdout.write(f'Пересчитано сводок: {processed}')
+
+        self.stdout.write(self.style.SUCCESS(f'Готово, сводок: {processed}'))
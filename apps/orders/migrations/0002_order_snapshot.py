@@ -0,0 +1,20 @@
+# Generated by Django 5.2.8 on 2026-10-19 05:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="snapshot",
+            field=models.JSONField(
+                blank=True, default=dict, editable=False, verbose_name="snapshot"
+            ),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-19 05:09
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Индекс строится CONCURRENTLY, чтобы не блокировать запись в orders_order
+    atomic = False
+
+    dependencies = [
+        ("accounts", "0001_initial"),
+        ("orders", "0002_order_snapshot"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="items_count",
+            field=models.PositiveIntegerField(default=0, verbose_name="items count"),
+        ),
+        AddIndexConcurrently(
+            model_name="order",
+            index=models.Index(
+                fields=["user", "-created_at", "-id"], name="order_user_created_idx"
+            ),
+        ),
+    ]
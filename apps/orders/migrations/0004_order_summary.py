@@ -0,0 +1,65 @@
+# Generated by Django 5.2.8 on 2026-10-19 05:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0001_initial"),
+        ("orders", "0003_order_items_count_history_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OrderSummary",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="order_summary",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="user",
+                    ),
+                ),
+                (
+                    "order_count",
+                    models.PositiveIntegerField(default=0, verbose_name="order count"),
+                ),
+                (
+                    "total_spent",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=12,
+                        verbose_name="total spent",
+                    ),
+                ),
+                (
+                    "last_order_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="last order at"
+                    ),
+                ),
+                (
+                    "last_order_ids",
+                    models.JSONField(
+                        blank=True, default=list, verbose_name="last order ids"
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="updated at"),
+                ),
+            ],
+            options={
+                "verbose_name": "order summary",
+                "verbose_name_plural": "order summaries",
+            },
+        ),
+    ]
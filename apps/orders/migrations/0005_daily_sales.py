@@ -0,0 +1,66 @@
+# Generated by Django 5.2.8 on 2026-10-19 05:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0004_order_summary"),
+        ("products", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailySales",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField(verbose_name="date")),
+                (
+                    "order_count",
+                    models.IntegerField(default=0, verbose_name="order count"),
+                ),
+                ("units", models.IntegerField(default=0, verbose_name="units")),
+                (
+                    "revenue",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=14,
+                        verbose_name="revenue",
+                    ),
+                ),
+                (
+                    "category",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_sales",
+                        to="products.category",
+                        verbose_name="category",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "daily sales",
+                "verbose_name_plural": "daily sales",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("date", "category"),
+                        name="daily_sales_date_category_uniq",
+                        nulls_distinct=False,
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.8 on 2026-10-19 05:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+from apps.orders import partitioning
+
+
+def partition_tables(apps, schema_editor):
+    # Всё, что старше месяца после следующего, остаётся в секции *_history
+    today = timezone.now().astimezone(partitioning.TIME_ZONE).date()
+    bound = partitioning.add_months(partitioning.month_start(today), 2)
+    for table in partitioning.PARTITIONED_TABLES:
+        partitioning.convert_to_partitioned(table, bound, schema_editor.connection)
+        partitioning.ensure_partitions(
+            table, bound, partitioning.PREMAKE_MONTHS, schema_editor.connection
+        )
+
+
+class Migration(migrations.Migration):
+    # Конвертация строит индексы CONCURRENTLY и сама управляет транзакциями
+    atomic = False
+
+    dependencies = [
+        ("orders", "0007_order_status_history"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="orderitem",
+            name="order",
+            field=models.ForeignKey(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="items",
+                to="orders.order",
+                verbose_name="order",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="orderstatushistory",
+            name="order",
+            field=models.ForeignKey(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="status_history",
+                to="orders.order",
+                verbose_name="order",
+            ),
+        ),
+        migrations.RunPython(partition_tables, elidable=False),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 5.2.8 on 2026-10-19 05:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0008_partition_orders_by_month"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedOrder",
+            fields=[
+                (
+                    "id",
+                    models.BigIntegerField(
+                        primary_key=True, serialize=False, verbose_name="order id"
+                    ),
+                ),
+                ("created_at", models.DateTimeField(verbose_name="created at")),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("PENDING", "Pending"),
+                            ("PROCESSING", "Processing"),
+                            ("SHIPPED", "Shipped"),
+                            ("DELIVERED", "Delivered"),
+                            ("CANCELLED", "Cancelled"),
+                        ],
+                        max_length=20,
+                        verbose_name="status",
+                    ),
+                ),
+                ("paid", models.BooleanField(default=False, verbose_name="paid")),
+                (
+                    "total_cost",
+                    models.DecimalField(
+                        decimal_places=2, max_digits=10, verbose_name="total cost"
+                    ),
+                ),
+                (
+                    "items_count",
+                    models.PositiveIntegerField(default=0, verbose_name="items count"),
+                ),
+                ("path", models.CharField(max_length=255, verbose_name="archive file")),
+                ("offset", models.BigIntegerField(verbose_name="offset")),
+                ("length", models.PositiveIntegerField(verbose_name="length")),
+                (
+                    "archived_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="archived at"),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="archived_orders",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="user",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "archived order",
+                "verbose_name_plural": "archived orders",
+                "indexes": [
+                    models.Index(
+                        fields=["user", "-created_at"], name="archived_order_user_idx"
+                    )
+                ],
+            },
+        ),
+    ]
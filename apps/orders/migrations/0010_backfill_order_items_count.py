@@ -0,0 +1,42 @@
+# Generated by Django 5.2.8 on 2026-10-19 09:12
+
+from django.db import migrations
+
+# Заказов за одну транзакцию: UPDATE всей таблицы держал бы блокировки строк до конца
+CHUNK_SIZE = 10000
+
+
+def backfill_items_count(apps, schema_editor):
+    # items_count появился в 0003 со значением 0; у заказов со снимком он считается из строк снимка
+    # (количество - пятый элемент строки в любой версии снимка)
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('SELECT MIN(id), MAX(id) FROM orders_order')
+        low, high = cursor.fetchone()
+        if low is None:
+            return
+        for start in range(low, high + 1, CHUNK_SIZE):
+            cursor.execute(
+                """
+                UPDATE orders_order AS o
+                SET items_count = (
+                    SELECT COALESCE(SUM((line ->> 4)::integer), 0)
+                    FROM jsonb_array_elements(o.snapshot -> 'lines') AS line
+                )
+                WHERE o.id >= %s AND o.id < %s AND o.items_count = 0
+                  AND jsonb_typeof(o.snapshot -> 'lines') = 'array'
+                """,
+                [start, start + CHUNK_SIZE]
+            )
+
+
+class Migration(migrations.Migration):
+    # Каждая пачка фиксируется отдельно
+    atomic = False
+
+    dependencies = [
+        ("orders", "0009_archived_order"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_items_count, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,30 @@
+from collections import namedtuple
+from datetime import datetime, time, timedelta
 from decimal import Decimal
-from django.db import models
+from zoneinfo import ZoneInfo
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db import connection, models, transaction
+from django.db.models import Count, F, Max, Q, Sum, Window
+from django.db.models.functions import RowNumber, TruncDate, Upper
+from django.core.files.storage import default_storage
 from django.core.validators import MinValueValidator
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from apps.core.models import TimeStampedModel
-from apps.products.models import Product
+from apps.products.models import Category, Product
 from apps.accounts.models import User, GuestSession
+from .signals import order_placed, order_paid, order_unpaid, order_cancelled
+
+
+class OrderLine(namedtuple('OrderLine', ('product_id', 'slug', 'name', 'price', 'quantity', 'cost', 'image'))):
+    """Order line decoded from the snapshot (no OrderItem/Product queries)."""
+    __slots__ = ()
+    
+    @property
+    def image_url(self):
+        # Путь в хранилище, как в ImageField.name: URL строится без запроса к Product
+        return default_storage.url(self.image) if self.image else ''
 
 
 class Order(TimeStampedModel):
@@ -52,24 +71,226 @@ class Order(TimeStampedModel):
         default=0,
         verbose_name=_('total cost')
     )
+    items_count = models.PositiveIntegerField(default=0, verbose_name=_('items count'))
+    # Неизменяемый снимок строк заказа на момент оформления:
+    # {"v": 2, "lines": [[product_id, slug, name, price, quantity, cost, image], ...], "total": "..."}
+    # (в версии 1 у строк нет image)
+    snapshot = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name=_('snapshot')
+    )
+    
+    SNAPSHOT_VERSION = 2
+    # Сколько заказов меняет статус в одной транзакции при массовых операциях
+    STATUS_CHUNK_SIZE = 500
+    # True у заказов, восстановленных из архива (см. ArchivedOrder)
+    archived = False
     
     class Meta:
         verbose_name = _('order')
         verbose_name_plural = _('orders')
         ordering = ('-created_at',)
+        indexes = [
+            # История заказов пользователя с keyset-пагинацией по (created_at, id)
+            models.Index(fields=['user', '-created_at', '-id'], name='order_user_created_idx'),
+            # Поиск в админке (icontains = UPPER(...) LIKE) по триграммам
+            GinIndex(OpClass(Upper('email'), name='gin_trgm_ops'), name='order_email_trgm_idx'),
+            GinIndex(OpClass(Upper('first_name'), name='gin_trgm_ops'), name='order_first_name_trgm_idx'),
+            GinIndex(OpClass(Upper('last_name'), name='gin_trgm_ops'), name='order_last_name_trgm_idx'),
+        ]
     
     def __str__(self):
         return f"Order {self.id}"
     
+    def get_full_name(self):
+        return f"{self.first_name} {self.last_name}".strip()
+    
     def get_total_cost(self):
         """Calculate total cost of the order."""
+        if self.snapshot:
+            return Decimal(self.snapshot['total'])
         return sum(item.get_cost() for item in self.items.all())
     
-    def save(self, *args, **kwargs):
-        if not self.pk:
-            # Новый заказ, устанавливаем общую стоимость
-            self.total_cost = self.get_total_cost()
-        super().save(*args, **kwargs)
+    @property
+    def lines(self):
+        """Order lines decoded from the snapshot."""
+        return [
+            OrderLine(product_id, slug, name, Decimal(price), quantity, Decimal(cost), image[0] if image else '')
+            for product_id, slug, name, price, quantity, cost, *image in self.snapshot.get('lines', ())
+        ]
+    
+    @classmethod
+    def build_snapshot(cls, lines):
+        """
+        Build a snapshot from (product_id, slug, name, price, quantity, image) tuples.
+        
+        image is the storage name of the product image ('' if there is none).
+        """
+        encoded = []
+        total = Decimal('0')
+        for product_id, slug, name, price, quantity, image in lines:
+            price = Decimal(price)
+            cost = price * quantity
+            total += cost
+            encoded.append([product_id, slug, name, f'{price:.2f}', quantity, f'{cost:.2f}', image or ''])
+        return {'v': cls.SNAPSHOT_VERSION, 'lines': encoded, 'total': f'{total:.2f}'}
+    
+    def apply_snapshot(self, snapshot):
+        """Set the snapshot together with the columns denormalized from it."""
+        self.snapshot = snapshot
+        self.total_cost = snapshot['total']
+        self.items_count = sum(line[4] for line in snapshot['lines'])
+    
+    def add_items_from_cart(self, cart):
+        """
+        Create order items from the cart and store the snapshot in one pass.
+        
+        This is the last step of placing an order, so it sends order_placed.
+        """
+        items = []
+        lines = []
+        for item in cart:
+            product = item['product']
+            items.append(OrderItem(
+                order=self,
+                product=product,
+                price=item['price'],
+                quantity=item['quantity']
+            ))
+            lines.append((product.id, product.slug, product.name, item['price'], item['quantity'], product.image.name))
+        OrderItem.objects.bulk_create(items)
+        self.apply_snapshot(self.build_snapshot(lines))
+        self.save(update_fields=['snapshot', 'total_cost', 'items_count', 'updated_at'])
+        order_placed.send(sender=Order, order=self)
+        return items
+    
+    def _lock(self):
+        """Lock the order row; returns its current (status, paid) or None."""
+        row = Order.objects.select_for_update().filter(pk=self.pk).values_list('status', 'paid').first()
+        if row is not None:
+            # Сигналы получают актуальные статус и оплату, а не устаревший экземпляр
+            self.status, self.paid = row
+        return row
+    
+    def mark_paid(self):
+        """
+        Mark the order as paid. Returns False if it was already paid.
+        """
+        # Блокировка строки защищает от двойной обработки одного и того же платежа
+        with transaction.atomic():
+            if self._lock() is None or self.paid:
+                return False
+            Order.objects.filter(pk=self.pk).update(paid=True, updated_at=timezone.now())
+            self.paid = True
+            order_paid.send(sender=Order, order=self)
+        return True
+    
+    def mark_unpaid(self):
+        """
+        Take the payment back, reversing what mark_paid() counted.
+        Returns False if the order was not paid.
+        """
+        with transaction.atomic():
+            if self._lock() is None or not self.paid:
+                return False
+            Order.objects.filter(pk=self.pk).update(paid=False, updated_at=timezone.now())
+            self.paid = False
+            order_unpaid.send(sender=Order, order=self)
+        return True
+    
+    def cancel(self, changed_by=None):
+        """
+        Cancel the order. Returns False if it was already cancelled.
+        """
+        with transaction.atomic():
+            if self._lock() is None or self.status == self.Status.CANCELLED:
+                return False
+            old_status = self.status
+            Order.objects.filter(pk=self.pk).update(status=self.Status.CANCELLED, updated_at=timezone.now())
+            self.status = self.Status.CANCELLED
+            OrderStatusHistory.objects.create(
+                order=self, old_status=old_status, new_status=self.status, changed_by=changed_by
+            )
+            order_cancelled.send(sender=Order, order=self, was_paid=self.paid)
+        return True
+    
+    def set_status(self, status, changed_by=None):
+        """
+        Change the order status, routing cancellation through cancel().
+        
+        A cancelled order stays cancelled: returns False instead of reopening
+        it, since its sales and rollups have already been reverted.
+        """
+        if status == self.Status.CANCELLED:
+            return self.cancel(changed_by=changed_by)
+        with transaction.atomic():
+            if self._lock() is None or self.status == self.Status.CANCELLED:
+                return False
+            old_status = self.status
+            if old_status != status:
+                Order.objects.filter(pk=self.pk).update(status=status, updated_at=timezone.now())
+                self.status = status
+                OrderStatusHistory.objects.create(
+                    order=self, old_status=old_status, new_status=status, changed_by=changed_by
+                )
+        return True
+    
+    @classmethod
+    def bulk_set_status(cls, order_ids, status, changed_by=None, chunk_size=None, progress=None):
+        """
+        Change the status of many orders in pk-ordered chunks.
+        
+        Every chunk is its own short transaction: rows are locked in pk order,
+        changed with one UPDATE and their history is written with bulk_create,
+        so checkout is never blocked for longer than one chunk. Cancellations
+        still send order_cancelled per order; cancelled orders are never moved
+        to another status (see set_status()). ``progress(processed, total)``
+        is called after each chunk. Returns the number of orders changed.
+        """
+        chunk_size = chunk_size or cls.STATUS_CHUNK_SIZE
+        order_ids = sorted(set(order_ids))
+        total = len(order_ids)
+        cancelling = status == cls.Status.CANCELLED
+        changed = 0
+        for start in range(0, total, chunk_size):
+            chunk = order_ids[start:start + chunk_size]
+            with transaction.atomic():
+                orders = cls.objects.select_for_update().filter(pk__in=chunk).exclude(status=status).order_by('pk')
+                if not cancelling:
+                    # Для отмены нужен весь заказ (сводки, продажи), иначе хватает статуса
+                    orders = orders.exclude(status=cls.Status.CANCELLED).only('id', 'status')
+                orders = list(orders)
+                if orders:
+                    cls.objects.filter(pk__in=[order.pk for order in orders]).update(
+                        status=status, updated_at=timezone.now()
+                    )
+                    OrderStatusHistory.objects.bulk_create([
+                        OrderStatusHistory(
+                            order_id=order.pk, old_status=order.status, new_status=status, changed_by=changed_by
+                        )
+                        for order in orders
+                    ])
+                    if cancelling:
+                        for order in orders:
+                            order.status = status
+                            order_cancelled.send(sender=cls, order=order, was_paid=order.paid)
+            changed += len(orders)
+            if progress:
+                progress(start + len(chunk), total)
+        return changed
+    
+    def refresh_snapshot(self, save=True):
+        """Rebuild the snapshot from the stored order items."""
+        items = self.items.select_related('product').order_by('id')
+        self.apply_snapshot(self.build_snapshot(
+            (item.product_id, item.product.slug, item.product.name, item.price, item.quantity,
+             item.product.image.name)
+            for item in items
+        ))
+        if save:
+            self.save(update_fields=['snapshot', 'total_cost', 'items_count', 'updated_at'])
 
 
 class OrderItem(TimeStampedModel):
@@ -78,6 +299,8 @@ class OrderItem(TimeStampedModel):
         Order,
         related_name='items',
         on_delete=models.CASCADE,
+        # orders_order секционирована, ключ (id, created_at): внешний ключ на id базой не проверяется
+        db_constraint=False,
         verbose_name=_('order')
     )
     product = models.ForeignKey(
@@ -107,3 +330,440 @@ class OrderItem(TimeStampedModel):
     def get_cost(self):
         """Calculate cost of the order item."""
         return self.price * self.quantity
+
+
+class OrderStatusHistory(models.Model):
+    """Status changes of an order."""
+    order = models.ForeignKey(
+        Order,
+        related_name='status_history',
+        on_delete=models.CASCADE,
+        # orders_order секционирована, ключ (id, created_at): внешний ключ на id базой не проверяется
+        db_constraint=False,
+        verbose_name=_('order')
+    )
+    old_status = models.CharField(max_length=20, choices=Order.Status.choices, verbose_name=_('old status'))
+    new_status = models.CharField(max_length=20, choices=Order.Status.choices, verbose_name=_('new status'))
+    changed_by = models.ForeignKey(
+        User,
+        null=True,
+        blank=True,
+        related_name='+',
+        on_delete=models.SET_NULL,
+        verbose_name=_('changed by')
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('created at'))
+    
+    class Meta:
+        verbose_name = _('order status change')
+        verbose_name_plural = _('order status history')
+        ordering = ('-created_at', '-id')
+        indexes = [
+            models.Index(fields=['order', '-created_at'], name='order_status_history_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.order_id}: {self.old_status} -> {self.new_status}"
+
+
+class OrderStatusJob(TimeStampedModel):
+    """Bulk status change started from the admin and run in the background."""
+    
+    class State(models.TextChoices):
+        PENDING = 'PENDING', _('Pending')
+        RUNNING = 'RUNNING', _('Running')
+        DONE = 'DONE', _('Done')
+        FAILED = 'FAILED', _('Failed')
+    
+    status = models.CharField(max_length=20, choices=Order.Status.choices, verbose_name=_('status'))
+    state = models.CharField(max_length=10, choices=State.choices, default=State.PENDING, verbose_name=_('state'))
+    total = models.PositiveIntegerField(default=0, verbose_name=_('total'))
+    processed = models.PositiveIntegerField(default=0, verbose_name=_('processed'))
+    changed = models.PositiveIntegerField(default=0, verbose_name=_('changed'))
+    error = models.TextField(blank=True, verbose_name=_('error'))
+    created_by = models.ForeignKey(
+        User,
+        null=True,
+        blank=True,
+        related_name='+',
+        on_delete=models.SET_NULL,
+        verbose_name=_('created by')
+    )
+    
+    class Meta:
+        verbose_name = _('order status job')
+        verbose_name_plural = _('order status jobs')
+    
+    def __str__(self):
+        return f"Status job {self.id}"
+    
+    @property
+    def finished(self):
+        return self.state in (self.State.DONE, self.State.FAILED)
+    
+    @property
+    def percent(self):
+        return int(self.processed * 100 / self.total) if self.total else 100
+    
+    def run(self, order_ids):
+        """Apply the status change, recording progress after every chunk."""
+        OrderStatusJob.objects.filter(pk=self.pk).update(state=self.State.RUNNING, updated_at=timezone.now())
+        
+        def progress(processed, total):
+            OrderStatusJob.objects.filter(pk=self.pk).update(processed=processed, updated_at=timezone.now())
+        
+        try:
+            self.changed = Order.bulk_set_status(
+                order_ids, self.status, changed_by=self.created_by, progress=progress
+            )
+        except Exception as e:
+            OrderStatusJob.objects.filter(pk=self.pk).update(
+                state=self.State.FAILED, error=str(e), updated_at=timezone.now()
+            )
+            raise
+        OrderStatusJob.objects.filter(pk=self.pk).update(
+            state=self.State.DONE, processed=self.total, changed=self.changed, updated_at=timezone.now()
+        )
+
+
+class OrderSummary(models.Model):
+    """
+    Per-user rollup of order history, maintained incrementally on
+    order_placed / order_paid / order_unpaid / order_cancelled.
+    
+    order_count counts orders that are not cancelled, total_spent sums paid
+    orders that are not cancelled, last_order_ids keeps the newest orders.
+    """
+    LAST_ORDERS = 5
+    
+    user = models.OneToOneField(
+        User,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='order_summary',
+        verbose_name=_('user')
+    )
+    order_count = models.PositiveIntegerField(default=0, verbose_name=_('order count'))
+    total_spent = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        verbose_name=_('total spent')
+    )
+    last_order_at = models.DateTimeField(null=True, blank=True, verbose_name=_('last order at'))
+    last_order_ids = models.JSONField(default=list, blank=True, verbose_name=_('last order ids'))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_('updated at'))
+    
+    class Meta:
+        verbose_name = _('order summary')
+        verbose_name_plural = _('order summaries')
+    
+    def __str__(self):
+        return f"Summary for {self.user_id}"
+    
+    @classmethod
+    def for_user(cls, user):
+        """Return the rollup for the user with a single primary-key lookup."""
+        return cls.objects.filter(pk=user.pk).first() or cls(user=user)
+    
+    @classmethod
+    def record_placed(cls, order):
+        with transaction.atomic():
+            summary = cls.objects.select_for_update().filter(pk=order.user_id).first()
+            if summary is None:
+                # Сводки ещё нет: строим её целиком, новый заказ уже в таблице
+                cls.rebuild([order.user_id])
+                return
+            summary.order_count += 1
+            if order.paid:
+                summary.total_spent += order.total_cost
+            if summary.last_order_at is None or order.created_at >= summary.last_order_at:
+                summary.last_order_at = order.created_at
+            summary.last_order_ids = ([order.pk] + summary.last_order_ids)[:cls.LAST_ORDERS]
+            summary.save()
+    
+    @classmethod
+    def record_paid(cls, order):
+        if order.status == Order.Status.CANCELLED:
+            return
+        updated = cls.objects.filter(pk=order.user_id).update(
+            total_spent=F('total_spent') + order.total_cost, updated_at=timezone.now()
+        )
+        if not updated:
+            cls.rebuild([order.user_id])
+    
+    @classmethod
+    def record_unpaid(cls, order):
+        if order.status == Order.Status.CANCELLED:
+            return
+        updated = cls.objects.filter(pk=order.user_id).update(
+            total_spent=F('total_spent') - order.total_cost, updated_at=timezone.now()
+        )
+        if not updated:
+            cls.rebuild([order.user_id])
+    
+    @classmethod
+    def record_cancelled(cls, order, was_paid):
+        changes = {'order_count': F('order_count') - 1, 'updated_at': timezone.now()}
+        if was_paid:
+            changes['total_spent'] = F('total_spent') - order.total_cost
+        updated = cls.objects.filter(pk=order.user_id).update(**changes)
+        if not updated:
+            cls.rebuild([order.user_id])
+    
+    @classmethod
+    def rebuild(cls, user_ids):
+        """
+        Recompute the rollups of the given users from the orders table.
+        """
+        user_ids = list(user_ids)
+        active = ~Q(status=Order.Status.CANCELLED)
+        summaries = {
+            user_id: cls(user_id=user_id, last_order_ids=[])
+            for user_id in User.objects.filter(pk__in=user_ids).values_list('pk', flat=True)
+        }
+        last_orders = {}
+        # Архивные заказы по-прежнему входят в сводку
+        for model in (Order, ArchivedOrder):
+            totals = model.objects.filter(user_id__in=user_ids).values('user_id').annotate(
+                order_count=Count('id', filter=active),
+                total_spent=Sum('total_cost', filter=active & Q(paid=True), default=0),
+                last_order_at=Max('created_at'),
+            ).order_by()
+            for row in totals:
+                summary = summaries[row['user_id']]
+                summary.order_count += row['order_count']
+                summary.total_spent += row['total_spent']
+                if summary.last_order_at is None or row['last_order_at'] > summary.last_order_at:
+                    summary.last_order_at = row['last_order_at']
+            # Последние N заказов каждого пользователя одним запросом
+            rows = model.objects.filter(user_id__in=user_ids).annotate(
+                row_number=Window(
+                    RowNumber(),
+                    partition_by=F('user_id'),
+                    order_by=[F('created_at').desc(), F('id').desc()],
+                )
+            ).filter(row_number__lte=cls.LAST_ORDERS).values_list('user_id', 'created_at', 'id')
+            for user_id, created_at, order_id in rows:
+                last_orders.setdefault(user_id, []).append((created_at, order_id))
+        for user_id, orders in last_orders.items():
+            summaries[user_id].last_order_ids = [
+                order_id for _created_at, order_id in sorted(orders, reverse=True)[:cls.LAST_ORDERS]
+            ]
+        
+        cls.objects.bulk_create(
+            summaries.values(),
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=['order_count', 'total_spent', 'last_order_at', 'last_order_ids', 'updated_at'],
+        )
+        return len(summaries)
+
+
+class DailySales(models.Model):
+    """
+    Daily sales facts keyed by (date in Europe/Moscow, category).
+    
+    Only paid, non-cancelled orders are counted. The row with an empty
+    category holds the totals of the day, so that orders spanning several
+    categories are counted once.
+    """
+    TIME_ZONE = ZoneInfo('Europe/Moscow')
+    
+    date = models.DateField(verbose_name=_('date'))
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='daily_sales',
+        verbose_name=_('category')
+    )
+    order_count = models.IntegerField(default=0, verbose_name=_('order count'))
+    units = models.IntegerField(default=0, verbose_name=_('units'))
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name=_('revenue'))
+    
+    class Meta:
+        verbose_name = _('daily sales')
+        verbose_name_plural = _('daily sales')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'category'],
+                nulls_distinct=False,
+                name='daily_sales_date_category_uniq',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.date} / {self.category_id or 'all'}"
+    
+    @classmethod
+    def local_date(cls, moment):
+        return moment.astimezone(cls.TIME_ZONE).date()
+    
+    @classmethod
+    def day_bounds(cls, date_from, date_to):
+        """UTC-aware bounds [start of date_from, start of date_to + 1) in Moscow time."""
+        start = datetime.combine(date_from, time.min, tzinfo=cls.TIME_ZONE)
+        end = datetime.combine(date_to + timedelta(days=1), time.min, tzinfo=cls.TIME_ZONE)
+        return start, end
+    
+    @classmethod
+    def _order_rows(cls, order):
+        """Per-category (category_id, units, revenue) of one order plus the day total."""
+        rows = list(
+            # created_at__gte ограничивает поиск секциями не старше заказа
+            OrderItem.objects.filter(
+                order_id=order.pk, created_at__gte=order.created_at
+            ).values_list('product__category_id').annotate(
+                units=Sum('quantity'),
+                revenue=Sum(F('price') * F('quantity')),
+            ).order_by()
+        )
+        rows.append((None, sum(row[1] for row in rows), sum(row[2] for row in rows)))
+        return rows
+    
+    @classmethod
+    def apply_order(cls, order, sign=1):
+        """
+        Add (sign=1) or subtract (sign=-1) an order to the facts of its day.
+        """
+        day = cls.local_date(order.created_at)
+        params = [
+            (day, category_id, sign, sign * units, sign * revenue)
+            for category_id, units, revenue in cls._order_rows(order)
+        ]
+        table = cls._meta.db_table
+        # Инкрементальный upsert: строка дня/категории создаётся при первой продаже
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"""
+                INSERT INTO {table} (date, category_id, order_count, units, revenue)
+                VALUES (%s, %s, %s, %s, %s)
+                ON CONFLICT (date, category_id) DO UPDATE SET
+                    order_count = {table}.order_count + EXCLUDED.order_count,
+                    units = {table}.units + EXCLUDED.units,
+                    revenue = {table}.revenue + EXCLUDED.revenue
+                """,
+                params,
+            )
+    
+    @classmethod
+    def aggregate_raw(cls, date_from, date_to):
+        """
+        Aggregate the facts from orders and order items, keyed by (date, category_id).
+        """
+        start, end = cls.day_bounds(date_from, date_to)
+        items = OrderItem.objects.filter(
+            # Позиции создаются вместе с заказом, не раньше него: условие отсекает старые секции
+            created_at__gte=start,
+            order__paid=True,
+            order__created_at__gte=start,
+            order__created_at__lt=end,
+        ).exclude(order__status=Order.Status.CANCELLED).annotate(
+            day=TruncDate('order__created_at', tzinfo=cls.TIME_ZONE),
+        ).order_by()
+        
+        facts = {}
+        by_category = items.values_list('day', 'product__category_id').annotate(
+            order_count=Count('order_id', distinct=True),
+            units=Sum('quantity'),
+            revenue=Sum(F('price') * F('quantity')),
+        )
+        by_day = items.values_list('day').annotate(
+            order_count=Count('order_id', distinct=True),
+            units=Sum('quantity'),
+            revenue=Sum(F('price') * F('quantity')),
+        )
+        for day, category_id, order_count, units, revenue in by_category:
+            facts[(day, category_id)] = (order_count, units, revenue)
+        for day, order_count, units, revenue in by_day:
+            facts[(day, None)] = (order_count, units, revenue)
+        return facts
+    
+    @classmethod
+    def rebuild_range(cls, date_from, date_to):
+        """
+        Replace the facts of [date_from, date_to] with values recomputed from raw data.
+        Idempotent: running it twice gives the same table.
+        """
+        facts = cls.aggregate_raw(date_from, date_to)
+        with transaction.atomic():
+            cls.objects.filter(date__gte=date_from, date__lte=date_to).delete()
+            cls.objects.bulk_create(
+                cls(date=day, category_id=category_id, order_count=order_count, units=units, revenue=revenue)
+                for (day, category_id), (order_count, units, revenue) in facts.items()
+            )
+        return len(facts)
+    
+    @classmethod
+    def find_mismatches(cls, date_from, date_to):
+        """
+        Compare the table with the raw data. Returns [(key, stored, expected), ...].
+        """
+        expected = cls.aggregate_raw(date_from, date_to)
+        stored = {
+            (row.date, row.category_id): (row.order_count, row.units, row.revenue)
+            for row in cls.objects.filter(date__gte=date_from, date__lte=date_to)
+            # Строки, обнулённые отменами, эквивалентны отсутствующим
+            if row.order_count or row.units or row.revenue
+        }
+        return [
+            (key, stored.get(key), expected.get(key))
+            for key in sorted(set(stored) | set(expected), key=lambda key: (key[0], key[1] or 0))
+            if stored.get(key) != expected.get(key)
+        ]
+
+
+class ArchivedOrder(models.Model):
+    """
+    Index row of an order moved out of the live tables by archive_orders.
+    
+    The full order (fields, items, status history) lives in a gzip JSONL file;
+    path/offset/length point at the gzip member that holds it, so a lookup
+    reads and decompresses one small block. The columns shown in order lists
+    and summaries are kept here, so those never touch the files.
+    """
+    id = models.BigIntegerField(primary_key=True, verbose_name=_('order id'))
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='archived_orders',
+        verbose_name=_('user')
+    )
+    created_at = models.DateTimeField(verbose_name=_('created at'))
+    status = models.CharField(max_length=20, choices=Order.Status.choices, verbose_name=_('status'))
+    paid = models.BooleanField(default=False, verbose_name=_('paid'))
+    total_cost = models.DecimalField(max_digits=10, decimal_places=2, verbose_name=_('total cost'))
+    items_count = models.PositiveIntegerField(default=0, verbose_name=_('items count'))
+    path = models.CharField(max_length=255, verbose_name=_('archive file'))
+    offset = models.BigIntegerField(verbose_name=_('offset'))
+    length = models.PositiveIntegerField(verbose_name=_('length'))
+    archived_at = models.DateTimeField(auto_now_add=True, verbose_name=_('archived at'))
+    
+    class Meta:
+        verbose_name = _('archived order')
+        verbose_name_plural = _('archived orders')
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='archived_order_user_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Archived order {self.id}"
+    
+    def as_order(self):
+        """Unsaved Order with the list columns, for order lists and summaries."""
+        order = Order(
+            id=self.id, user_id=self.user_id, created_at=self.created_at, status=self.status,
+            paid=self.paid, total_cost=self.total_cost, items_count=self.items_count
+        )
+        order.archived = True
+        return order
+    
+    @classmethod
+    def last_day(cls):
+        """Moscow date of the newest archived order, or None."""
+        newest = cls.objects.aggregate(newest=Max('created_at'))['newest']
+        return DailySales.local_date(newest) if newest else None
@@ -0,0 +1,234 @@
+"""
+Monthly range partitioning of the orders tables by created_at.
+
+convert_to_partitioned() turns an existing table into a partitioned one
+without rewriting it. The old table becomes the "<table>_history" partition
+covering everything before a bound:
+
+1. outside a transaction, build a unique (id, created_at) index
+   CONCURRENTLY and add a NOT VALID CHECK (created_at < bound), then
+   VALIDATE it; neither step blocks writes;
+2. in one short transaction, rename the table, create the partitioned
+   parent with the same columns, constraints and index names, and ATTACH
+   the old table. The validated CHECK lets ATTACH skip the scan, and the
+   existing indexes and foreign keys are adopted instead of rebuilt.
+
+New months get their own "<table>_pYYYYMM" partitions (Moscow months, like
+the sales reports); a DEFAULT partition catches anything not pre-created.
+The primary key of a partitioned table must include the partition key, so
+it becomes (id, created_at), and foreign keys *to* these tables cannot be
+enforced by the database (db_constraint=False on the model side). Indexes
+on partitioned tables cannot be built CONCURRENTLY: add them to the
+partitions first and then to the parent, which adopts them.
+"""
+from datetime import date, datetime, time
+from zoneinfo import ZoneInfo
+
+from django.db import connection as default_connection, connections, transaction
+
+
+PARTITIONED_TABLES = ('orders_order', 'orders_orderitem')
+PARTITION_KEY = 'created_at'
+TIME_ZONE = ZoneInfo('Europe/Moscow')
+# На сколько месяцев вперёд секции создаются заранее
+PREMAKE_MONTHS = 3
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def add_months(day, months):
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_bound(day):
+    """Timestamp literal of the Moscow midnight starting ``day``."""
+    return datetime.combine(day, time.min, tzinfo=TIME_ZONE).isoformat()
+
+
+def partition_name(table, month):
+    return f'{table}_p{month:%Y%m}'
+
+
+def history_name(table):
+    return f'{table}_history'
+
+
+def _qn(name):
+    return default_connection.ops.quote_name(name)
+
+
+def is_partitioned(table, connection=default_connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", [table])
+        return cursor.fetchone() is not None
+
+
+def partition_bounds(table, connection=default_connection):
+    """{partition name: bound expression} of the partitions of ``table``."""
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+            FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = to_regclass(%s)
+        """, [table])
+        return dict(cursor.fetchall())
+
+
+def history_bound(table, connection=default_connection):
+    """First month not covered by the history partition (None if there is none)."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT (regexp_match(pg_get_expr(relpartbound, oid), 'TO \\(''([^'']+)''\\)'))[1]::timestamptz "
+            "FROM pg_class WHERE oid = to_regclass(%s)",
+            [history_name(table)]
+        )
+        row = cursor.fetchone()
+    if not row or row[0] is None:
+        return None
+    return row[0].astimezone(TIME_ZONE).date()
+
+
+def convert_to_partitioned(table, bound, connection=default_connection):
+    """
+    Convert ``table`` into a table partitioned by month, keeping its rows
+    in the history partition (created_at < ``bound``, a month start).
+
+    Must run outside a transaction (uses CREATE INDEX CONCURRENTLY).
+    """
+    if is_partitioned(table, connection):
+        return
+    history = history_name(table)
+    check_name = f'{history}_bound'
+    unique_index = f'{table}_id_created_uniq'
+    with connection.cursor() as cursor:
+        # Шаг 1: всё, что требует чтения всей таблицы, делаем без блокировки записи
+        cursor.execute(
+            f'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {_qn(unique_index)} '
+            f'ON {_qn(table)} (id, {PARTITION_KEY})'
+        )
+        cursor.execute(
+            f'ALTER TABLE {_qn(table)} ADD CONSTRAINT {_qn(check_name)} '
+            f'CHECK ({PARTITION_KEY} < %s) NOT VALID', [month_bound(bound)]
+        )
+        cursor.execute(f'ALTER TABLE {_qn(table)} VALIDATE CONSTRAINT {_qn(check_name)}')
+
+    # Шаг 2: короткая транзакция с подменой таблицы
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {_qn(table)} IN ACCESS EXCLUSIVE MODE')
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+        sequence = cursor.fetchone()[0]
+        cursor.execute(
+            "SELECT attidentity <> '' FROM pg_attribute WHERE attrelid = to_regclass(%s) AND attname = 'id'",
+            [table]
+        )
+        identity = cursor.fetchone()[0]
+        cursor.execute(f'SELECT last_value FROM {sequence}')
+        next_id = cursor.fetchone()[0] + 1
+        cursor.execute(f'SELECT COALESCE(MAX(id), 0) + 1 FROM {_qn(table)}')
+        next_id = max(next_id, cursor.fetchone()[0])
+
+        cursor.execute("""
+            SELECT conname, pg_get_constraintdef(oid), contype, conindid
+            FROM pg_constraint WHERE conrelid = to_regclass(%s) AND conname <> %s
+        """, [table, check_name])
+        constraints = cursor.fetchall()
+        constraint_indexes = {conindid for _name, _definition, _type, conindid in constraints}
+        cursor.execute("""
+            SELECT index_class.relname, pg_get_indexdef(pg_index.indexrelid), pg_index.indexrelid
+            FROM pg_index JOIN pg_class index_class ON index_class.oid = pg_index.indexrelid
+            WHERE pg_index.indrelid = to_regclass(%s)
+        """, [table])
+        # Определения индексов ссылаются на имя таблицы, которое перейдёт к родителю
+        indexes = [
+            (name, definition) for name, definition, oid in cursor.fetchall()
+            if oid not in constraint_indexes and name != unique_index
+        ]
+        primary_key = next(name for name, _definition, kind, _index in constraints if kind == 'p')
+
+        cursor.execute(f'ALTER TABLE {_qn(table)} RENAME TO {_qn(history)}')
+        if identity:
+            # Последовательность identity удаляется вместе с ним, родитель получит новую
+            cursor.execute(f'ALTER TABLE {_qn(history)} ALTER COLUMN id DROP IDENTITY')
+        else:
+            cursor.execute(f'ALTER TABLE {_qn(history)} ALTER COLUMN id DROP DEFAULT')
+        cursor.execute(f'ALTER TABLE {_qn(history)} DROP CONSTRAINT {_qn(primary_key)}')
+        cursor.execute(
+            f'ALTER TABLE {_qn(history)} ADD CONSTRAINT {_qn(history + "_pkey")} '
+            f'PRIMARY KEY USING INDEX {_qn(unique_index)}'
+        )
+        for name, _definition in indexes:
+            cursor.execute(f'ALTER INDEX {_qn(name)} RENAME TO {_qn(_history_index_name(name))}')
+
+        cursor.execute(
+            f'CREATE TABLE {_qn(table)} (LIKE {_qn(history)} INCLUDING DEFAULTS INCLUDING STORAGE) '
+            f'PARTITION BY RANGE ({PARTITION_KEY})'
+        )
+        if identity:
+            cursor.execute(f'CREATE SEQUENCE {sequence} START WITH {int(next_id)} OWNED BY {_qn(table)}.id')
+        else:
+            cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY {_qn(table)}.id')
+        cursor.execute(f"ALTER TABLE {_qn(table)} ALTER COLUMN id SET DEFAULT nextval('{sequence}')")
+        cursor.execute(f'ALTER TABLE {_qn(table)} ADD CONSTRAINT {_qn(primary_key)} PRIMARY KEY (id, {PARTITION_KEY})')
+        for name, definition, kind, _index in constraints:
+            if kind in ('c', 'f'):
+                cursor.execute(f'ALTER TABLE {_qn(table)} ADD CONSTRAINT {_qn(name)} {definition}')
+        for _name, definition in indexes:
+            cursor.execute(definition)
+        cursor.execute(
+            f"ALTER TABLE {_qn(table)} ATTACH PARTITION {_qn(history)} FOR VALUES FROM (MINVALUE) TO (%s)",
+            [month_bound(bound)]
+        )
+        cursor.execute(f'CREATE TABLE {_qn(table + "_default")} PARTITION OF {_qn(table)} DEFAULT')
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {_qn(history)} DROP CONSTRAINT {_qn(check_name)}')
+
+
+def _history_index_name(name):
+    return f'{name[:54]}_history'
+
+
+def ensure_partitions(table, first_month, months, connection=default_connection):
+    """
+    Create monthly partitions of ``table`` for ``months`` months starting at
+    ``first_month``, skipping existing ones and the history range.
+    Returns the names of the partitions created.
+    """
+    existing = partition_bounds(table, connection)
+    covered_until = history_bound(table, connection)
+    created = []
+    for offset in range(months):
+        month = add_months(month_start(first_month), offset)
+        name = partition_name(table, month)
+        if name in existing or (covered_until and month < covered_until):
+            continue
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TABLE {_qn(name)} PARTITION OF {_qn(table)} FOR VALUES FROM (%s) TO (%s)',
+                [month_bound(month), month_bound(add_months(month, 1))]
+            )
+        created.append(name)
+    return created
+
+
+def explain_relations(queryset):
+    """Names of the tables/partitions the planner will scan for ``queryset``."""
+    sql, params = queryset.query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+
+    relations = set()
+
+    def walk(node):
+        if 'Relation Name' in node:
+            relations.add(node['Relation Name'])
+        for child in node.get('Plans', ()):
+            walk(child)
+
+    walk(plan[0]['Plan'])
+    return relations
@@ -1,201 +1,240 @@
+"""
+Invoice and receipt rendering with reportlab.
+
+Fonts, paragraph styles and table styles are built once per process on the
+first render. The renderers take flat, pre-formatted DocumentData, so they
+never touch the ORM; generate_invoice_pdf/generate_receipt_pdf are thin
+wrappers that flatten an Order first.
+
+reportlab is imported inside the functions: it costs about 100 ms, and the
+views, tasks and admin that import this module should not pay for it at
+process start, only on the first render.
+"""
+import os
+from collections import namedtuple
+from functools import cache
 from io import BytesIO
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import mm
-
-# Get default styles
-styles = getSampleStyleSheet()
-
-# Add custom styles
-styles.add(ParagraphStyle(
-    name='CustomTitle',
-    parent=styles['Heading1'],
-    fontSize=16,
-    spaceAfter=14,
-    fontName='Helvetica-Bold'
-))
+from types import SimpleNamespace
+from xml.sax.saxutils import escape
+
+from django.utils import timezone
 
-styles.add(ParagraphStyle(
-    name='CustomHeader',
-    parent=styles['Normal'],
-    fontSize=10,
-    textColor=colors.white,
-    fontName='Helvetica-Bold'
-))
 
-styles.add(ParagraphStyle(
-    name='CustomText',
-    parent=styles['Normal'],
-    fontSize=10,
-    fontName='Helvetica'
+# Каталоги, где ищем DejaVu (нужна кириллица); пакет fonts-dejavu-core в Debian
+FONT_DIRS = [
+    os.environ.get('PDF_FONT_DIR', ''),
+    '/usr/share/fonts/truetype/dejavu',
+    '/usr/share/fonts/dejavu',
+    '/usr/local/share/fonts',
+]
+
+# Сколько символов названия помещается в строку чека без переноса
+RECEIPT_NAME_WIDTH = 40
+
+DocumentData = namedtuple('DocumentData', (
+    'number', 'date', 'time', 'customer', 'phone', 'email', 'address',
+    'lines', 'total', 'paid',
 ))
 
-def generate_invoice_pdf(order):
-    """Генерация PDF счета на оплату"""
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(
-        buffer,
-        pagesize=A4,
-        rightMargin=20*mm,
-        leftMargin=20*mm,
-        topMargin=20*mm,
-        bottomMargin=20*mm
+
+@cache
+def _fonts():
+    """Register DejaVu Serif once; fall back to Helvetica if it is not installed."""
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+
+    for directory in filter(None, FONT_DIRS):
+        regular = os.path.join(directory, 'DejaVuSerif.ttf')
+        bold = os.path.join(directory, 'DejaVuSerif-Bold.ttf')
+        if os.path.exists(regular) and os.path.exists(bold):
+            pdfmetrics.registerFont(TTFont('DejaVuSerif', regular))
+            pdfmetrics.registerFont(TTFont('DejaVuSerif-Bold', bold))
+            pdfmetrics.registerFontFamily('DejaVuSerif', normal='DejaVuSerif', bold='DejaVuSerif-Bold')
+            return 'DejaVuSerif', 'DejaVuSerif-Bold'
+    return 'Helvetica', 'Helvetica-Bold'
+
+
+@cache
+def _templates():
+    """Paragraph and table styles shared by every document."""
+    from reportlab.lib import colors
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import TableStyle
+
+    regular, bold = _fonts()
+    base = getSampleStyleSheet()
+    text = ParagraphStyle('DocText', parent=base['Normal'], fontName=regular, fontSize=10)
+    small = ParagraphStyle('DocSmall', parent=text, fontSize=8, leading=10)
+    heading = ParagraphStyle('DocHeading', parent=base['Heading3'], fontName=bold)
+    return SimpleNamespace(
+        title=ParagraphStyle('DocTitle', parent=base['Heading1'], fontName=bold, fontSize=16, spaceAfter=14),
+        heading=heading,
+        text=text,
+        small=small,
+        receipt_heading=ParagraphStyle('ReceiptHeading', parent=heading, fontSize=11),
+        company=TableStyle([
+            ('FONTNAME', (0, 0), (-1, -1), regular),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+            ('TOPPADDING', (0, 0), (-1, -1), 6),
+            ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+        ]),
+        invoice_lines=TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#333333')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), bold),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+            ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+            ('FONTNAME', (0, 1), (-1, -1), regular),
+            ('ALIGN', (1, 1), (1, -1), 'LEFT'),
+            ('ALIGN', (3, 1), (-1, -1), 'RIGHT'),
+            ('LINEBELOW', (0, 0), (-1, -2), 1, colors.lightgrey),
+            ('LINEABOVE', (0, -1), (-1, -1), 1, colors.black),
+            ('BOTTOMPADDING', (0, -1), (-1, -1), 10),
+            ('TOPPADDING', (0, -1), (-1, -1), 10),
+            ('FONTNAME', (0, -1), (-2, -1), bold),
+        ]),
+        receipt_lines=TableStyle([
+            ('FONTNAME', (0, 0), (-1, -1), regular),
+            ('FONTSIZE', (0, 0), (-1, -1), 8),
+            ('LEADING', (0, 0), (-1, -1), 10),
+            ('LEFTPADDING', (0, 0), (-1, -1), 0),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 0),
+            ('TOPPADDING', (0, 0), (-1, -1), 1),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 1),
+            ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ]),
     )
 
-    # Заголовок
-    elements = [Paragraph('СЧЕТ НА ОПЛАТУ', styles['CustomTitle'])]
-    
 
+def document_data(order):
+    """Flatten an order into the pre-formatted data the renderers need."""
+    # Местное время, как в шаблонах: вечерние заказы в UTC попадают на другой день
+    created_at = timezone.localtime(order.created_at)
+    return DocumentData(
+        number=str(order.id),
+        date=created_at.strftime('%d.%m.%Y'),
+        time=created_at.strftime('%H:%M'),
+        customer=order.get_full_name(),
+        phone=order.phone,
+        email=order.email,
+        address=order.address,
+        lines=[
+            (line.name, str(line.quantity), f'{line.price:.2f} ₽', f'{line.cost:.2f} ₽')
+            for line in order.lines
+        ],
+        total=f'{order.get_total_cost():.2f} ₽',
+        paid=order.paid,
+    )
+
+
+def _build(elements, **doc_options):
+    from reportlab.platypus import SimpleDocTemplate
+
+    buffer = BytesIO()
+    SimpleDocTemplate(buffer, **doc_options).build(elements)
+    return buffer.getvalue()
 
-    # Информация о компании
-    company_info = [
-        ['ООО "Coffee Shop"', f'№ заказа: {order.id}'],
-        ['ИНН 1234567890', f'Дата: {order.created_at.strftime("%d.%m.%Y")}'],
-        ['КПП 123456789', f'Время: {order.created_at.strftime("%H:%M")}'],
+
+def render_invoice(data):
+    """Render an invoice (A4) from DocumentData."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import mm
+    from reportlab.platypus import Table, Paragraph, Spacer
+
+    t = _templates()
+    width = A4[0] - 40 * mm
+
+    company_table = Table([
+        ['ООО "Coffee Shop"', f'№ заказа: {data.number}'],
+        ['ИНН 1234567890', f'Дата: {data.date}'],
+        ['КПП 123456789', f'Время: {data.time}'],
         ['Адрес: г. Москва, ул. Примерная, д. 1', ''],
-        ['Телефон: +7 (999) 123-45-67', '']
+        ['Телефон: +7 (999) 123-45-67', ''],
+    ], colWidths=[width / 2.0] * 2)
+    company_table.setStyle(t.company)
+
+    rows = [['№', 'Наименование', 'Кол-во', 'Цена', 'Сумма']]
+    rows.extend([str(i), name, quantity, price, cost] for i, (name, quantity, price, cost) in enumerate(data.lines, 1))
+    rows.append(['', '', '', 'Итого:', data.total])
+    lines_table = Table(rows, colWidths=[20, '*', 50, 80, 80], repeatRows=1)
+    lines_table.setStyle(t.invoice_lines)
+
+    elements = [
+        Paragraph('СЧЕТ НА ОПЛАТУ', t.title),
+        company_table,
+        Spacer(1, 10),
+        Paragraph('ПОКУПАТЕЛЬ:', t.heading),
+        Paragraph(
+            f'{escape(data.customer)}<br/>Телефон: {escape(data.phone)}<br/>'
+            f'Email: {escape(data.email)}<br/>Адрес: {escape(data.address)}',
+            t.text
+        ),
+        Spacer(1, 10),
+        Paragraph('СОСТАВ ЗАКАЗА:', t.heading),
+        lines_table,
+        Spacer(1, 20),
+        Paragraph(
+            'Счет действителен в течение 3 дней с даты выставления.<br/>'
+            'Оплата производится в рублях по курсу ЦБ РФ на день оплаты.<br/>'
+            'Без НДС.',
+            t.text
+        ),
     ]
-    
-    company_table = Table(company_info, colWidths=[doc.width/2.0]*2)
-    company_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'DejaVuSerif'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ('TOPPADDING', (0, 0), (-1, -1), 6),
-        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-    ]))
-    elements.append(company_table)
-    
-    # Информация о покупателе
-    elements.append(Spacer(1, 10))
-    elements.append(Paragraph('ПОКУПАТЕЛЬ:', styles['Heading3']))
-    customer_info = f"""
-    {order.get_full_name()}
-    Телефон: {order.phone}
-    Email: {order.email}
-    Адрес: {order.address}
-    """
-    elements.append(Paragraph(customer_info, styles['CustomText']))
-    
-    # Таблица с товарами
-    elements.append(Spacer(1, 10))
-    elements.append(Paragraph('СОСТАВ ЗАКАЗА:', styles['Heading3']))
-    
-    # Заголовок таблицы
-    data = [
-        ['№', 'Наименование', 'Кол-во', 'Цена', 'Сумма']
+    return _build(
+        elements, pagesize=A4,
+        rightMargin=20 * mm, leftMargin=20 * mm, topMargin=20 * mm, bottomMargin=20 * mm
+    )
+
+
+def render_receipt(data):
+    """Render a till receipt (80 mm wide) from DocumentData."""
+    from reportlab.lib.units import mm
+    from reportlab.platypus import Table, Paragraph, Spacer
+
+    t = _templates()
+    width = 70 * mm
+
+    # Одна таблица на все позиции вместо двух абзацев на строку
+    rows = []
+    for name, quantity, price, cost in data.lines:
+        # Абзац нужен только длинным названиям, которые не влезут в строку
+        rows.append([Paragraph(escape(name), t.small) if len(name) > RECEIPT_NAME_WIDTH else name, ''])
+        rows.append([f'{quantity} x {price}', cost])
+    lines_table = Table(rows or [['', '']], colWidths=[width - 22 * mm, 22 * mm])
+    lines_table.setStyle(t.receipt_lines)
+
+    separator = Paragraph('_' * 40, t.small)
+    elements = [
+        Paragraph('КАССОВЫЙ ЧЕК', t.receipt_heading),
+        Paragraph('ООО "Coffee Shop"<br/>ИНН 1234567890', t.small),
+        Paragraph(f'Кассовый чек №{data.number}<br/>Дата: {data.date} {data.time}', t.small),
+        separator,
+        lines_table,
+        separator,
+        Paragraph(f'ИТОГО: {data.total}', t.receipt_heading),
+        Paragraph(
+            f'ОПЛАТА: {"ОПЛАЧЕН" if data.paid else "НЕ ОПЛАЧЕН"}<br/>В том числе НДС: Без НДС',
+            t.small
+        ),
+        Spacer(1, 5),
+        Paragraph('СПАСИБО ЗА ПОКУПКУ!', t.receipt_heading),
+        Paragraph('www.coffeeshop.example.com', t.small),
     ]
-    
-    # Данные о товарах
-    for i, item in enumerate(order.items.all(), 1):
-        data.append([
-            str(i),
-            item.product.name,
-            str(item.quantity),
-            f"{item.price:.2f} ₽",
-            f"{item.get_cost():.2f} ₽"
-        ])
-    
-    # Итоговая сумма
-    data.append(['', '', '', 'Итого:', f"{order.get_total_cost():.2f} ₽"])
-    
-    # Создаем таблицу
-    table = Table(data, colWidths=[20, '*', 50, 80, 80])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#333333')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'DejaVuSerif-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-        ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-        ('FONTNAME', (0, 1), (-1, -1), 'DejaVuSerif'),
-        ('FONTSIZE', (0, 1), (-1, -1), 10),
-        ('ALIGN', (1, 1), (1, -1), 'LEFT'),
-        ('ALIGN', (3, 1), (-1, -1), 'RIGHT'),
-        ('LINEBELOW', (0, 0), (-1, -2), 1, colors.lightgrey),
-        ('LINEABOVE', (0, -1), (-1, -1), 1, colors.black),
-        ('BOTTOMPADDING', (0, -1), (-1, -1), 10),
-        ('TOPPADDING', (0, -1), (-1, -1), 10),
-        ('FONTNAME', (0, -1), (-2, -1), 'DejaVuSerif-Bold'),
-    ]))
-    
-    elements.append(table)
-    
-    # Подпись
-    elements.append(Spacer(1, 20))
-    elements.append(Paragraph("""
-        Счет действителен в течение 3 дней с даты выставления.<br/>
-        Оплата производится в рублях по курсу ЦБ РФ на день оплаты.<br/>
-        Без НДС.
-    """, styles['CustomText']))
-    
-    # Собираем PDF
-    doc.build(elements)
-    
-    # Получаем содержимое буфера и закрываем его
-    pdf = buffer.getvalue()
-    buffer.close()
-    
-    return pdf
+    return _build(
+        elements, pagesize=(80 * mm, 297 * mm),  # Ширина 80мм (кассовый чек), высота A4
+        rightMargin=5 * mm, leftMargin=5 * mm, topMargin=5 * mm, bottomMargin=5 * mm
+    )
+
+
+def generate_invoice_pdf(order):
+    """Генерация PDF счета на оплату"""
+    return render_invoice(document_data(order))
+
 
 def generate_receipt_pdf(order):
     """Генерация PDF чека"""
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(
-        buffer,
-        pagesize=(80*mm, 297*mm),  # Ширина 80мм (кассовый чек), высота A4
-        rightMargin=5*mm,
-        leftMargin=5*mm,
-        topMargin=5*mm,
-        bottomMargin=5*mm
-    )
-    
-    elements = []
-    
-    # Заголовок
-    elements.append(Paragraph('КАССОВЫЙ ЧЕК', styles['Heading3']))
-    elements.append(Paragraph('ООО "Coffee Shop"', styles['Normal']))
-    elements.append(Paragraph('ИНН 1234567890', styles['Normal']))
-    elements.append(Paragraph('Кассовый чек №' + str(order.id), styles['Normal']))
-    elements.append(Paragraph(f'Дата: {order.created_at.strftime("%d.%m.%Y %H:%M")}', styles['Normal']))
-    elements.append(Spacer(1, 5))
-    
-    # Разделительная линия
-    elements.append(Paragraph('_' * 40, styles['Normal']))
-    
-    # Товары
-    for item in order.items.all():
-        elements.append(Paragraph(item.product.name, styles['Normal']))
-        elements.append(Paragraph(
-            f"{item.quantity} x {item.price:.2f} = {item.get_cost():.2f} ₽",
-            styles['Normal']
-        ))
-    
-    # Разделительная линия
-    elements.append(Paragraph('_' * 40, styles['Normal']))
-    
-    # Итого
-    elements.append(Paragraph(f'ИТОГО: {order.get_total_cost():.2f} ₽', styles['Heading3']))
-    elements.append(Spacer(1, 5))
-    
-    # Оплата
-    elements.append(Paragraph(f'ОПЛАТА: {order.get_payment_method_display().upper()}', styles['Normal']))
-    elements.append(Paragraph('В том числе НДС: Без НДС', styles['Normal']))
-    elements.append(Spacer(1, 5))
-    
-    # Подпись
-    elements.append(Paragraph('СПАСИБО ЗА ПОКУПКУ!', styles['Heading3']))
-    elements.append(Paragraph('www.coffeeshop.example.com', styles['Normal']))
-    
-    # Собираем PDF
-    doc.build(elements)
-    
-    # Получаем содержимое буфера и закрываем его
-    pdf = buffer.getvalue()
-    buffer.close()
-    
-    return pdf
+    return render_receipt(document_data(order))
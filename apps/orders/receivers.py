@@ -0,0 +1,72 @@
+import logging
+
+from django.db import transaction
+from django.dispatch import receiver
+
+from .models import DailySales, OrderSummary
+from .signals import order_placed, order_paid, order_unpaid, order_cancelled
+from .tasks import render_order_documents
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(order_placed)
+def update_summary_on_placed(sender, order, **kwargs):
+    if order.user_id:
+        OrderSummary.record_placed(order)
+
+
+@receiver(order_paid)
+def update_summary_on_paid(sender, order, **kwargs):
+    if order.user_id:
+        OrderSummary.record_paid(order)
+
+
+@receiver(order_unpaid)
+def update_summary_on_unpaid(sender, order, **kwargs):
+    if order.user_id:
+        OrderSummary.record_unpaid(order)
+
+
+@receiver(order_cancelled)
+def update_summary_on_cancelled(sender, order, was_paid, **kwargs):
+    if order.user_id:
+        OrderSummary.record_cancelled(order, was_paid)
+
+
+@receiver(order_paid)
+def update_daily_sales_on_paid(sender, order, **kwargs):
+    if order.status != order.Status.CANCELLED:
+        DailySales.apply_order(order)
+
+
+@receiver(order_unpaid)
+def update_daily_sales_on_unpaid(sender, order, **kwargs):
+    if order.status != order.Status.CANCELLED:
+        DailySales.apply_order(order, sign=-1)
+
+
+@receiver(order_cancelled)
+def update_daily_sales_on_cancelled(sender, order, was_paid, **kwargs):
+    if was_paid:
+        DailySales.apply_order(order, sign=-1)
+
+
+def _schedule_documents(order, kinds):
+    def enqueue():
+        try:
+            render_order_documents.delay(order.pk, kinds)
+        except Exception:
+            # Без брокера документ всё равно будет построен при первом скачивании
+            logger.warning('Could not enqueue documents for order %s', order.pk, exc_info=True)
+    transaction.on_commit(enqueue)
+
+
+@receiver(order_placed)
+def render_invoice_on_placed(sender, order, **kwargs):
+    _schedule_documents(order, ['invoice'])
+
+
+@receiver(order_paid)
+def render_receipt_on_paid(sender, order, **kwargs):
+    _schedule_documents(order, ['receipt'])
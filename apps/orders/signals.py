@@ -0,0 +1,9 @@
+from django.dispatch import Signal
+
+# Жизненный цикл заказа. Все сигналы отправляются с аргументом order.
+order_placed = Signal()
+order_paid = Signal()
+# Оплата отменена (снята в админке): обратное действие к order_paid
+order_unpaid = Signal()
+# Дополнительный аргумент was_paid: был ли заказ оплачен на момент отмены
+order_cancelled = Signal()
@@ -0,0 +1,21 @@
+from celery import shared_task
+
+from .documents import get_document
+from .models import Order, OrderStatusJob
+
+
+@shared_task(ignore_result=True)
+def render_order_documents(order_id, kinds):
+    """Render and cache order documents ahead of the first download."""
+    order = Order.objects.filter(pk=order_id).first()
+    if order is None:
+        return
+    for kind in kinds:
+        get_document(order, kind)
+
+
+@shared_task(ignore_result=True)
+def run_order_status_job(job_id, order_ids):
+    """Apply a bulk status change started from the admin."""
+    job = OrderStatusJob.objects.select_related('created_by').get(pk=job_id)
+    job.run(order_ids)
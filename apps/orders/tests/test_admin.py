@@ -0,0 +1,256 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib import messages
+from django.contrib.messages import get_messages
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.core.pagination import EstimatedCountPaginator
+from apps.products.models import Category, Product
+from ..models import Order, OrderStatusHistory, OrderStatusJob, OrderSummary
+
+User = get_user_model()
+
+
+class OrderAdminChangelistTest(TestCase):
+    """Test the order and order item changelists."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(email="admin@example.com", password="adminpass123", username="admin")
+        category = Category.objects.create(name="Coffee", slug="coffee")
+        cls.product = Product.objects.create(
+            name="Arabica", slug="arabica", description="Arabica beans",
+            price=Decimal('450.00'), category=category, stock=10
+        )
+        cls.add_orders(2)
+    
+    @classmethod
+    def add_orders(cls, count):
+        for i in range(count):
+            order = Order.objects.create(
+                first_name="Ivan", last_name=f"Petrov{i}", email=f"buyer{i}@example.com",
+                address="Moscow", postal_code="101000", city="Moscow", phone="+7999"
+            )
+            order.add_items_from_cart([{'product': cls.product, 'price': cls.product.price, 'quantity': 1}])
+    
+    def setUp(self):
+        self.client.login(email="admin@example.com", password="adminpass123")
+        # The first request stores the empty cart in the session; later ones don't write it
+        self.client.get(reverse('admin:index'))
+    
+    def _query_count(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+    
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        """Test that both changelists run the same number of queries for 2 and 7 rows."""
+        for url in (reverse('admin:orders_order_changelist'), reverse('admin:orders_orderitem_changelist')):
+            before = self._query_count(url)
+            self.add_orders(5)
+            self.assertEqual(self._query_count(url), before, url)
+    
+    def test_search_by_id_is_exact(self):
+        """Test that a numeric search matches the order number exactly."""
+        order = Order.objects.order_by('pk').first()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('admin:orders_order_changelist'), {'q': str(order.pk)})
+        self.assertEqual(list(response.context['cl'].result_list), [order])
+        # Сравнение с ключом, а не с текстом: его обслуживает индекс
+        self.assertFalse([q for q in queries if '"orders_order"."id"::text' in q['sql']])
+        
+        response = self.client.get(reverse('admin:orders_orderitem_changelist'), {'q': str(order.pk)})
+        self.assertEqual([item.order_id for item in response.context['cl'].result_list], [order.pk])
+        response = self.client.get(reverse('admin:orders_order_changelist'), {'q': '9' * 30})
+        self.assertEqual(list(response.context['cl'].result_list), [])
+    
+    def test_search_by_text(self):
+        """Test that text searches still match e-mail and names."""
+        response = self.client.get(reverse('admin:orders_order_changelist'), {'q': 'PETROV1'})
+        self.assertEqual([o.last_name for o in response.context['cl'].result_list], ['Petrov1'])
+        response = self.client.get(reverse('admin:orders_order_changelist'), {'q': 'buyer0@'})
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+
+class EstimatedCountPaginatorTest(TestCase):
+    """Test the planner-estimated changelist count."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(3):
+            Order.objects.create(
+                first_name="Ivan", last_name="Petrov", email=f"buyer{i}@example.com",
+                address="Moscow", postal_code="101000", city="Moscow", phone="+7999"
+            )
+    
+    def test_small_tables_are_counted_exactly(self):
+        """Test that tables below the threshold get an exact count."""
+        self.assertEqual(EstimatedCountPaginator(Order.objects.all(), 10).count, 3)
+    
+    def test_large_tables_use_planner_estimates(self):
+        """Test that no COUNT(*) runs above the threshold."""
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE orders_order')
+        
+        with mock.patch.object(EstimatedCountPaginator, 'exact_threshold', 0), \
+                CaptureQueriesContext(connection) as queries:
+            whole = EstimatedCountPaginator(Order.objects.all(), 10).count
+            filtered = EstimatedCountPaginator(Order.objects.filter(email__icontains='buyer1'), 10).count
+        
+        self.assertEqual(whole, 3)
+        self.assertGreaterEqual(filtered, 1)
+        self.assertFalse([q for q in queries if 'COUNT(' in q['sql'].upper()])
+        self.assertTrue([q for q in queries if q['sql'].startswith('EXPLAIN')])
+    
+    def test_partition_statistics_are_summed(self):
+        """Test that the partitioned orders table is estimated from its analyzed partitions."""
+        for i in range(3, 5):
+            Order.objects.create(
+                first_name="Ivan", last_name="Petrov", email=f"buyer{i}@example.com",
+                address="Moscow", postal_code="101000", city="Moscow", phone="+7999"
+            )
+        with connection.cursor() as cursor:
+            # Как autovacuum: анализируются только секции, статистика родителя не меняется
+            cursor.execute(
+                "SELECT relid::regclass::text FROM pg_partition_tree('orders_order') WHERE isleaf"
+            )
+            for (partition,) in cursor.fetchall():
+                cursor.execute(f'ANALYZE {partition}')
+        
+        with mock.patch.object(EstimatedCountPaginator, 'exact_threshold', 1), \
+                CaptureQueriesContext(connection) as queries:
+            count = EstimatedCountPaginator(Order.objects.all(), 10).count
+        
+        self.assertEqual(count, 5)
+        self.assertFalse([q for q in queries if 'COUNT(' in q['sql'].upper()])
+
+
+class OrderStatusActionsTest(TestCase):
+    """Test the chunked bulk status actions."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(email="admin@example.com", password="adminpass123", username="admin")
+        category = Category.objects.create(name="Coffee", slug="coffee")
+        product = Product.objects.create(
+            name="Arabica", slug="arabica", description="Arabica beans",
+            price=Decimal('450.00'), category=category, stock=10
+        )
+        cls.orders = []
+        for i in range(5):
+            order = Order.objects.create(
+                user=cls.admin, first_name="Ivan", last_name="Petrov", email="buyer@example.com",
+                address="Moscow", postal_code="101000", city="Moscow", phone="+7999"
+            )
+            order.add_items_from_cart([{'product': product, 'price': product.price, 'quantity': 1}])
+            cls.orders.append(order)
+    
+    def setUp(self):
+        self.client.login(email="admin@example.com", password="adminpass123")
+        self.url = reverse('admin:orders_order_changelist')
+    
+    def _post_action(self, action, orders):
+        return self.client.post(self.url, {
+            'action': action,
+            '_selected_action': [order.pk for order in orders],
+        })
+    
+    def test_status_is_changed_in_chunks(self):
+        """Test that each chunk is one UPDATE and history is written in bulk."""
+        self.orders[0].set_status(Order.Status.SHIPPED)
+        
+        with mock.patch.object(Order, 'STATUS_CHUNK_SIZE', 2), CaptureQueriesContext(connection) as queries:
+            Order.bulk_set_status([o.pk for o in self.orders], Order.Status.SHIPPED, changed_by=self.admin)
+        
+        updates = [q for q in queries if q['sql'].startswith('UPDATE "orders_order"')]
+        inserts = [q for q in queries if q['sql'].startswith('INSERT INTO "orders_orderstatushistory"')]
+        self.assertEqual((len(updates), len(inserts)), (3, 3))
+        self.assertEqual(set(Order.objects.values_list('status', flat=True)), {Order.Status.SHIPPED})
+        self.assertEqual(
+            OrderStatusHistory.objects.filter(new_status=Order.Status.SHIPPED, changed_by=self.admin).count(), 4
+        )
+    
+    def test_cancel_action_updates_summaries(self):
+        """Test that bulk cancellation still goes through order_cancelled."""
+        self._post_action('mark_as_cancelled', self.orders[:2])
+        
+        self.assertEqual(Order.objects.filter(status=Order.Status.CANCELLED).count(), 2)
+        self.assertEqual(OrderSummary.objects.get(user=self.admin).order_count, 3)
+    
+    def test_status_actions_leave_cancelled_orders_alone(self):
+        """Test that bulk status actions skip cancelled orders and say so."""
+        self.orders[0].mark_paid()
+        self.orders[0].cancel()
+        
+        response = self._post_action('mark_as_shipped', self.orders[:3])
+        
+        self.orders[0].refresh_from_db()
+        self.assertEqual(self.orders[0].status, Order.Status.CANCELLED)
+        self.assertEqual(Order.objects.filter(status=Order.Status.SHIPPED).count(), 2)
+        summary = OrderSummary.objects.get(user=self.admin)
+        self.assertEqual((summary.order_count, summary.total_spent), (4, Decimal('0.00')))
+        self.assertIn('1 cancelled orders were skipped.', [str(m) for m in get_messages(response.wsgi_request)])
+    
+    def _post_editable(self, order, status, paid):
+        data = {
+            'form-TOTAL_FORMS': '1', 'form-INITIAL_FORMS': '1', 'form-0-id': order.pk,
+            'form-0-status': status, '_save': 'Save',
+        }
+        if paid:
+            data['form-0-paid'] = 'on'
+        return self.client.post(self.url, data)
+    
+    def test_list_editable_goes_through_model_methods(self):
+        """Test that unpaying from the changelist reverts the rollup and a cancelled order stays cancelled."""
+        order = self.orders[0]
+        order.mark_paid()
+        
+        self._post_editable(order, Order.Status.PENDING, paid=False)
+        self.assertEqual(OrderSummary.objects.get(user=self.admin).total_spent, Decimal('0.00'))
+        
+        order.cancel()
+        self._post_editable(order, Order.Status.PROCESSING, paid=False)
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.Status.CANCELLED)
+        self.assertEqual(OrderSummary.objects.get(user=self.admin).order_count, 4)
+    
+    def test_large_selection_runs_in_background(self):
+        """Test that large selections become a job whose progress the admin can follow."""
+        with mock.patch('apps.orders.admin.BACKGROUND_STATUS_THRESHOLD', 3), \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self._post_action('mark_as_delivered', self.orders)
+        
+        job = OrderStatusJob.objects.get()
+        self.assertRedirects(response, reverse('admin:orders_order_status_job', args=[job.pk]))
+        self.assertEqual(Order.objects.filter(status=Order.Status.DELIVERED).count(), 5)
+        
+        progress = self.client.get(reverse('admin:orders_order_status_job', args=[job.pk]), {'format': 'json'})
+        self.assertEqual(progress.json()['state'], OrderStatusJob.State.DONE)
+        self.assertEqual(progress.json()['percent'], 100)
+        self.assertEqual(progress.json()['changed'], 5)
+        page = self.client.get(reverse('admin:orders_order_status_job', args=[job.pk]))
+        self.assertContains(page, '5 из 5')
+    
+    def test_background_job_fails_without_broker(self):
+        """Test that a job that cannot be enqueued is marked failed and the admin is told."""
+        with mock.patch('apps.orders.admin.BACKGROUND_STATUS_THRESHOLD', 3), \
+                mock.patch('apps.orders.admin.run_order_status_job.delay', side_effect=ConnectionError('broker down')), \
+                self.assertLogs('apps.orders.admin', 'WARNING'), \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self._post_action('mark_as_delivered', self.orders)
+        
+        job = OrderStatusJob.objects.get()
+        self.assertRedirects(response, reverse('admin:orders_order_status_job', args=[job.pk]),
+                             fetch_redirect_response=False)
+        self.assertEqual(job.state, OrderStatusJob.State.FAILED)
+        self.assertIn('broker down', job.error)
+        self.assertEqual(
+            [m.level for m in get_messages(response.wsgi_request)], [messages.ERROR]
+        )
+        self.assertFalse(Order.objects.filter(status=Order.Status.DELIVERED).exists())
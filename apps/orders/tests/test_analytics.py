@@ -0,0 +1,155 @@
+import os
+import shutil
+import tempfile
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+
+from apps.products.models import Category, Product
+from ..analytics import (
+    OrderLinesStore, basket_size_distribution, revenue_by_period, top_products
+)
+from ..models import ArchivedOrder, Order
+
+
+class AnalyticsStoreTest(TestCase):
+    """Test the columnar order line export and the reports built on it."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Coffee", slug="coffee")
+        cls.arabica = Product.objects.create(
+            name="Arabica", slug="arabica", description="Arabica beans",
+            price=Decimal('100.00'), category=category, stock=10
+        )
+        cls.robusta = Product.objects.create(
+            name="Robusta", slug="robusta", description="Robusta beans",
+            price=Decimal('30.50'), category=category, stock=10
+        )
+        
+        def place(created_at, lines, paid=True, cancelled=False):
+            order = Order.objects.create(
+                first_name="Ivan", last_name="Petrov", email="buyer@example.com",
+                address="Moscow", postal_code="101000", city="Moscow", phone="+7999"
+            )
+            Order.objects.filter(pk=order.pk).update(created_at=created_at)
+            order.refresh_from_db()
+            order.add_items_from_cart([
+                {'product': product, 'price': product.price, 'quantity': quantity}
+                for product, quantity in lines
+            ])
+            if paid:
+                order.mark_paid()
+            if cancelled:
+                order.cancel()
+        
+        utc = dt_timezone.utc
+        # 22:30 UTC 31 января — уже 1 февраля по Москве
+        place(datetime(2025, 1, 31, 22, 30, tzinfo=utc), [(cls.arabica, 2)])
+        place(datetime(2025, 1, 10, 9, 0, tzinfo=utc), [(cls.arabica, 1), (cls.robusta, 2)])
+        place(datetime(2025, 2, 3, 9, 0, tzinfo=utc), [(cls.robusta, 1)])
+        place(datetime(2025, 2, 4, 9, 0, tzinfo=utc), [(cls.arabica, 5)], paid=False)
+        place(datetime(2025, 2, 5, 9, 0, tzinfo=utc), [(cls.arabica, 5)], cancelled=True)
+        place(datetime(2025, 3, 3, 9, 0, tzinfo=utc), [(cls.arabica, 1)])
+    
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        settings_override = override_settings(ANALYTICS_ROOT=self.root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        call_command('export_analytics', month_from=date(2025, 1, 1), month_to=date(2025, 3, 1),
+                     stdout=open(os.devnull, 'w'))
+        self.store = OrderLinesStore()
+    
+    def test_export_writes_monthly_partitions(self):
+        """Test that every month gets its own directory of .npy columns."""
+        self.assertEqual(self.store.months(), ['2025-01', '2025-02', '2025-03'])
+        self.assertTrue(os.path.exists(os.path.join(self.store.lines_root, '2025-02', 'revenue_cents.npy')))
+    
+    def test_revenue_by_period(self):
+        """Test that revenue counts paid orders only and uses Moscow dates."""
+        with self.assertNumQueries(0):
+            by_month = revenue_by_period(date(2025, 1, 1), date(2025, 3, 31), period='month')
+        self.assertEqual(by_month, [
+            (date(2025, 1, 1), Decimal('161.00'), 1),
+            (date(2025, 2, 1), Decimal('230.50'), 2),
+            (date(2025, 3, 1), Decimal('100.00'), 1),
+        ])
+        by_week = revenue_by_period(date(2025, 2, 1), date(2025, 2, 28), period='week')
+        self.assertEqual(by_week, [
+            (date(2025, 1, 27), Decimal('200.00'), 1),
+            (date(2025, 2, 3), Decimal('30.50'), 1),
+        ])
+    
+    def test_reports_read_only_needed_partitions(self):
+        """Test that a range inside one month does not open other partitions."""
+        shutil.rmtree(os.path.realpath(os.path.join(self.store.lines_root, '2025-01')))
+        self.assertEqual(
+            revenue_by_period(date(2025, 3, 1), date(2025, 3, 31)),
+            [(date(2025, 3, 3), Decimal('100.00'), 1)]
+        )
+    
+    def test_top_products(self):
+        """Test that products are ranked by revenue and labelled from the export."""
+        with self.assertNumQueries(0):
+            top = top_products(date(2025, 1, 1), date(2025, 3, 31))
+        self.assertEqual(top, [
+            (self.arabica.pk, 'Arabica', 4, Decimal('400.00')),
+            (self.robusta.pk, 'Robusta', 3, Decimal('91.50')),
+        ])
+    
+    def test_basket_size_distribution(self):
+        """Test that orders are grouped by the number of units they contain."""
+        self.assertEqual(
+            basket_size_distribution(date(2025, 1, 1), date(2025, 3, 31)),
+            [(1, 2), (2, 1), (3, 1)]
+        )
+    
+    def test_reexport_replaces_partition(self):
+        """Test that exporting a month again does not duplicate its lines."""
+        call_command('export_analytics', month_from=date(2025, 3, 1), month_to=date(2025, 3, 1),
+                     stdout=open(os.devnull, 'w'))
+        self.assertEqual(
+            revenue_by_period(date(2025, 3, 1), date(2025, 3, 31), period='month'),
+            [(date(2025, 3, 1), Decimal('100.00'), 1)]
+        )
+    
+    def test_reexport_leaves_one_version(self):
+        """Test that a re-exported month is switched by symlink and the old version is removed."""
+        call_command('export_analytics', month_from=date(2025, 3, 1), month_to=date(2025, 3, 1),
+                     stdout=open(os.devnull, 'w'))
+        call_command('export_analytics', month_from=date(2025, 3, 1), month_to=date(2025, 3, 1),
+                     stdout=open(os.devnull, 'w'))
+        
+        self.assertEqual(self.store.months(), ['2025-01', '2025-02', '2025-03'])
+        self.assertTrue(os.path.islink(os.path.join(self.store.lines_root, '2025-03')))
+        versions = [name for name in os.listdir(self.store.lines_root) if name.startswith('.2025-03-')]
+        self.assertEqual(len(versions), 1)
+    
+    def test_archived_months_are_not_reexported(self):
+        """Test that months with archived orders are refused or skipped, keeping their partitions."""
+        ArchivedOrder.objects.create(
+            id=10 ** 9, created_at=datetime(2025, 2, 10, 9, 0, tzinfo=dt_timezone.utc), status=Order.Status.DELIVERED,
+            paid=True, total_cost=Decimal('100.00'), path='2025/02.jsonl.gz', offset=0, length=1
+        )
+        february = revenue_by_period(date(2025, 2, 1), date(2025, 2, 28), period='month')
+        
+        with self.assertRaises(CommandError):
+            call_command('export_analytics', month_from=date(2025, 2, 1), month_to=date(2025, 3, 1),
+                         stdout=open(os.devnull, 'w'))
+        # Как после archive_orders: февральских заказов в таблицах больше нет
+        Order.objects.filter(
+            created_at__gte=datetime(2025, 2, 2, tzinfo=dt_timezone.utc),
+            created_at__lt=datetime(2025, 3, 1, tzinfo=dt_timezone.utc)
+        ).delete()
+        call_command('export_analytics', month_to=date(2025, 3, 1), stdout=open(os.devnull, 'w'))
+        
+        self.assertEqual(revenue_by_period(date(2025, 2, 1), date(2025, 2, 28), period='month'), february)
+        self.assertEqual(
+            revenue_by_period(date(2025, 3, 1), date(2025, 3, 31), period='month'),
+            [(date(2025, 3, 1), Decimal('100.00'), 1)]
+        )
@@ -0,0 +1,143 @@
+import gzip
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.products.models import Category, Product
+from .. import archive, documents
+from ..models import ArchivedOrder, Order, OrderItem, OrderStatusHistory, OrderSummary
+from ..views import get_order_summary
+
+User = get_user_model()
+
+
+class OrderArchiveTest(TestCase):
+    """Test moving old orders to the compressed archive and reading them back."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Coffee", slug="coffee")
+        cls.product = Product.objects.create(
+            name="Arabica", slug="arabica", description="Arabica beans",
+            price=Decimal('450.00'), category=category, stock=10
+        )
+        cls.user = User.objects.create_user(email="buyer@example.com", password="testpass123", username="buyer")
+        cls.other = User.objects.create_user(email="other@example.com", password="testpass123", username="other")
+        three_years_ago = timezone.now() - timedelta(days=3 * 365)
+        cls.delivered = cls.place(three_years_ago, Order.Status.DELIVERED, paid=True)
+        cls.cancelled = cls.place(three_years_ago + timedelta(days=40), Order.Status.CANCELLED)
+        cls.pending = cls.place(three_years_ago, Order.Status.PENDING)
+        cls.recent = cls.place(timezone.now() - timedelta(days=10), Order.Status.DELIVERED, paid=True)
+    
+    @classmethod
+    def place(cls, created_at, status, paid=False, quantity=2):
+        order = Order.objects.create(
+            user=cls.user, first_name="Ivan", last_name="Petrov", email="buyer@example.com",
+            address="Moscow", postal_code="101000", city="Moscow", phone="+7999"
+        )
+        order.add_items_from_cart([{'product': cls.product, 'price': cls.product.price, 'quantity': quantity}])
+        if paid:
+            order.mark_paid()
+        order.set_status(status)
+        Order.objects.filter(pk=order.pk).update(created_at=created_at)
+        order.refresh_from_db()
+        return order
+    
+    def setUp(self):
+        for setting in ('ORDER_ARCHIVE_ROOT', 'DOCUMENTS_ROOT'):
+            root = tempfile.mkdtemp()
+            self.addCleanup(shutil.rmtree, root)
+            settings_override = override_settings(**{setting: root})
+            settings_override.enable()
+            self.addCleanup(settings_override.disable)
+        self.renderer = mock.Mock(return_value=b'%PDF-fake')
+        renderers = mock.patch.dict(documents.RENDERERS, invoice=self.renderer)
+        renderers.start()
+        self.addCleanup(renderers.stop)
+        self.client.login(email="buyer@example.com", password="testpass123")
+    
+    def _archive(self):
+        out = StringIO()
+        call_command('archive_orders', sample=5, stdout=out)
+        return out.getvalue()
+    
+    def test_only_old_final_orders_are_moved(self):
+        """Test that old delivered/cancelled orders leave the live tables with their items and history."""
+        output = self._archive()
+        archived_ids = {self.delivered.pk, self.cancelled.pk}
+        self.assertEqual(set(ArchivedOrder.objects.values_list('id', flat=True)), archived_ids)
+        self.assertEqual(set(Order.objects.values_list('id', flat=True)), {self.pending.pk, self.recent.pk})
+        self.assertFalse(OrderItem.objects.filter(order_id__in=archived_ids).exists())
+        self.assertFalse(OrderStatusHistory.objects.filter(order_id__in=archived_ids).exists())
+        self.assertIn('Перенесено заказов: 2', output)
+        self.assertIn('Поиск в архиве', output)
+    
+    def test_archive_files_are_plain_gzip_jsonl(self):
+        """Test that an archive file is readable as a whole with gzip."""
+        self._archive()
+        entry = ArchivedOrder.objects.get(pk=self.delivered.pk)
+        with gzip.open(os.path.join(archive.OrderArchive().root, entry.path), 'rt') as f:
+            lines = f.read().splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertIn('"status":"DELIVERED"', lines[0])
+    
+    def test_load_restores_order_from_its_block(self):
+        """Test that every order is found in its own gzip member when a chunk spans several blocks."""
+        orders = [
+            self.place(self.delivered.created_at + timedelta(hours=i), Order.Status.DELIVERED, quantity=i + 1)
+            for i in range(5)
+        ]
+        with mock.patch.object(archive, 'BLOCK_SIZE', 2):
+            self._archive()
+        self.assertEqual(len({entry.offset for entry in ArchivedOrder.objects.all()}), 3)
+        for order in orders:
+            restored = archive.OrderArchive().load(order.pk)
+            self.assertTrue(restored.archived)
+            self.assertEqual(restored.created_at, order.created_at)
+            self.assertEqual(restored.lines, order.lines)
+            self.assertEqual(restored.get_total_cost(), order.get_total_cost())
+            self.assertEqual(len(restored.archived_status_history), 1)
+    
+    def test_detail_and_invoice_fall_back_to_archive(self):
+        """Test that the order page and invoice of an archived order are still served to its owner."""
+        self._archive()
+        response = self.client.get(reverse('orders:order_detail', kwargs={'pk': self.delivered.pk}))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Arabica')
+        self.assertTrue(response.context['order'].archived)
+    
+        response = self.client.get(reverse('orders:order_invoice_pdf', kwargs={'order_id': self.delivered.pk}))
+        self.assertEqual(b''.join(response.streaming_content), b'%PDF-fake')
+        self.assertEqual(self.renderer.call_args[0][0].pk, self.delivered.pk)
+    
+        self.client.login(email="other@example.com", password="testpass123")
+        response = self.client.get(reverse('orders:order_detail', kwargs={'pk': self.delivered.pk}))
+        self.assertEqual(response.status_code, 404)
+    
+    def test_summary_keeps_archived_orders(self):
+        """Test that the profile summary and its rebuild still count archived orders."""
+        OrderSummary.rebuild([self.user.pk])
+        before = get_order_summary(self.user)
+        self._archive()
+        OrderSummary.rebuild([self.user.pk])
+        after = get_order_summary(self.user)
+        for key in ('total_orders', 'total_spent', 'last_order_at', 'last_order_ids'):
+            self.assertEqual(after[key], before[key], key)
+        self.assertEqual([order.pk for order in after['last_orders']], after['last_order_ids'])
+    
+    def test_daily_sales_backfill_refuses_archived_days(self):
+        """Test that the sales backfill does not wipe the facts of archived days."""
+        self._archive()
+        with self.assertRaises(CommandError):
+            call_command('backfill_daily_sales', stdout=StringIO())
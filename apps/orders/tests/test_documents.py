@@ -0,0 +1,222 @@
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.products.models import Category, Product
+from .. import documents, pdf_utils
+from ..models import Order
+
+User = get_user_model()
+
+
+class OrderDocumentCacheTest(TestCase):
+    """Test the content-addressed cache of invoices and receipts."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Coffee", slug="coffee")
+        cls.product = Product.objects.create(
+            name="Arabica", slug="arabica", description="Arabica beans",
+            price=Decimal('450.00'), category=category, stock=10
+        )
+        cls.user = User.objects.create_user(email="buyer@example.com", password="testpass123", username="buyer")
+    
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        settings_override = override_settings(DOCUMENTS_ROOT=root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        
+        self.renderer = mock.Mock(return_value=b'%PDF-fake')
+        renderers = mock.patch.dict(documents.RENDERERS, invoice=self.renderer, receipt=self.renderer)
+        renderers.start()
+        self.addCleanup(renderers.stop)
+    
+    def _create_order(self):
+        order = Order.objects.create(
+            user=self.user, first_name="Ivan", last_name="Petrov", email="buyer@example.com",
+            address="Moscow", postal_code="101000", city="Moscow", phone="+7999"
+        )
+        order.add_items_from_cart([{'product': self.product, 'price': Decimal('450.00'), 'quantity': 2}])
+        return order
+    
+    def test_repeat_requests_render_once(self):
+        """Test that an unchanged order is rendered only on the first request."""
+        order = self._create_order()
+        first = documents.get_document(order, 'invoice')
+        second = documents.get_document(Order.objects.get(pk=order.pk), 'invoice')
+        
+        self.assertEqual(first, second)
+        self.assertEqual(self.renderer.call_count, 1)
+    
+    def test_lock_files_are_shared_per_directory(self):
+        """Test that rendering documents leaves at most one lock file per directory."""
+        for _ in range(3):
+            documents.get_document(self._create_order(), 'invoice')
+        
+        root = os.path.join(settings.DOCUMENTS_ROOT, 'invoice')
+        for directory, _, files in os.walk(root):
+            locks = [name for name in files if name.endswith('.lock')]
+            self.assertIn(locks, ([], ['.lock']))
+    
+    def test_key_follows_document_content(self):
+        """Test that paying changes the receipt key but not the invoice key."""
+        order = self._create_order()
+        invoice_key = documents.document_key(order, 'invoice')
+        receipt_key = documents.document_key(order, 'receipt')
+        order.mark_paid()
+        
+        self.assertEqual(documents.document_key(order, 'invoice'), invoice_key)
+        self.assertNotEqual(documents.document_key(order, 'receipt'), receipt_key)
+    
+    def test_documents_are_rendered_in_background(self):
+        """Test that placing and paying an order renders its documents after commit."""
+        with self.captureOnCommitCallbacks(execute=True):
+            order = self._create_order()
+        self.assertTrue(os.path.exists(documents.document_path(order, 'invoice')))
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            order.mark_paid()
+        self.assertTrue(os.path.exists(documents.document_path(order, 'receipt')))
+        self.assertEqual(self.renderer.call_count, 2)
+    
+    def test_download_is_served_from_cache(self):
+        """Test that the receipt view streams the cached file."""
+        order = self._create_order()
+        documents.get_document(order, 'receipt')
+        self.client.login(email="buyer@example.com", password="testpass123")
+        
+        response = self.client.get(reverse('orders:order_receipt_pdf', kwargs={'order_id': order.pk}))
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertIn(f'receipt_{order.pk}.pdf', response['Content-Disposition'])
+        self.assertEqual(b''.join(response.streaming_content), b'%PDF-fake')
+        self.assertEqual(self.renderer.call_count, 1)
+    
+    def test_guest_downloads_invoice_of_own_order(self):
+        """Test that a guest gets the invoice of an order placed in their session and only that one."""
+        other = Order.objects.create(
+            first_name="Petr", last_name="Ivanov", email="guest2@example.com",
+            address="Moscow", postal_code="101000", city="Moscow", phone="+7999"
+        )
+        self.client.post(reverse('cart:cart_add', kwargs={'product_id': self.product.pk}), {'quantity': 1})
+        self.client.post(reverse('orders:guest_checkout'), {
+            'first_name': "Anna", 'last_name': "Smirnova", 'email': "guest@example.com", 'phone': "+7999",
+            'address': "Moscow", 'postal_code': "101000", 'city': "Moscow",
+        })
+        order = Order.objects.get(email="guest@example.com")
+        
+        response = self.client.get(reverse('orders:order_invoice_pdf', kwargs={'order_id': order.pk}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'%PDF-fake')
+        
+        response = self.client.get(reverse('orders:order_invoice_pdf', kwargs={'order_id': other.pk}))
+        self.assertRedirects(response, f"{reverse('accounts:login')}?next="
+                             f"{reverse('orders:order_invoice_pdf', kwargs={'order_id': other.pk})}",
+                             fetch_redirect_response=False)
+
+
+class PdfRendererTest(TestCase):
+    """Test the reportlab renderers."""
+    
+    def _order(self, line_count):
+        order = Order(
+            id=7, first_name="Иван", last_name="Петров & сын", email="buyer@example.com",
+            address="Moscow", postal_code="101000", city="Moscow", phone="+7999", paid=True,
+            created_at=datetime(2025, 3, 1, 12, 30, tzinfo=dt_timezone.utc),
+        )
+        order.apply_snapshot(Order.build_snapshot([
+            (i, f'coffee-{i}', f'Кофе №{i}', Decimal('450.50'), 2, '') for i in range(1, line_count + 1)
+        ]))
+        return order
+    
+    def test_documents_render_without_queries(self):
+        """Test that invoices and receipts of any size render from flat data only."""
+        for line_count in (1, 200):
+            data = pdf_utils.document_data(self._order(line_count))
+            with self.assertNumQueries(0):
+                invoice = pdf_utils.render_invoice(data)
+                receipt = pdf_utils.render_receipt(data)
+            self.assertTrue(invoice.startswith(b'%PDF'))
+            self.assertTrue(receipt.startswith(b'%PDF'))
+    
+    def test_document_data_is_preformatted(self):
+        """Test that prices and totals are formatted before rendering."""
+        data = pdf_utils.document_data(self._order(2))
+        self.assertEqual(data.lines[0], ('Кофе №1', '2', '450.50 ₽', '901.00 ₽'))
+        self.assertEqual(data.total, '1802.00 ₽')
+    
+    def test_document_data_uses_local_time(self):
+        """Test that documents show the order time in the site time zone."""
+        order = self._order(1)
+        order.created_at = datetime(2025, 3, 1, 22, 30, tzinfo=dt_timezone.utc)
+        data = pdf_utils.document_data(order)
+        self.assertEqual((data.date, data.time), ('02.03.2025', '01:30'))
+
+
+class InvoiceExportTest(TestCase):
+    """Test the batch invoice export."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Coffee", slug="coffee")
+        product = Product.objects.create(
+            name="Arabica", slug="arabica", description="Arabica beans",
+            price=Decimal('450.00'), category=category, stock=10
+        )
+        cls.orders = []
+        for _ in range(3):
+            order = Order.objects.create(
+                first_name="Ivan", last_name="Petrov", email="buyer@example.com",
+                address="Moscow", postal_code="101000", city="Moscow", phone="+7999"
+            )
+            order.add_items_from_cart([{'product': product, 'price': product.price, 'quantity': 1}])
+            cls.orders.append(order)
+        cls.orders[2].cancel()
+        cls.admin = User.objects.create_superuser(email="admin@example.com", password="adminpass123", username="admin")
+    
+    def test_command_writes_zip_of_invoices(self):
+        """Test that the command archives one invoice per non-cancelled order."""
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        path = os.path.join(root, 'invoices.zip')
+        today = timezone.localdate()
+        stderr = io.StringIO()
+        
+        call_command('export_invoices', date_from=today - timedelta(days=1), date_to=today + timedelta(days=1),
+                     output=path, workers=1, chunk_size=1, stderr=stderr)
+        
+        with zipfile.ZipFile(path) as archive:
+            self.assertEqual(
+                sorted(archive.namelist()),
+                sorted(f'invoice_{order.pk}.pdf' for order in self.orders[:2])
+            )
+            self.assertTrue(archive.read(f'invoice_{self.orders[0].pk}.pdf').startswith(b'%PDF'))
+        self.assertIn('стр/с', stderr.getvalue())
+    
+    def test_admin_action_streams_zip(self):
+        """Test that the admin action returns a streamed archive for the selection."""
+        self.client.login(email="admin@example.com", password="adminpass123")
+        response = self.client.post(reverse('admin:orders_order_changelist'), {
+            'action': 'export_invoices',
+            '_selected_action': [self.orders[0].pk],
+        })
+        
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        self.assertTrue(response.streaming)
+        with zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content))) as archive:
+            self.assertEqual(archive.namelist(), [f'invoice_{self.orders[0].pk}.pdf'])
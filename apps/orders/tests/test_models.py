@@ -0,0 +1,301 @@
+import importlib
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+from types import SimpleNamespace
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+
+from apps.products.models import Category, Product
+from ..models import DailySales, Order, OrderItem, OrderSummary
+
+User = get_user_model()
+
+
+class OrderSnapshotTest(TestCase):
+    """Test the order line snapshot."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Coffee", slug="coffee")
+        cls.arabica = Product.objects.create(
+            name="Arabica", slug="arabica", description="Arabica beans",
+            price=Decimal('450.00'), category=cls.category, stock=10
+        )
+        cls.robusta = Product.objects.create(
+            name="Robusta", slug="robusta", description="Robusta beans",
+            price=Decimal('300.50'), category=cls.category, stock=10
+        )
+        cls.user = User.objects.create_user(email="buyer@example.com", password="testpass123", username="buyer")
+    
+    def _create_order(self):
+        return Order.objects.create(
+            user=self.user, first_name="Ivan", last_name="Petrov", email="buyer@example.com",
+            address="Moscow", postal_code="101000", city="Moscow", phone="+7999"
+        )
+    
+    def test_add_items_from_cart_stores_snapshot(self):
+        """Test that placing an order stores lines and total in the snapshot."""
+        order = self._create_order()
+        cart = [
+            {'product': self.arabica, 'price': Decimal('450.00'), 'quantity': 2},
+            {'product': self.robusta, 'price': Decimal('300.50'), 'quantity': 1},
+        ]
+        order.add_items_from_cart(cart)
+        order.refresh_from_db()
+        
+        self.assertEqual(order.items.count(), 2)
+        self.assertEqual(order.total_cost, Decimal('1200.50'))
+        self.assertEqual(order.get_total_cost(), Decimal('1200.50'))
+        self.assertEqual(
+            [(line.name, line.quantity, line.cost) for line in order.lines],
+            [('Arabica', 2, Decimal('900.00')), ('Robusta', 1, Decimal('300.50'))]
+        )
+    
+    def test_lines_do_not_query_items(self):
+        """Test that reading lines from a loaded order hits no other tables."""
+        order = self._create_order()
+        order.add_items_from_cart([{'product': self.arabica, 'price': Decimal('450.00'), 'quantity': 1}])
+        order = Order.objects.get(pk=order.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(order.lines[0].name, 'Arabica')
+            self.assertEqual(order.get_total_cost(), Decimal('450.00'))
+    
+    def test_backfill_command_builds_missing_snapshots(self):
+        """Test that the backfill command fills snapshots of historical orders."""
+        order = self._create_order()
+        OrderItem.objects.create(order=order, product=self.robusta, price=Decimal('300.50'), quantity=3)
+        self.assertEqual(order.snapshot, {})
+        
+        call_command('backfill_order_snapshots', chunk_size=1, stdout=open('/dev/null', 'w'))
+        order.refresh_from_db()
+        
+        self.assertEqual(order.total_cost, Decimal('901.50'))
+        self.assertEqual(order.lines[0].slug, 'robusta')
+    
+    def test_migration_backfills_items_count(self):
+        """Test that the data migration counts units of orders that already had a snapshot."""
+        migration = importlib.import_module('apps.orders.migrations.0010_backfill_order_items_count')
+        order = self._create_order()
+        order.add_items_from_cart([
+            {'product': self.arabica, 'price': Decimal('450.00'), 'quantity': 2},
+            {'product': self.robusta, 'price': Decimal('300.50'), 'quantity': 3},
+        ])
+        empty = self._create_order()
+        Order.objects.filter(pk=order.pk).update(items_count=0)
+        
+        migration.backfill_items_count(None, SimpleNamespace(connection=connection))
+        
+        self.assertEqual(Order.objects.get(pk=order.pk).items_count, 5)
+        self.assertEqual(Order.objects.get(pk=empty.pk).items_count, 0)
+    
+    def test_version_1_snapshots_are_read(self):
+        """Test that snapshots stored before images were added decode without an image."""
+        order = Order(snapshot={'v': 1, 'lines': [[1, 'arabica', 'Arabica', '450.00', 2, '900.00']], 'total': '900.00'})
+        
+        self.assertEqual(order.lines[0].cost, Decimal('900.00'))
+        self.assertEqual((order.lines[0].image, order.lines[0].image_url), ('', ''))
+
+
+class OrderSummaryTest(TestCase):
+    """Test the incrementally maintained per-user order rollup."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Coffee", slug="coffee")
+        cls.product = Product.objects.create(
+            name="Arabica", slug="arabica", description="Arabica beans",
+            price=Decimal('100.00'), category=cls.category, stock=10
+        )
+        cls.user = User.objects.create_user(email="buyer@example.com", password="testpass123", username="buyer")
+    
+    def _place_order(self, quantity=1):
+        order = Order.objects.create(
+            user=self.user, first_name="Ivan", last_name="Petrov", email="buyer@example.com",
+            address="Moscow", postal_code="101000", city="Moscow", phone="+7999"
+        )
+        order.add_items_from_cart([{'product': self.product, 'price': Decimal('100.00'), 'quantity': quantity}])
+        return order
+    
+    def test_summary_follows_order_lifecycle(self):
+        """Test that placing, paying and cancelling update the rollup."""
+        first = self._place_order(quantity=2)
+        second = self._place_order(quantity=1)
+        first.mark_paid()
+        second.mark_paid()
+        second.mark_paid()  # повторная оплата не должна учитываться дважды
+        
+        summary = OrderSummary.objects.get(pk=self.user.pk)
+        self.assertEqual(summary.order_count, 2)
+        self.assertEqual(summary.total_spent, Decimal('300.00'))
+        self.assertEqual(summary.last_order_ids, [second.pk, first.pk])
+        
+        second.cancel()
+        summary.refresh_from_db()
+        self.assertEqual(summary.order_count, 1)
+        self.assertEqual(summary.total_spent, Decimal('200.00'))
+    
+    def test_incremental_summary_matches_rebuild(self):
+        """Test that the incremental rollup equals a full rebuild."""
+        orders = [self._place_order(quantity=i) for i in range(1, 8)]
+        orders[0].mark_paid()
+        orders[3].mark_paid()
+        orders[3].cancel()
+        orders[5].cancel()
+        incremental = OrderSummary.objects.get(pk=self.user.pk)
+        
+        OrderSummary.objects.all().delete()
+        call_command('rebuild_order_summaries', chunk_size=1, stdout=open('/dev/null', 'w'))
+        rebuilt = OrderSummary.objects.get(pk=self.user.pk)
+        
+        self.assertEqual(
+            (incremental.order_count, incremental.total_spent, incremental.last_order_ids),
+            (rebuilt.order_count, rebuilt.total_spent, rebuilt.last_order_ids),
+        )
+    
+    def test_cancelled_order_is_not_reopened(self):
+        """Test that a cancelled order refuses other statuses and keeps the rollup."""
+        order = self._place_order()
+        order.mark_paid()
+        order.cancel()
+        
+        self.assertFalse(order.set_status(Order.Status.PROCESSING))
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.Status.CANCELLED)
+        summary = OrderSummary.objects.get(pk=self.user.pk)
+        self.assertEqual((summary.order_count, summary.total_spent), (0, Decimal('0.00')))
+    
+    def test_unpaying_reverts_total_spent(self):
+        """Test that taking a payment back subtracts it once."""
+        order = self._place_order(quantity=3)
+        order.mark_paid()
+        
+        self.assertTrue(order.mark_unpaid())
+        self.assertFalse(order.mark_unpaid())
+        summary = OrderSummary.objects.get(pk=self.user.pk)
+        self.assertEqual((summary.order_count, summary.total_spent), (1, Decimal('0.00')))
+    
+    def test_cancel_reads_payment_from_row(self):
+        """Test that cancelling a stale instance of a paid order subtracts the payment."""
+        order = self._place_order(quantity=2)
+        stale = Order.objects.get(pk=order.pk)
+        order.mark_paid()
+        
+        stale.cancel()
+        
+        summary = OrderSummary.objects.get(pk=self.user.pk)
+        self.assertEqual((summary.order_count, summary.total_spent), (0, Decimal('0.00')))
+    
+    def test_for_user_is_single_lookup(self):
+        """Test that reading the rollup costs one query."""
+        self._place_order()
+        with self.assertNumQueries(1):
+            summary = OrderSummary.for_user(self.user)
+        self.assertEqual(summary.order_count, 1)
+
+
+class DailySalesTest(TestCase):
+    """Test the incrementally maintained daily sales facts."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.coffee = Category.objects.create(name="Coffee", slug="coffee")
+        cls.tea = Category.objects.create(name="Tea", slug="tea")
+        cls.arabica = Product.objects.create(
+            name="Arabica", slug="arabica", description="Arabica beans",
+            price=Decimal('100.00'), category=cls.coffee, stock=10
+        )
+        cls.green = Product.objects.create(
+            name="Green tea", slug="green-tea", description="Green tea",
+            price=Decimal('50.00'), category=cls.tea, stock=10
+        )
+    
+    def _place_order(self, created_at, lines):
+        order = Order.objects.create(
+            first_name="Ivan", last_name="Petrov", email="buyer@example.com",
+            address="Moscow", postal_code="101000", city="Moscow", phone="+7999"
+        )
+        Order.objects.filter(pk=order.pk).update(created_at=created_at)
+        order.refresh_from_db()
+        order.add_items_from_cart([
+            {'product': product, 'price': product.price, 'quantity': quantity}
+            for product, quantity in lines
+        ])
+        return order
+    
+    def test_paid_orders_are_bucketed_by_moscow_date(self):
+        """Test that a payment lands on the Moscow date of the order."""
+        # 22:30 UTC 1 марта — это уже 2 марта по Москве
+        order = self._place_order(
+            datetime(2025, 3, 1, 22, 30, tzinfo=dt_timezone.utc),
+            [(self.arabica, 2), (self.green, 1)]
+        )
+        order.mark_paid()
+        
+        day_total = DailySales.objects.get(date=date(2025, 3, 2), category=None)
+        self.assertEqual((day_total.order_count, day_total.units, day_total.revenue), (1, 3, Decimal('250.00')))
+        coffee = DailySales.objects.get(date=date(2025, 3, 2), category=self.coffee)
+        self.assertEqual((coffee.order_count, coffee.units, coffee.revenue), (1, 2, Decimal('200.00')))
+    
+    def test_cancellation_reverts_paid_sales(self):
+        """Test that cancelling a paid order subtracts it, unpaid cancellations change nothing."""
+        created_at = datetime(2025, 3, 5, 12, 0, tzinfo=dt_timezone.utc)
+        paid = self._place_order(created_at, [(self.arabica, 1)])
+        unpaid = self._place_order(created_at, [(self.green, 4)])
+        paid.mark_paid()
+        unpaid.cancel()
+        paid.cancel()
+        
+        day_total = DailySales.objects.get(date=date(2025, 3, 5), category=None)
+        self.assertEqual((day_total.order_count, day_total.units, day_total.revenue), (0, 0, Decimal('0')))
+        self.assertEqual(DailySales.find_mismatches(date(2025, 3, 1), date(2025, 3, 31)), [])
+    
+    def test_round_trip_leaves_no_drift(self):
+        """Test that paying, unpaying, cancelling and a refused reopen keep the table consistent."""
+        created_at = datetime(2025, 3, 7, 12, 0, tzinfo=dt_timezone.utc)
+        first = self._place_order(created_at, [(self.arabica, 2), (self.green, 1)])
+        second = self._place_order(created_at, [(self.green, 3)])
+        first.mark_paid()
+        first.mark_unpaid()
+        first.mark_paid()
+        second.mark_paid()
+        second.cancel()
+        second.set_status(Order.Status.DELIVERED)
+        second.mark_unpaid()
+        
+        self.assertEqual(DailySales.find_mismatches(date(2025, 3, 1), date(2025, 3, 31)), [])
+        day_total = DailySales.objects.get(date=date(2025, 3, 7), category=None)
+        self.assertEqual((day_total.order_count, day_total.units, day_total.revenue), (1, 3, Decimal('250.00')))
+    
+    def test_backfill_is_idempotent_and_consistent(self):
+        """Test that the backfill rebuilds the same facts the incremental path produced."""
+        for day in (3, 3, 4, 20):
+            order = self._place_order(
+                datetime(2025, 3, day, 9, 0, tzinfo=dt_timezone.utc),
+                [(self.arabica, day % 3 + 1), (self.green, 1)]
+            )
+            order.mark_paid()
+        incremental = sorted(DailySales.objects.values_list('date', 'category_id', 'order_count', 'units', 'revenue'),
+                             key=str)
+        
+        devnull = open('/dev/null', 'w')
+        for _ in range(2):
+            call_command('backfill_daily_sales', date_from=date(2025, 3, 1), date_to=date(2025, 3, 31),
+                         chunk_days=7, stdout=devnull)
+        rebuilt = sorted(DailySales.objects.values_list('date', 'category_id', 'order_count', 'units', 'revenue'),
+                         key=str)
+        
+        self.assertEqual(incremental, rebuilt)
+        call_command('check_daily_sales', date_from=date(2025, 3, 1), date_to=date(2025, 3, 31), stdout=devnull)
+    
+    def test_check_reports_drift(self):
+        """Test that the consistency check fails when the table drifts from raw data."""
+        order = self._place_order(datetime(2025, 3, 5, 12, 0, tzinfo=dt_timezone.utc), [(self.arabica, 1)])
+        order.mark_paid()
+        DailySales.objects.filter(category=None).update(units=42)
+        with self.assertRaises(CommandError):
+            call_command('check_daily_sales', date_from=date(2025, 3, 1), date_to=date(2025, 3, 31),
+                         stdout=open('/dev/null', 'w'))
@@ -0,0 +1,128 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.core.pagination import KeysetPaginator
+from apps.products.models import Category, Product
+from .. import partitioning
+from ..models import DailySales, Order, OrderItem
+
+User = get_user_model()
+
+
+class OrderPartitioningTest(TestCase):
+    """Test the monthly partitioning of the order tables and partition pruning."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email="buyer@example.com", password="pass12345", username="buyer")
+        category = Category.objects.create(name="Coffee", slug="coffee")
+        cls.product = Product.objects.create(
+            name="Arabica", slug="arabica", description="Arabica beans",
+            price=Decimal('100.00'), category=category, stock=10
+        )
+        # Первый месяц, у которого есть собственная секция
+        cls.month = partitioning.history_bound('orders_order')
+        cls.next_month = partitioning.add_months(cls.month, 1)
+        cls.orders = [
+            cls.place(datetime.combine(month.replace(day=10), datetime.min.time(), tzinfo=partitioning.TIME_ZONE))
+            for month in (cls.month, cls.next_month)
+        ]
+    
+    @classmethod
+    def place(cls, created_at):
+        order = Order.objects.create(
+            user=cls.user, first_name="Ivan", last_name="Petrov", email="buyer@example.com",
+            address="Moscow", postal_code="101000", city="Moscow", phone="+7999"
+        )
+        order.add_items_from_cart([{'product': cls.product, 'price': cls.product.price, 'quantity': 1}])
+        # Строки переезжают в секцию нового месяца
+        Order.objects.filter(pk=order.pk).update(created_at=created_at)
+        OrderItem.objects.filter(order=order).update(created_at=created_at)
+        order.refresh_from_db()
+        return order
+    
+    def test_tables_are_partitioned(self):
+        """Test that both tables have history, monthly and default partitions."""
+        for table in partitioning.PARTITIONED_TABLES:
+            self.assertTrue(partitioning.is_partitioned(table))
+            partitions = partitioning.partition_bounds(table)
+            self.assertIn(partitioning.history_name(table), partitions)
+            self.assertIn(partitioning.partition_name(table, self.month), partitions)
+            self.assertIn(f'{table}_default', partitions)
+    
+    def test_rows_land_in_their_month(self):
+        """Test that an order and its items are stored in the partition of their month."""
+        order = self.orders[0]
+        self.assertEqual(
+            partitioning.explain_relations(Order.objects.filter(pk=order.pk, created_at=order.created_at)),
+            {partitioning.partition_name('orders_order', self.month)}
+        )
+        self.assertEqual(list(order.items.values_list('product_id', flat=True)), [self.product.pk])
+    
+    def test_report_date_range_is_pruned(self):
+        """Test that a one-month report range scans a single order partition."""
+        start, end = DailySales.day_bounds(self.month, self.next_month - timedelta(days=1))
+        orders = Order.objects.filter(created_at__gte=start, created_at__lt=end)
+        self.assertEqual(partitioning.explain_relations(orders), {partitioning.partition_name('orders_order', self.month)})
+        self.assertEqual(list(orders), [self.orders[0]])
+    
+    def test_sales_aggregation_skips_history(self):
+        """Test that rebuilding the sales facts does not read the history partitions."""
+        start, end = DailySales.day_bounds(self.month, self.next_month - timedelta(days=1))
+        items = OrderItem.objects.filter(
+            created_at__gte=start, order__created_at__gte=start, order__created_at__lt=end
+        )
+        relations = partitioning.explain_relations(items)
+        self.assertIn(partitioning.partition_name('orders_order', self.month), relations)
+        self.assertNotIn('orders_order_history', relations)
+        self.assertNotIn('orders_orderitem_history', relations)
+        self.assertNotIn(partitioning.partition_name('orders_order', self.next_month), relations)
+    
+    def test_order_history_cursor_skips_newer_partitions(self):
+        """Test that a keyset page after a cursor does not read partitions newer than the cursor."""
+        paginator = KeysetPaginator(Order.objects.filter(user=self.user), 1)
+        first = paginator.page()
+        self.assertEqual(first.object_list, [self.orders[1]])
+        second = paginator.page(KeysetPaginator.encode_cursor(self.orders[0]))
+        self.assertEqual(second.object_list, [])
+        # Условие created_at__lte из курсора отсекает более новые секции
+        relations = partitioning.explain_relations(
+            Order.objects.filter(user=self.user, created_at__lte=self.orders[0].created_at)
+        )
+        self.assertNotIn(partitioning.partition_name('orders_order', self.next_month), relations)
+        self.assertNotIn('orders_order_default', relations)
+        self.assertEqual(paginator.page(first.next_cursor).object_list, [self.orders[0]])
+    
+    def test_command_creates_missing_partitions_once(self):
+        """Test that the command creates future partitions and skips existing ones."""
+        this_month = partitioning.month_start(timezone.now().astimezone(partitioning.TIME_ZONE).date())
+        expected = {
+            partitioning.partition_name('orders_order', month)
+            for month in (partitioning.add_months(this_month, offset) for offset in range(12))
+            if month >= self.month
+        } - set(partitioning.partition_bounds('orders_order'))
+        out = StringIO()
+        call_command('create_order_partitions', months=12, stdout=out)
+        for name in expected:
+            self.assertIn(f'Создана секция {name}', out.getvalue())
+            self.assertIn(name, partitioning.partition_bounds('orders_order'))
+    
+        out = StringIO()
+        call_command('create_order_partitions', months=12, stdout=out)
+        self.assertNotIn('Создана секция', out.getvalue())
+    
+    def test_command_reports_rows_in_default_partition(self):
+        """Test that a month already present in the default partition is reported, not crashed on."""
+        far_month = partitioning.add_months(self.month, 6)
+        self.place(datetime.combine(far_month, datetime.min.time(), tzinfo=partitioning.TIME_ZONE))
+        with self.assertRaises(CommandError):
+            call_command('create_order_partitions', months=12, stdout=StringIO())
+        # Транзакция теста не сломана: секция откатилась точкой сохранения
+        self.assertEqual(Order.objects.count(), 3)
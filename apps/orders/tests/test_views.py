@@ -0,0 +1,186 @@
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
+from django.core.files.storage import default_storage
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+
+from apps.products.models import Category, Product
+from ..models import DailySales, Order
+
+User = get_user_model()
+
+
+class OrderReadViewsTest(TestCase):
+    """Test that order pages render from the snapshot."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Coffee", slug="coffee")
+        cls.product = Product.objects.create(
+            name="Arabica", slug="arabica", description="Arabica beans",
+            price=Decimal('450.00'), category=cls.category, stock=10
+        )
+        cls.user = User.objects.create_user(email="buyer@example.com", password="testpass123", username="buyer")
+        cls.order = Order.objects.create(
+            user=cls.user, first_name="Ivan", last_name="Petrov", email="buyer@example.com",
+            address="Moscow", postal_code="101000", city="Moscow", phone="+7999"
+        )
+        cls.order.add_items_from_cart([{'product': cls.product, 'price': Decimal('450.00'), 'quantity': 2}])
+    
+    def setUp(self):
+        self.client.login(email="buyer@example.com", password="testpass123")
+    
+    def test_order_detail_renders_snapshot_lines(self):
+        """Test that the order detail page shows snapshot lines."""
+        response = self.client.get(reverse('orders:order_detail', kwargs={'pk': self.order.pk}))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Arabica')
+        self.assertEqual(response.context['order'].lines[0].cost, Decimal('900.00'))
+    
+    def test_order_track_renders_snapshot_lines(self):
+        """Test that the order tracking page shows snapshot lines."""
+        response = self.client.get(reverse('orders:order_track', kwargs={'order_id': self.order.pk}))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Arabica')
+    
+    def test_order_read_paths_do_not_touch_items(self):
+        """Test that rendering an order does not query order items or products."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        urls = [
+            reverse('orders:order_detail', kwargs={'pk': self.order.pk}),
+            reverse('orders:order_track', kwargs={'order_id': self.order.pk}),
+            reverse('orders:order_created', kwargs={'order_id': self.order.pk}),
+        ]
+        for url in urls:
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.get(url)
+            tables = ' '.join(query['sql'] for query in ctx.captured_queries)
+            self.assertNotIn('orders_orderitem', tables, url)
+            self.assertNotIn('products_product', tables, url)
+    
+    def test_checkout_places_order_with_snapshot(self):
+        """Test that checkout stores the cart as an order snapshot."""
+        self.client.post(reverse('cart:cart_add', kwargs={'product_id': self.product.pk}), {'quantity': 3})
+        response = self.client.post(reverse('orders:checkout'))
+        order = Order.objects.exclude(pk=self.order.pk).get()
+        self.assertRedirects(response, reverse('orders:order_created', kwargs={'order_id': order.pk}),
+                             fetch_redirect_response=False)
+        self.assertEqual(order.total_cost, Decimal('1350.00'))
+        self.assertEqual(order.lines[0].quantity, 3)
+    
+    def test_failed_checkout_leaves_no_order(self):
+        """Test that an order is rolled back if its items cannot be added."""
+        self.client.post(reverse('cart:cart_add', kwargs={'product_id': self.product.pk}), {'quantity': 1})
+        
+        with mock.patch.object(Order, 'add_items_from_cart', side_effect=RuntimeError), \
+                self.assertRaises(RuntimeError):
+            self.client.post(reverse('orders:checkout'))
+        
+        self.assertEqual(list(Order.objects.all()), [self.order])
+    
+    def test_order_pages_show_snapshot_images(self):
+        """Test that product images are shown from the snapshot."""
+        product = Product.objects.create(
+            name="Robusta", slug="robusta", description="Robusta beans", image='products/robusta.jpg',
+            price=Decimal('300.00'), category=self.category, stock=10
+        )
+        order = Order.objects.create(
+            user=self.user, first_name="Ivan", last_name="Petrov", email="buyer@example.com",
+            address="Moscow", postal_code="101000", city="Moscow", phone="+7999"
+        )
+        order.add_items_from_cart([{'product': product, 'price': Decimal('300.00'), 'quantity': 1}])
+        
+        for url in (reverse('orders:order_detail', kwargs={'pk': order.pk}),
+                    reverse('orders:order_track', kwargs={'order_id': order.pk})):
+            self.assertContains(self.client.get(url), f'src="{default_storage.url("products/robusta.jpg")}"')
+
+
+class OrderHistoryViewTest(TestCase):
+    """Test the keyset-paginated order history."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email="buyer@example.com", password="testpass123", username="buyer")
+        cls.orders = [
+            Order.objects.create(
+                user=cls.user, first_name="Ivan", last_name="Petrov", email="buyer@example.com",
+                address="Moscow", postal_code="101000", city="Moscow", phone="+7999",
+                total_cost=Decimal('100.00') * i, items_count=i
+            )
+            for i in range(1, 14)
+        ]
+    
+    def setUp(self):
+        self.client.login(email="buyer@example.com", password="testpass123")
+    
+    def test_history_first_page_is_newest_orders(self):
+        """Test that the first page lists the newest orders and links to the next one."""
+        response = self.client.get(reverse('orders:order_history'))
+        self.assertEqual(response.status_code, 200)
+        page = list(response.context['orders'])
+        self.assertEqual([order.pk for order in page], [order.pk for order in reversed(self.orders)][:10])
+        self.assertIsNotNone(response.context['next_cursor'])
+    
+    def test_history_json_follows_cursor(self):
+        """Test that the JSON endpoint continues after the cursor without gaps."""
+        first = self.client.get(reverse('orders:order_history_json')).json()
+        second = self.client.get(reverse('orders:order_history_json'), {'cursor': first['next_cursor']}).json()
+        ids = [row['id'] for row in first['results'] + second['results']]
+        self.assertEqual(ids, [order.pk for order in reversed(self.orders)])
+        self.assertIsNone(second['next_cursor'])
+        self.assertEqual(second['results'][-1]['items_count'], 1)
+    
+    def test_history_page_reads_orders_in_one_query(self):
+        """Test that the history page reads orders once and never touches order items."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('orders:order_history'))
+        order_queries = [q['sql'] for q in ctx.captured_queries if 'orders_order' in q['sql']]
+        self.assertEqual(len(order_queries), 1)
+        self.assertNotIn('orders_orderitem', order_queries[0])
+        self.assertNotIn('snapshot', order_queries[0])
+    
+    def test_history_rejects_malformed_cursor(self):
+        """Test that a malformed cursor returns 404."""
+        response = self.client.get(reverse('orders:order_history_json'), {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 404)
+
+
+class AdminSalesReportTest(TestCase):
+    """Test the sales report served from the daily sales facts."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(email="staff@example.com", password="testpass123",
+                                             username="staff", is_staff=True)
+        cls.category = Category.objects.create(name="Coffee", slug="coffee")
+        DailySales.objects.create(date=date(2025, 1, 10), category=None, order_count=2, units=5,
+                                  revenue=Decimal('500.00'))
+        DailySales.objects.create(date=date(2025, 1, 10), category=cls.category, order_count=2, units=5,
+                                  revenue=Decimal('500.00'))
+        DailySales.objects.create(date=date(2025, 2, 10), category=None, order_count=1, units=1,
+                                  revenue=Decimal('100.00'))
+    
+    def test_report_reads_only_daily_sales(self):
+        """Test that the report filters by date and never queries orders."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        self.client.force_login(self.staff)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('orders:admin_sales_report'),
+                                       {'date_from': '2025-01-01', 'date_to': '2025-01-31'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_orders'], 2)
+        self.assertEqual(response.context['total_revenue'], Decimal('500.00'))
+        self.assertEqual(response.context['sales_by_category'][0]['category__name'], 'Coffee')
+        sql = ' '.join(query['sql'] for query in ctx.captured_queries)
+        self.assertNotIn('orders_order"', sql)
+        self.assertNotIn('orders_orderitem', sql)
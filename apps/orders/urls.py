@@ -13,10 +13,15 @@ urlpatterns = [
     path('create/', views.order_create, name='order_create'),
     path('created/<int:order_id>/', views.order_created, name='order_created'),
     path('history/', views.OrderListView.as_view(), name='order_history'),
+    path('history/json/', views.order_history_json, name='order_history_json'),
     path('detail/<int:pk>/', views.OrderDetailView.as_view(), name='order_detail'),
     path('cancel/<int:order_id>/', views.order_cancel, name='order_cancel'),
     path('track/<int:order_id>/', views.order_track, name='order_track'),
     
+    # Документы
+    path('invoice/<int:order_id>/', views.order_invoice_pdf, name='order_invoice_pdf'),
+    path('receipt/<int:order_id>/', views.order_receipt_pdf, name='order_receipt_pdf'),
+    
     # Оплата
     path('payment/process/', views.payment_process, name='payment_process'),
     path('payment/completed/', views.payment_completed, name='payment_completed'),
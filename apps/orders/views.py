@@ -2,24 +2,31 @@ from django.core.paginator import Paginator
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, user_passes_test
+from django.contrib.auth.views import redirect_to_login
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy, reverse
+from django.utils.dateparse import parse_date
+from django.utils.functional import SimpleLazyObject
 from django.utils.translation import gettext_lazy as _
-from django.db.models import Sum, F, DecimalField, Count
-from django.db.models.functions import Coalesce, TruncDate
+from django.db import transaction
+from django.db.models import Sum
 from django.views.decorators.http import require_POST, require_http_methods
-from django.http import JsonResponse, HttpResponse, HttpResponseServerError, HttpResponseRedirect, FileResponse
+from django.http import Http404, JsonResponse, HttpResponseServerError, HttpResponseRedirect, FileResponse
 from django.template.loader import render_to_string
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.conf import settings
 from django.forms import modelform_factory
+import json
 import os
 
-from .models import Order, OrderItem
+from .archive import OrderArchive
+from .models import ArchivedOrder, DailySales, Order, OrderSummary
+from apps.core.db_routing import replica_reads
+from apps.core.pagination import KeysetPaginator, InvalidCursor
 from apps.products.models import Product
 from apps.shop_cart.cart import Cart
-from .pdf_utils import generate_invoice_pdf, generate_receipt_pdf
+from .documents import get_document
 
 
 @login_required
@@ -36,27 +43,22 @@ def checkout(request):
     user = request.user
     
     if request.method == 'POST':
-        # Создаем заказ
-        order = Order.objects.create(
-            user=user,
-            first_name=user.first_name,
-            last_name=user.last_name,
-            email=user.email,
-            phone=user.phone if hasattr(user, 'phone') else '',
-            address=user.address if hasattr(user, 'address') else '',
-            postal_code=user.postal_code if hasattr(user, 'postal_code') else '',
-            city=user.city if hasattr(user, 'city') else '',
-            country=user.country if hasattr(user, 'country') else '',
-        )
-        
-        # Добавляем товары в заказ
-        for item in cart:
-            OrderItem.objects.create(
-                order=order,
-                product=item['product'],
-                price=item['price'],
-                quantity=item['quantity']
+        # Заказ без строк не должен остаться в базе, если добавление товаров упадет
+        with transaction.atomic():
+            # Создаем заказ
+            order = Order.objects.create(
+                user=user,
+                first_name=user.first_name,
+                last_name=user.last_name,
+                email=user.email,
+                phone=user.phone if hasattr(user, 'phone') else '',
+                address=user.address if hasattr(user, 'address') else '',
+                postal_code=user.postal_code if hasattr(user, 'postal_code') else '',
+                city=user.city if hasattr(user, 'city') else '',
             )
+            
+            # Добавляем товары в заказ и сохраняем снимок строк
+            order.add_items_from_cart(cart)
         
         # Очищаем корзину
         cart.clear()
@@ -67,6 +69,10 @@ def checkout(request):
     return render(request, 'orders/checkout.html', {'cart': cart})
 
 
+# Заказы, оформленные гостем в текущей сессии
+GUEST_ORDERS_SESSION_KEY = 'guest_order_ids'
+
+
 def guest_checkout(request):
     """
     Оформление заказа без регистрации
@@ -77,27 +83,27 @@ def guest_checkout(request):
         return redirect('cart:cart_detail')
     
     # Создаем форму для гостевого заказа
-    OrderForm = modelform_factory(Order, fields=('first_name', 'last_name', 'email', 'phone', 'address', 'postal_code', 'city', 'country'))
+    OrderForm = modelform_factory(Order, fields=('first_name', 'last_name', 'email', 'phone', 'address', 'postal_code', 'city'))
     
     if request.method == 'POST':
         form = OrderForm(request.POST)
         if form.is_valid():
-            # Создаем заказ
-            order = form.save(commit=False)
-            order.save()
-            
-            # Добавляем товары в заказ
-            for item in cart:
-                OrderItem.objects.create(
-                    order=order,
-                    product=item['product'],
-                    price=item['price'],
-                    quantity=item['quantity']
-                )
+            with transaction.atomic():
+                # Создаем заказ
+                order = form.save(commit=False)
+                order.save()
+                
+                # Добавляем товары в заказ и сохраняем снимок строк
+                order.add_items_from_cart(cart)
             
             # Очищаем корзину
             cart.clear()
             
+            # Гость может скачать документы своих заказов, пока жива сессия
+            request.session[GUEST_ORDERS_SESSION_KEY] = [
+                *request.session.get(GUEST_ORDERS_SESSION_KEY, []), order.id
+            ]
+            
             # Перенаправляем на страницу успешного оформления заказа
             return redirect('orders:order_created', order_id=order.id)
     else:
@@ -114,6 +120,18 @@ def order_created(request, order_id):
     return render(request, 'orders/order_created.html', {'order': order})
 
 
+ORDER_HISTORY_FIELDS = ('id', 'created_at', 'status', 'paid', 'total_cost', 'items_count')
+
+
+def _order_history_page(request, per_page):
+    """Страница истории заказов пользователя с keyset-пагинацией"""
+    orders = Order.objects.filter(user=request.user).only(*ORDER_HISTORY_FIELDS)
+    try:
+        return KeysetPaginator(orders, per_page).page(request.GET.get('cursor'))
+    except InvalidCursor:
+        raise Http404(_('Некорректный курсор'))
+
+
 class OrderListView(LoginRequiredMixin, ListView):
     """Список заказов пользователя"""
     model = Order
@@ -122,7 +140,39 @@ class OrderListView(LoginRequiredMixin, ListView):
     paginate_by = 10
     
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user).order_by('-created_at')
+        self.page = _order_history_page(self.request, self.paginate_by)
+        return self.page.object_list
+    
+    def paginate_queryset(self, queryset, page_size):
+        # Пагинация уже выполнена по ключу (created_at, id) в get_queryset
+        return None, None, queryset, self.page.has_next
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['next_cursor'] = self.page.next_cursor
+        return context
+
+
+@login_required
+def order_history_json(request):
+    """История заказов в JSON для бесконечной прокрутки"""
+    page = _order_history_page(request, OrderListView.paginate_by)
+    return JsonResponse({
+        'results': [
+            {
+                'id': order.id,
+                'created_at': order.created_at.isoformat(),
+                'status': order.status,
+                'status_display': order.get_status_display(),
+                'paid': order.paid,
+                'total_cost': str(order.total_cost),
+                'items_count': order.items_count,
+                'url': reverse('orders:order_detail', kwargs={'pk': order.id}),
+            }
+            for order in page.object_list
+        ],
+        'next_cursor': page.next_cursor,
+    })
 
 
 class OrderDetailView(LoginRequiredMixin, DetailView):
@@ -133,6 +183,9 @@ class OrderDetailView(LoginRequiredMixin, DetailView):
     
     def get_queryset(self):
         return Order.objects.filter(user=self.request.user)
+    
+    def get_object(self, queryset=None):
+        return get_user_order(self.kwargs['pk'], self.request.user)
 
 
 @login_required
@@ -145,33 +198,25 @@ def order_create(request):
         return redirect('cart:cart_detail')
     
     if request.method == 'POST':
-        order = Order.objects.create(
-            user=request.user,
-            first_name=request.POST.get('first_name'),
-            last_name=request.POST.get('last_name'),
-            email=request.POST.get('email'),
-            phone=request.POST.get('phone'),
-            address=request.POST.get('address'),
-            comment=request.POST.get('comment', ''),
-            delivery_type=request.POST.get('delivery_type', 'self'),
-            payment_method=request.POST.get('payment_method', 'online'),
-            status=Order.Status.PENDING
-        )
-        
-        # Добавляем товары из корзины в заказ
-        for item in cart:
-            OrderItem.objects.create(
-                order=order,
-                product=item['product'],
-                price=item['price'],
-                quantity=item['quantity']
+        with transaction.atomic():
+            order = Order.objects.create(
+                user=request.user,
+                first_name=request.POST.get('first_name'),
+                last_name=request.POST.get('last_name'),
+                email=request.POST.get('email'),
+                phone=request.POST.get('phone'),
+                address=request.POST.get('address'),
+                status=Order.Status.PENDING
             )
+            
+            # Добавляем товары из корзины в заказ
+            order.add_items_from_cart(cart)
         
         # Очищаем корзину
         cart.clear()
                
         messages.success(request, _('Ваш заказ успешно оформлен! Номер вашего заказа: ') + str(order.id))
-        return redirect('orders:order_detail', order_id=order.id)
+        return redirect('orders:order_detail', pk=order.id)
     
     return render(request, 'orders/order_create.html', {'cart': cart})
 
@@ -182,13 +227,12 @@ def order_cancel(request, order_id):
     order = get_object_or_404(Order, id=order_id, user=request.user)
     
     if order.status in [Order.Status.PENDING, Order.Status.PROCESSING]:
-        order.status = Order.Status.CANCELLED
-        order.save()
+        order.cancel(changed_by=request.user)
         messages.success(request, _('Заказ успешно отменен'))
     else:
         messages.error(request, _('Невозможно отменить заказ в текущем статусе'))
     
-    return redirect('orders:order_detail', order_id=order.id)
+    return redirect('orders:order_detail', pk=order.id)
 
 
 @login_required
@@ -206,13 +250,13 @@ def update_order_status(request, order_id):
     if not request.user.is_staff:
         return JsonResponse({'error': 'Доступ запрещен'}, status=403)
     
-    if request.method == 'POST' and request.is_ajax():
+    if request.method == 'POST' and request.headers.get('x-requested-with') == 'XMLHttpRequest':
         order = get_object_or_404(Order, id=order_id)
         new_status = request.POST.get('status')
         
         if new_status in dict(Order.Status.choices):
-            order.status = new_status
-            order.save()
+            if not order.set_status(new_status, changed_by=request.user):
+                return JsonResponse({'error': 'Отмененный заказ нельзя вернуть в работу'}, status=409)
             return JsonResponse({'status': 'success', 'new_status': order.get_status_display()})
         
         return JsonResponse({'error': 'Неверный статус'}, status=400)
@@ -230,8 +274,7 @@ def payment_process(request):
     
     # Здесь должна быть логика обработки платежа через платежный шлюз
     # В данном примере просто помечаем заказ как оплаченный
-    order.paid = True
-    order.save()
+    order.mark_paid()
     
     return JsonResponse({'status': 'success', 'order_id': order.id})
 
@@ -243,8 +286,7 @@ def payment_completed(request):
     order = get_object_or_404(Order, id=order_id)
     
     if not order.paid:
-        order.paid = True
-        order.save()
+        order.mark_paid()
     
     return render(request, 'orders/payment/completed.html', {'order': order})
 
@@ -260,9 +302,10 @@ def payment_canceled(request):
 # Административные отчеты
 @login_required
 @user_passes_test(lambda u: u.is_staff)
+@replica_reads
 def admin_order_report(request):
     """Отчет по заказам для администратора"""
-    orders = Order.objects.all().order_by('-created_at')
+    orders = Order.objects.select_related('user').order_by('-created_at')
     
     # Фильтрация по дате, если указана
     date_from = request.GET.get('date_from')
@@ -285,99 +328,144 @@ def admin_order_report(request):
     })
 
 
+def _parse_report_date(value):
+    """Дата фильтра отчета или None, если она не задана или некорректна"""
+    try:
+        return parse_date(value or '')
+    except ValueError:
+        return None
+
+
 @login_required
 @user_passes_test(lambda u: u.is_staff)
+@replica_reads
 def admin_sales_report(request):
     """Отчет по продажам для администратора"""
-    # Получаем данные о продажах по категориям
-    sales_by_category = OrderItem.objects.values(
-        'product__category__name'
-    ).annotate(
-        total_quantity=Sum('quantity'),
-        total_revenue=Sum(F('price') * F('quantity'), output_field=DecimalField())
-    ).order_by('-total_revenue')
-    
-    # Получаем данные о продажах по дням
-    sales_by_day = Order.objects.filter(paid=True).annotate(
-        date=TruncDate('created_at')
-    ).values('date').annotate(
-        total_orders=Count('id'),
-        total_revenue=Sum('get_total_cost')
-    ).order_by('date')
-    
-    # Фильтрация по дате, если указана
-    date_from = request.GET.get('date_from')
-    date_to = request.GET.get('date_to')
+    # Отчет читает только таблицу DailySales, она обновляется при оплате и отмене заказов
+    date_from = _parse_report_date(request.GET.get('date_from'))
+    date_to = _parse_report_date(request.GET.get('date_to'))
     
+    facts = DailySales.objects.all()
     if date_from:
-        sales_by_category = sales_by_category.filter(order__created_at__gte=date_from)
-        sales_by_day = sales_by_day.filter(date__gte=date_from)
+        facts = facts.filter(date__gte=date_from)
     if date_to:
-        sales_by_category = sales_by_category.filter(order__created_at__lte=date_to)
-        sales_by_day = sales_by_day.filter(date__lte=date_to)
+        facts = facts.filter(date__lte=date_to)
+    
+    # Итоги дня хранятся в строках без категории
+    day_totals = facts.filter(category__isnull=True)
+    totals = day_totals.aggregate(
+        total_orders=Sum('order_count'),
+        total_revenue=Sum('revenue'),
+        total_products=Sum('units'),
+    )
+    total_revenue = totals['total_revenue'] or 0
+    
+    # Продажи по категориям
+    sales_by_category = list(facts.filter(category__isnull=False).values(
+        'category__name'
+    ).annotate(
+        total_quantity=Sum('units'),
+        total_revenue=Sum('revenue'),
+    ).order_by('-total_revenue'))
+    for row in sales_by_category:
+        row['percentage'] = float(row['total_revenue'] / total_revenue * 100) if total_revenue else 0
+    
+    # Продажи по дням
+    sales_by_day = list(day_totals.order_by('date').values_list('date', 'revenue'))
     
     return render(request, 'admin/reports/sales.html', {
         'sales_by_category': sales_by_category,
-        'sales_by_day': sales_by_day,
-        'date_from': date_from,
-        'date_to': date_to,
+        'sales_dates': json.dumps([day.strftime('%d.%m.%Y') for day, _revenue in sales_by_day]),
+        'sales_values': json.dumps([float(revenue) for _day, revenue in sales_by_day]),
+        'total_revenue': total_revenue,
+        'total_orders': totals['total_orders'] or 0,
+        'total_products': totals['total_products'] or 0,
+        'average_order': total_revenue / totals['total_orders'] if totals['total_orders'] else 0,
+        'date_from': request.GET.get('date_from'),
+        'date_to': request.GET.get('date_to'),
     })
 
 
-@login_required
 def order_invoice_pdf(request, order_id):
-    """Генерация PDF счета на оплату"""
-    order = get_object_or_404(Order, id=order_id, user=request.user)
-    
-    try:
-        # Генерируем PDF
-        pdf = generate_invoice_pdf(order)
-        
-        # Создаем ответ с PDF
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="invoice_{order.id}.pdf"'
-        response.write(pdf)
-        return response
-        
-    except Exception as e:
-        # В случае ошибки возвращаем сообщение об ошибке
-        messages.error(request, _('Произошла ошибка при генерации счета. Пожалуйста, попробуйте позже.'))
-        return redirect('orders:order_detail', order_id=order.id)
+    """Счет на оплату в PDF"""
+    order = get_request_order(request, order_id)
+    if order is None:
+        return redirect_to_login(request.get_full_path())
+    return _order_document_response(request, order, 'invoice')
 
 
-@login_required
 def order_receipt_pdf(request, order_id):
-    """Генерация PDF чека"""
-    order = get_object_or_404(Order, id=order_id, user=request.user)
-    
+    """Кассовый чек в PDF"""
+    order = get_request_order(request, order_id)
+    if order is None:
+        return redirect_to_login(request.get_full_path())
+    return _order_document_response(request, order, 'receipt')
+
+
+def _order_document_response(request, order, kind):
+    """Отдаёт документ из кэша, при промахе строит его один раз"""
     try:
-        # Генерируем PDF
-        pdf = generate_receipt_pdf(order)
-        
-        # Создаем ответ с PDF
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="receipt_{order.id}.pdf"'
-        response.write(pdf)
-        return response
-        
-    except Exception as e:
-        # В случае ошибки возвращаем сообщение об ошибке
-        messages.error(request, _('Произошла ошибка при генерации чека. Пожалуйста, попробуйте позже.'))
-        return redirect('orders:order_detail', order_id=order.id)
+        path = get_document(order, kind)
+    except Exception:
+        if kind == 'invoice':
+            messages.error(request, _('Произошла ошибка при генерации счета. Пожалуйста, попробуйте позже.'))
+        else:
+            messages.error(request, _('Произошла ошибка при генерации чека. Пожалуйста, попробуйте позже.'))
+        if not request.user.is_authenticated:
+            return redirect('orders:order_created', order_id=order.id)
+        return redirect('orders:order_detail', pk=order.id)
+    
+    return FileResponse(
+        open(path, 'rb'),
+        as_attachment=True,
+        filename=f'{kind}_{order.id}.pdf',
+        content_type='application/pdf'
+    )
 
 
 # Вспомогательные функции
+def get_user_order(order_id, user):
+    """Заказ пользователя из рабочих таблиц, а если его там нет — из архива"""
+    order = Order.objects.filter(id=order_id, user=user).first()
+    if order is None:
+        order = OrderArchive().load(order_id, user=user)
+    if order is None:
+        raise Http404(_('Заказ не найден'))
+    return order
+
+
+def get_request_order(request, order_id):
+    """
+    Заказ пользователя или заказ, оформленный гостем в этой сессии.
+    
+    Для анонимного посетителя без такого заказа возвращает None (нужен вход).
+    """
+    if request.user.is_authenticated:
+        return get_user_order(order_id, request.user)
+    if order_id not in request.session.get(GUEST_ORDERS_SESSION_KEY, []):
+        return None
+    return get_object_or_404(Order, id=order_id, user__isnull=True)
+
+
+def _last_orders(order_ids):
+    """Заказы из сводки; ушедшие в архив берутся из индекса архива"""
+    orders = list(Order.objects.filter(pk__in=order_ids).only(*ORDER_HISTORY_FIELDS))
+    missing = set(order_ids) - {order.pk for order in orders}
+    if missing:
+        orders.extend(entry.as_order() for entry in ArchivedOrder.objects.filter(pk__in=missing))
+    return sorted(orders, key=lambda order: (order.created_at, order.pk), reverse=True)
+
+
 def get_order_summary(user):
     """Получение сводной информации о заказах пользователя"""
-    orders = Order.objects.filter(user=user)
-    
-    total_orders = orders.count()
-    total_spent = orders.aggregate(
-        total=Coalesce(Sum('total_amount'), 0, output_field=DecimalField())
-    )['total']
+    # Сводка поддерживается инкрементально, здесь только чтение по первичному ключу
+    summary = OrderSummary.for_user(user)
     
     return {
-        'total_orders': total_orders,
-        'total_spent': total_spent,
-        'last_orders': orders.order_by('-created_at')[:5]
+        'total_orders': summary.order_count,
+        'total_spent': summary.total_spent,
+        'last_order_at': summary.last_order_at,
+        'last_order_ids': summary.last_order_ids,
+        # Ленивый список: запросы выполняются, только если шаблон выводит его
+        'last_orders': SimpleLazyObject(lambda: _last_orders(summary.last_order_ids)),
     }
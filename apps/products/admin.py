@@ -1,7 +1,11 @@
 from django.contrib import admin
+from django.db import transaction
 from django.utils.translation import gettext_lazy as _
 from import_export.admin import ImportExportModelAdmin
 
+from apps.core.admin import BulkListEditableMixin
+from apps.core.page_cache import bump_catalog_version
+from apps.core.pagination import EstimatedCountPaginator
 from .models import Category, Product
 
 
@@ -15,11 +19,14 @@ class CategoryAdmin(ImportExportModelAdmin):
 
 
 @admin.register(Product)
-class ProductAdmin(ImportExportModelAdmin):
+class ProductAdmin(BulkListEditableMixin, ImportExportModelAdmin):
     list_display = ('name', 'category', 'price', 'stock', 'is_available', 'created_at')
+    list_select_related = ('category',)
     list_filter = ('is_available', 'category', 'created_at')
     search_fields = ('name', 'description', 'category__name')
     list_editable = ('price', 'stock', 'is_available')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     prepopulated_fields = {'slug': ('name',)}
     readonly_fields = ('created_at', 'updated_at')
     
@@ -28,10 +35,14 @@ class ProductAdmin(ImportExportModelAdmin):
             'fields': ('name', 'slug', 'category', 'description', 'price', 'stock', 'is_available')
         }),
         (_('Images'), {
-            'fields': ('image', 'image_alt')
+            'fields': ('image',)
         }),
         (_('Metadata'), {
             'classes': ('collapse',),
             'fields': ('created_at', 'updated_at'),
         }),
-    )
\ No newline at end of file
+    )
+    
+    def list_edits_saved(self, request, objects):
+        # bulk_update не шлет post_save: сбрасываем кэш страниц каталога сами, один раз
+        transaction.on_commit(bump_catalog_version)
\ No newline at end of file
@@ -3,4 +3,7 @@ from django.apps import AppConfig
 class ProductsConfig(AppConfig):
 	default_auto_field = 'django.db.models.BigAutoField'
 	name = 'apps.products'
-	verbose_name = 'Продукты'
\ No newline at end of file
+	verbose_name = 'Продукты'
+
+	def ready(self):
+		from . import receivers  # noqa: F401
@@ -1,4 +1,7 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
+from django.db.models.functions import Upper
+from django.urls import reverse
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils.translation import gettext_lazy as _
 
@@ -19,6 +22,9 @@ class Category(TimeStampedModel):
     
     def __str__(self):
         return self.name
+    
+    def get_absolute_url(self):
+        return reverse('products:product_list_by_category', args=[self.slug])
 
 
 class Product(TimeStampedModel):
@@ -46,8 +52,16 @@ class Product(TimeStampedModel):
         verbose_name = _('product')
         verbose_name_plural = _('products')
         ordering = ('name',)
+        indexes = [
+            # Поиск в админке (icontains = UPPER(...) LIKE) по триграммам
+            GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'), name='product_name_trgm_idx'),
+            GinIndex(OpClass(Upper('description'), name='gin_trgm_ops'), name='product_description_trgm_idx'),
+        ]
     
     def __str__(self):
         return self.name
     
+    def get_absolute_url(self):
+        return reverse('products:product_detail', args=[self.id, self.slug])
+    
     # Removed Review model and average_rating property
@@ -0,0 +1,16 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.core.page_cache import bump_catalog_version
+
+from .models import Category, Product
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_page_cache(sender, **kwargs):
+    # После коммита: иначе страница успеет закэшироваться с еще старыми данными
+    transaction.on_commit(bump_catalog_version)
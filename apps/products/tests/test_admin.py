@@ -0,0 +1,99 @@
+from decimal import Decimal
+
+from django.contrib.admin.models import CHANGE, LogEntry
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.core import page_cache
+from ..models import Category, Product
+
+User = get_user_model()
+
+
+class ProductAdminTest(TestCase):
+    """Test the product changelist."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(email="admin@example.com", password="adminpass123", username="admin")
+        cls.category = Category.objects.create(name="Coffee", slug="coffee")
+        cls.add_products(3)
+    
+    @classmethod
+    def add_products(cls, count):
+        start = Product.objects.count()
+        Product.objects.bulk_create([
+            Product(
+                name=f"Coffee {i}", slug=f"coffee-{i}", description="Beans",
+                price=Decimal('100.00'), category=cls.category, stock=10
+            )
+            for i in range(start, start + count)
+        ])
+    
+    def setUp(self):
+        self.client.login(email="admin@example.com", password="adminpass123")
+        # The first request stores the empty cart in the session; later ones don't write it
+        self.client.get(reverse('admin:index'))
+        self.url = reverse('admin:products_product_changelist')
+    
+    def _query_count(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+    
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        """Test that the changelist runs the same number of queries for 3 and 8 products."""
+        before = self._query_count()
+        self.add_products(5)
+        self.assertEqual(self._query_count(), before)
+    
+    def _edit_data(self, products):
+        data = {
+            'form-TOTAL_FORMS': len(products),
+            'form-INITIAL_FORMS': len(products),
+            'form-MIN_NUM_FORMS': 0,
+            'form-MAX_NUM_FORMS': 1000,
+            '_save': 'Save',
+        }
+        for i, product in enumerate(products):
+            data.update({
+                f'form-{i}-id': product.pk,
+                f'form-{i}-price': '150.00' if i < 2 else product.price,
+                f'form-{i}-stock': product.stock,
+                f'form-{i}-is_available': 'on',
+            })
+        return data
+    
+    def test_list_editable_changes_are_saved_in_bulk(self):
+        """Test that edited rows are written with a single UPDATE and logged."""
+        products = list(Product.objects.order_by('pk'))
+        data = self._edit_data(products)
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, data)
+        
+        self.assertEqual(response.status_code, 302)
+        updates = [q for q in queries if q['sql'].startswith('UPDATE "products_product"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(
+            list(Product.objects.order_by('pk').values_list('price', flat=True)),
+            [Decimal('150.00'), Decimal('150.00'), Decimal('100.00')]
+        )
+        entries = LogEntry.objects.filter(action_flag=CHANGE)
+        self.assertEqual(sorted(entries.values_list('object_id', flat=True)), sorted(str(p.pk) for p in products[:2]))
+        self.assertEqual(entries.first().change_message, '[{"changed": {"fields": ["Price"]}}]')
+    
+    def test_list_editable_changes_invalidate_page_cache(self):
+        """Test that a changelist edit bumps the catalog version once after commit."""
+        before = page_cache.catalog_version()
+        
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            response = self.client.post(self.url, self._edit_data(list(Product.objects.order_by('pk'))))
+        
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(callbacks.count(page_cache.bump_catalog_version), 1)
+        self.assertNotEqual(page_cache.catalog_version(), before)
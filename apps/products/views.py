@@ -11,11 +11,12 @@ from django.http import JsonResponse, HttpResponseForbidden, HttpResponseBadRequ
 from django.contrib.auth.decorators import login_required
 
 # Импорт моделей и форм приложения
+from apps.core.db_routing import ReplicaReadsMixin
 from .models import Product, Category
 from apps.shop_cart.forms import CartAddProductForm
 
 
-class ProductListView(ListView):
+class ProductListView(ReplicaReadsMixin, ListView):
     """
     Класс-представление для отображения списка всех товаров.
     Поддерживает пагинацию, фильтрацию по категориям, поиск и сортировку.
@@ -64,15 +65,15 @@ class ProductListView(ListView):
         return context
 
 
-class ProductDetailView(DetailView):
+class ProductDetailView(ReplicaReadsMixin, DetailView):
     """View for displaying a single product with details."""
-    model = Product
+    queryset = Product.objects.select_related('category')
     template_name = 'products/product_detail.html'
     context_object_name = 'product'
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        product = self.get_object()
+        product = self.object
         
         # Get related products (same category, excluding current product)
         related_products = Product.objects.filter(
@@ -91,7 +92,7 @@ class ProductDetailView(DetailView):
         return context
 
 
-class ProductSearchView(TemplateView):
+class ProductSearchView(ReplicaReadsMixin, TemplateView):
     """View for handling product search."""
     template_name = 'products/search_results.html'
     
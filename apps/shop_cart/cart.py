@@ -13,8 +13,9 @@ class Cart:
         """
         self.session = request.session
         cart = self.session.get(settings.CART_SESSION_ID)
-        if not cart:
-            # Save an empty cart in the session
+        if cart is None:
+            # Save an empty cart in the session (only once: an empty dict
+            # stored again would mark the session modified on every request)
             cart = self.session[settings.CART_SESSION_ID] = {}
         self.cart = cart
 
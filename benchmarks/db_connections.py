@@ -0,0 +1,150 @@
+"""
+Request latency with a new, a persistent and a pooled database connection.
+
+    python -m benchmarks.db_connections [--requests 500] [--threads 1]
+
+Every mode runs in its own process (connection settings are read at
+startup): per-request (DB_CONN_MAX_AGE=0), persistent (DB_CONN_MAX_AGE=60)
+and pool (DB_POOL=1, skipped unless psycopg_pool is importable). Requests go
+through Django's WSGI handler, so connections are opened and closed exactly
+as under gunicorn. The view is the JSON order history of the user with the
+most orders in the configured database (a temporary user if there are no
+users); the benchmark deletes the session and user it creates.
+"""
+import argparse
+import importlib.util
+import io
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+MODES = {
+    'per-request': {'DB_CONN_MAX_AGE': '0'},
+    'persistent': {'DB_CONN_MAX_AGE': '60'},
+    'pool': {'DB_POOL': '1'},
+}
+
+
+def percentile(timings, fraction):
+    return timings[min(len(timings) - 1, int(len(timings) * fraction))]
+
+
+def run_child(requests, threads):
+    """Measure the current mode; prints one JSON line."""
+    import django
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'coffee_shop.settings')
+    os.environ['WEB_THREADS'] = str(threads)
+    django.setup()
+
+    from django.conf import settings
+    from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+    from django.contrib.sessions.backends.db import SessionStore
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.db import connections
+    from django.db.models import Count
+    from django.urls import reverse
+
+    from apps.core import db_pool
+
+    User = get_user_model()
+    user = User.objects.annotate(n=Count('orders')).order_by('-n').first()
+    temporary = user is None
+    if temporary:
+        user = User.objects.create_user(email='db-benchmark@example.invalid', username='db-benchmark')
+    session = SessionStore()
+    session.update({
+        SESSION_KEY: str(user.pk),
+        BACKEND_SESSION_KEY: settings.AUTHENTICATION_BACKENDS[0],
+        HASH_SESSION_KEY: user.get_session_auth_hash(),
+    })
+    session.create()
+    connections.close_all()
+    db_pool.reset()
+
+    handler = WSGIHandler()
+    path = reverse('orders:order_history_json')
+    cookie = f'{settings.SESSION_COOKIE_NAME}={session.session_key}'
+
+    def request():
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '', 'SERVER_NAME': 'localhost',
+            'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1', 'HTTP_COOKIE': cookie,
+            'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr, 'wsgi.url_scheme': 'http',
+            'wsgi.version': (1, 0), 'wsgi.multithread': threads > 1, 'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        statuses = []
+        response = handler(environ, lambda status, headers: statuses.append(status))
+        b''.join(response)
+        response.close()  # отправляет request_finished, как это делает WSGI-сервер
+        if not statuses[0].startswith('200'):
+            raise SystemExit(f'{path}: {statuses[0]}')
+
+    timings = []
+    lock = threading.Lock()
+
+    def worker(count):
+        local = []
+        for _ in range(count):
+            started = time.perf_counter()
+            request()
+            local.append((time.perf_counter() - started) * 1000)
+        with lock:
+            timings.extend(local)
+
+    request()  # прогрев: импорт шаблонов, первое соединение
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(requests // threads,)) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    stats = db_pool.stats()
+    session.delete()
+    if temporary:
+        user.delete()
+    timings.sort()
+    print(json.dumps({
+        'p50': percentile(timings, 0.5), 'p95': percentile(timings, 0.95), 'p99': percentile(timings, 0.99),
+        'rps': len(timings) / elapsed, 'checkouts': stats['checkouts'], 'connects': stats['connects'],
+        'waits': stats['waits'],
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=500, help='Requests per mode')
+    parser.add_argument('--threads', type=int, default=1, help='Concurrent request threads in the worker')
+    parser.add_argument('--child', choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_child(args.requests, args.threads)
+        return
+
+    print(f'{"mode":<13}{"p50 ms":>8}{"p95 ms":>8}{"p99 ms":>8}{"req/s":>8}{"checkouts":>11}{"connects":>10}{"waits":>7}')
+    for mode, env in MODES.items():
+        if mode == 'pool' and importlib.util.find_spec('psycopg_pool') is None:
+            print(f'{mode:<13}skipped: pip install "psycopg[binary,pool]"')
+            continue
+        child_env = {k: v for k, v in os.environ.items() if k not in ('DB_POOL', 'DB_CONN_MAX_AGE')}
+        child_env.update(env)
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.db_connections', '--child', mode,
+             '--requests', str(args.requests), '--threads', str(args.threads)],
+            env=child_env, check=True, stdout=subprocess.PIPE, text=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(
+            f'{mode:<13}{result["p50"]:>8.2f}{result["p95"]:>8.2f}{result["p99"]:>8.2f}{result["rps"]:>8.0f}'
+            f'{result["checkouts"]:>11}{result["connects"]:>10}{result["waits"]:>7}'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,386 @@
+"""
+End-to-end load test of the browse -> cart -> checkout flow.
+
+    python -m benchmarks.load_test --server gunicorn-gthread --users 20 --duration 60
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --label staging
+    python -m benchmarks.load_test --compare load-runserver.json load-gunicorn-gthread.json
+
+Starts the server in the chosen mode (runserver, gunicorn-sync,
+gunicorn-gthread or asgi; DEBUG off, so no debug toolbar) or uses the
+running instance at --url, and runs --users virtual customers concurrently
+for --duration seconds. Each customer, with its own cookies and keep-alive
+connection, repeats the journey:
+
+    catalog -> category -> search -> detail -> cart_add
+            -> checkout_form -> checkout (guest) -> invoice
+
+and the report gives p50/p95/p99 latency, requests per second and errors
+per step. Results go to load-<label>.json; --compare prints several result
+files side by side. Every journey places a real order in the target
+database, so point it at a development or load-test database, never at
+production.
+
+The HTTP client is a small HTTP/1.1 client on asyncio streams, so the tool
+has no dependencies beyond the standard library; the load generator runs in
+one process and should be started on a core the server does not use for
+the numbers to mean anything above a few hundred requests per second.
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import random
+import re
+import signal
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from urllib.parse import urlencode, urlsplit
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+STEPS = ('catalog', 'category', 'search', 'detail', 'cart_add', 'checkout_form', 'checkout', 'invoice')
+SEARCH_TERMS = ('coffee', 'кофе', 'arabica', 'espresso', 'decaf')
+
+# Команды запуска сервера; {host}, {port}, {workers}, {threads} подставляются
+SERVERS = {
+    'runserver': [sys.executable, 'manage.py', 'runserver', '--noreload', '{host}:{port}'],
+    'gunicorn-sync': [
+        sys.executable, '-m', 'gunicorn', 'coffee_shop.wsgi', '-b', '{host}:{port}',
+        '-w', '{workers}', '-k', 'sync',
+    ],
+    'gunicorn-gthread': [
+        sys.executable, '-m', 'gunicorn', 'coffee_shop.wsgi', '-b', '{host}:{port}',
+        '-w', '{workers}', '-k', 'gthread', '--threads', '{threads}',
+    ],
+    'asgi': [
+        sys.executable, '-m', 'uvicorn', 'coffee_shop.asgi:application', '--host', '{host}', '--port', '{port}',
+        '--workers', '{workers}', '--no-access-log',
+    ],
+}
+
+PRODUCT_LINK = re.compile(r'href="(/\d+/[-\w]+/)"')
+CATEGORY_LINK = re.compile(r'href="(/category/[-\w]+/)"')
+ORDER_CREATED = re.compile(r'/orders/created/(\d+)/')
+
+
+class HttpError(Exception):
+    """Unexpected status or a broken connection."""
+
+
+class HttpClient:
+    """HTTP/1.1 keep-alive connection with a cookie jar: one virtual customer."""
+
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.cookies = {}
+        self.reader = self.writer = None
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+    async def request(self, method, path, form=None, headers=None):
+        """Return (status, headers, body); retries once on a connection closed by the server."""
+        for attempt in (1, 2):
+            if self.writer is None:
+                self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+            try:
+                return await self._exchange(method, path, form, headers or {})
+            except (ConnectionError, asyncio.IncompleteReadError):
+                await self.close()
+                if attempt == 2:
+                    raise HttpError(f'{method} {path}: connection closed')
+
+    async def _exchange(self, method, path, form, headers):
+        body = urlencode(form).encode() if form is not None else b''
+        lines = [f'{method} {path} HTTP/1.1', f'Host: {self.host}:{self.port}', 'Accept-Language: ru']
+        if self.cookies:
+            lines.append('Cookie: ' + '; '.join(f'{name}={value}' for name, value in self.cookies.items()))
+        if form is not None:
+            lines += ['Content-Type: application/x-www-form-urlencoded', f'Content-Length: {len(body)}']
+        lines += [f'{name}: {value}' for name, value in headers.items()]
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode() + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readuntil(b'\r\n')
+        if not status_line:
+            raise ConnectionError
+        status = int(status_line.split()[1])
+        response_headers = {}
+        while (line := await self.reader.readuntil(b'\r\n')) != b'\r\n':
+            name, _, value = line.decode('latin-1').partition(':')
+            name, value = name.strip().lower(), value.strip()
+            if name == 'set-cookie':
+                cookie, _, _ = value.partition(';')
+                cookie_name, _, cookie_value = cookie.partition('=')
+                self.cookies[cookie_name] = cookie_value
+            response_headers[name] = value
+
+        if response_headers.get('transfer-encoding') == 'chunked':
+            chunks = []
+            while size := int((await self.reader.readuntil(b'\r\n')).split(b';')[0], 16):
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readexactly(2)
+            await self.reader.readuntil(b'\r\n')
+            data = b''.join(chunks)
+        elif 'content-length' in response_headers:
+            data = await self.reader.readexactly(int(response_headers['content-length']))
+        else:
+            data = await self.reader.read()
+            await self.close()
+        if response_headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return status, response_headers, data
+
+
+class Recorder:
+    """Latencies and errors per step."""
+
+    def __init__(self):
+        self.timings = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.journeys = 0
+
+    async def step(self, name, client, method, path, expect, form=None, headers=None):
+        started = time.perf_counter()
+        try:
+            status, response_headers, body = await client.request(method, path, form, headers)
+        except (HttpError, OSError):
+            self.errors[name] += 1
+            raise
+        self.timings[name].append(time.perf_counter() - started)
+        if status != expect:
+            self.errors[name] += 1
+            raise HttpError(f'{method} {path}: {status}, expected {expect}')
+        return response_headers, body
+
+
+def percentile(timings, fraction):
+    return timings[min(len(timings) - 1, int(len(timings) * fraction))]
+
+
+async def journey(client, recorder, catalog):
+    """One customer visit, from the catalog to the invoice of a guest order."""
+    await recorder.step('catalog', client, 'GET', '/', 200)
+    if catalog['categories']:
+        await recorder.step('category', client, 'GET', random.choice(catalog['categories']), 200)
+    await recorder.step('search', client, 'GET', '/search/?' + urlencode({'q': random.choice(SEARCH_TERMS)}), 200)
+    product = random.choice(catalog['products'])
+    await recorder.step('detail', client, 'GET', product, 200)
+
+    csrf = {'X-CSRFToken': client.cookies.get('csrftoken', '')}
+    product_id = product.strip('/').split('/')[0]
+    await recorder.step('cart_add', client, 'POST', f'/cart/add/{product_id}/', 302,
+                        form={'quantity': 1, 'override': 'False'}, headers=csrf)
+    await recorder.step('checkout_form', client, 'GET', '/orders/checkout/guest/', 200)
+    headers, _ = await recorder.step('checkout', client, 'POST', '/orders/checkout/guest/', 302, form={
+        'first_name': 'Нагрузка', 'last_name': 'Тест', 'email': 'load-test@example.invalid',
+        'phone': '+70000000000', 'address': 'Москва', 'postal_code': '101000', 'city': 'Москва',
+    }, headers={'X-CSRFToken': client.cookies.get('csrftoken', '')})
+    match = ORDER_CREATED.search(headers.get('location', ''))
+    if match is None:
+        recorder.errors['checkout'] += 1
+        raise HttpError(f'checkout redirected to {headers.get("location")!r}')
+    await recorder.step('invoice', client, 'GET', f'/orders/invoice/{match.group(1)}/', 200)
+    recorder.journeys += 1
+
+
+async def customer(host, port, recorder, catalog, deadline, think_time):
+    client = HttpClient(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            try:
+                await journey(client, recorder, catalog)
+            except (HttpError, OSError):
+                # Новый посетитель: сессия с ошибкой могла остаться в странном состоянии
+                await client.close()
+                client = HttpClient(host, port)
+            if think_time:
+                await asyncio.sleep(random.uniform(0, 2 * think_time))
+    finally:
+        await client.close()
+
+
+async def discover(host, port):
+    """Product and category links from the first catalog page."""
+    client = HttpClient(host, port)
+    try:
+        status, _, body = await client.request('GET', '/')
+    finally:
+        await client.close()
+    page = body.decode('utf-8', 'replace')
+    if status != 200:
+        raise SystemExit(f'GET / returned {status}')
+    catalog = {
+        'products': sorted(set(PRODUCT_LINK.findall(page))),
+        'categories': sorted(set(CATEGORY_LINK.findall(page))),
+    }
+    if not catalog['products']:
+        raise SystemExit('No products on the catalog page: load a dataset first (manage.py generate_dataset)')
+    return catalog
+
+
+async def run(host, port, users, duration, think_time, ramp_up):
+    catalog = await discover(host, port)
+    recorder = Recorder()
+    started = time.perf_counter()
+    deadline = started + duration
+    tasks = []
+    for number in range(users):
+        tasks.append(asyncio.create_task(customer(host, port, recorder, catalog, deadline, think_time)))
+        if ramp_up:
+            await asyncio.sleep(ramp_up / users)
+    await asyncio.gather(*tasks)
+    return recorder, time.perf_counter() - started
+
+
+def summarize(recorder, elapsed):
+    steps = {}
+    for name in STEPS:
+        timings = sorted(recorder.timings.get(name, []))
+        if not timings and not recorder.errors.get(name):
+            continue
+        steps[name] = {
+            'requests': len(timings),
+            'errors': recorder.errors.get(name, 0),
+            'rps': round(len(timings) / elapsed, 1),
+            'p50_ms': round(percentile(timings, 0.50) * 1000, 1) if timings else None,
+            'p95_ms': round(percentile(timings, 0.95) * 1000, 1) if timings else None,
+            'p99_ms': round(percentile(timings, 0.99) * 1000, 1) if timings else None,
+        }
+    total = sum(step['requests'] for step in steps.values())
+    return {
+        'elapsed_s': round(elapsed, 1),
+        'journeys': recorder.journeys,
+        'requests': total,
+        'rps': round(total / elapsed, 1),
+        'errors': sum(step['errors'] for step in steps.values()),
+        'steps': steps,
+    }
+
+
+def print_summary(results):
+    summary = results['summary']
+    print(f'{results["label"]}: {results["users"]} users, {summary["elapsed_s"]} s, '
+          f'{summary["journeys"]} journeys, {summary["rps"]} req/s, {summary["errors"]} errors')
+    print(f'{"step":<15}{"req":>8}{"err":>6}{"req/s":>9}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}')
+    for name, step in summary['steps'].items():
+        print(f'{name:<15}{step["requests"]:>8}{step["errors"]:>6}{step["rps"]:>9}'
+              f'{step["p50_ms"] or "-":>9}{step["p95_ms"] or "-":>9}{step["p99_ms"] or "-":>9}')
+
+
+def compare(paths):
+    """Print p95 and req/s of every step for several result files side by side."""
+    runs = [json.loads(Path(path).read_text()) for path in paths]
+    width = max(14, *(len(run['label']) + 2 for run in runs))
+    print(f'{"":<15}' + ''.join(f'{run["label"]:>{width}}' for run in runs))
+    print(f'{"req/s":<15}' + ''.join(f'{run["summary"]["rps"]:>{width}}' for run in runs))
+    print(f'{"errors":<15}' + ''.join(f'{run["summary"]["errors"]:>{width}}' for run in runs))
+    print('p95 ms / p99 ms')
+    for name in STEPS:
+        cells = []
+        for run in runs:
+            step = run['summary']['steps'].get(name)
+            cells.append(f'{step["p95_ms"]} / {step["p99_ms"]}' if step and step['p95_ms'] is not None else '-')
+        print(f'{name:<15}' + ''.join(f'{cell:>{width}}' for cell in cells))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(mode, host, port, workers, threads, debug):
+    command = [part.format(host=host, port=port, workers=workers, threads=threads) for part in SERVERS[mode]]
+    # gunicorn есть в requirements.txt, uvicorn для режима asgi ставится отдельно
+    if command[1] == '-m' and importlib.util.find_spec(command[2]) is None:
+        raise SystemExit(f'--server {mode} needs {command[2]}: pip install {command[2]}')
+    env = {**os.environ, 'DEBUG': 'True' if debug else 'False', 'WEB_THREADS': str(threads)}
+    server = subprocess.Popen(command, cwd=BASE_DIR, env=env, start_new_session=True)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit(f'{" ".join(command)} exited with {server.returncode}')
+        try:
+            socket.create_connection((host, port), timeout=0.5).close()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    stop_server(server)
+    raise SystemExit(f'{mode} did not start listening on {host}:{port} in 30 s')
+
+
+def stop_server(server):
+    # gunicorn и uvicorn порождают воркеров: останавливаем всю группу процессов
+    os.killpg(server.pid, signal.SIGTERM)
+    try:
+        server.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        os.killpg(server.pid, signal.SIGKILL)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--server', choices=SERVERS, help='Start the server in this mode')
+    target.add_argument('--url', help='Load an already running instance, e.g. http://127.0.0.1:8000')
+    target.add_argument('--compare', nargs='+', metavar='RESULTS', help='Compare result files and exit')
+    parser.add_argument('--users', type=int, default=10, help='Concurrent virtual customers')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds to run')
+    parser.add_argument('--ramp-up', type=float, default=0, help='Seconds over which customers start')
+    parser.add_argument('--think-time', type=float, default=0, help='Mean pause between journeys, s')
+    parser.add_argument('--workers', type=int, default=2, help='Server worker processes (gunicorn, asgi)')
+    parser.add_argument('--threads', type=int, default=4, help='Threads per worker (gunicorn-gthread)')
+    parser.add_argument('--debug', action='store_true', help='Run the started server with DEBUG on')
+    parser.add_argument('--label', help='Name of this run (default: the server mode or host)')
+    parser.add_argument('--output', help='Results file (default: load-<label>.json)')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(args.compare)
+        return
+
+    server = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+    else:
+        mode = args.server or 'runserver'
+        host, port = '127.0.0.1', free_port()
+        server = start_server(mode, host, port, args.workers, args.threads, args.debug)
+    label = args.label or args.server or (f'{host}:{port}' if args.url else 'runserver')
+    try:
+        recorder, elapsed = asyncio.run(
+            run(host, port, args.users, args.duration, args.think_time, args.ramp_up)
+        )
+    finally:
+        if server is not None:
+            stop_server(server)
+
+    results = {
+        'label': label,
+        'server': None if args.url else (args.server or 'runserver'),
+        'url': args.url,
+        'users': args.users,
+        'duration_s': args.duration,
+        'think_time_s': args.think_time,
+        'workers': None if args.url else args.workers,
+        'threads': None if args.url else args.threads,
+        'started_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'summary': summarize(recorder, elapsed),
+    }
+    output = Path(args.output or f'load-{label.replace(":", "-").replace("/", "-")}.json')
+    output.write_text(json.dumps(results, ensure_ascii=False, indent=2))
+    print_summary(results)
+    print(f'Results: {output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Per-request cost of the metrics and Server-Timing middleware.
+
+    python -m benchmarks.metrics_overhead [--requests 100000]
+
+Calls a view that does nothing bare, through MetricsMiddleware, and
+through MetricsMiddleware + ServerTimingMiddleware (every request timed and
+given the header), and prints the cost per request. The SQL, template and
+cache hooks only add a context variable lookup to each
+query/render/lookup and are not part of this number.
+"""
+import argparse
+import os
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'coffee_shop.settings')
+django.setup()
+
+from django.http import HttpResponse  # noqa: E402
+from django.test import RequestFactory, override_settings  # noqa: E402
+from django.urls import resolve  # noqa: E402
+
+from apps.core import metrics, server_timing  # noqa: E402
+
+
+def measure(handler, request, count):
+    started = time.perf_counter()
+    for _ in range(count):
+        handler(request)
+    return (time.perf_counter() - started) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=100000, help='Calls per measurement')
+    args = parser.parse_args()
+
+    def view(request):
+        return HttpResponse()
+
+    request = RequestFactory().get('/orders/history/')
+    request.resolver_match = resolve('/orders/history/')
+    with override_settings(SERVER_TIMING='all', SERVER_TIMING_SAMPLE_RATE=1.0):
+        stacks = {
+            'metrics': metrics.MetricsMiddleware(view),
+            'metrics + server timing': metrics.MetricsMiddleware(server_timing.ServerTimingMiddleware(view)),
+        }
+        bare = min(measure(view, request, args.requests) for _ in range(3))
+        print(f'{"bare view":<25}{bare * 1e6:>8.2f} us/request')
+        for name, handler in stacks.items():
+            measure(handler, request, 1000)  # прогрев
+            wrapped = min(measure(handler, request, args.requests) for _ in range(3))
+            print(f'{name:<25}{wrapped * 1e6:>8.2f} us/request (+{(wrapped - bare) * 1e6:.2f})')
+
+
+if __name__ == '__main__':
+    main()
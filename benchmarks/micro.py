@@ -0,0 +1,261 @@
+"""
+Micro-benchmarks of hot-path functions with stored baselines.
+
+    python -m benchmarks.micro [cart.iter pdf.invoice ...] [--json results.json]
+    python -m benchmarks.micro --update-baseline
+
+Each benchmark is a bench_* function that prepares its inputs (a fixture,
+in pytest terms) and returns the callable to time. The callable is run in batches of at least --batch-ms; the median time per
+call over --repeat batches is compared with benchmarks/baselines/micro.json,
+and a benchmark slower than baseline * --threshold is a regression (exit
+status 1). --json writes machine-readable results (with the commit) to
+chart across commits; --update-baseline stores the current numbers.
+
+Benchmarks that touch the database run in a throwaway test database filled
+by apps.core.budgets.seed(). Baselines depend on the machine: update them
+on the machine that checks them.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'coffee_shop.settings')
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth.models import AnonymousUser  # noqa: E402
+from django.contrib.sessions.backends.signed_cookies import SessionStore  # noqa: E402
+from django.template.loader import render_to_string  # noqa: E402
+from django.test import RequestFactory, override_settings  # noqa: E402
+from django.test.utils import (  # noqa: E402
+    setup_databases, setup_test_environment, teardown_databases, teardown_test_environment,
+)
+
+from apps.core import budgets  # noqa: E402
+from apps.orders.pdf_utils import generate_invoice_pdf, generate_receipt_pdf  # noqa: E402
+from apps.products import context_processors as product_context  # noqa: E402
+from apps.products.forms import ProductSearchForm  # noqa: E402
+from apps.products.models import Category, Product  # noqa: E402
+from apps.shop_cart import context_processors as cart_context  # noqa: E402
+from apps.shop_cart.cart import Cart  # noqa: E402
+from apps.shop_cart.forms import CartAddProductForm  # noqa: E402
+from benchmarks.pdf_render import make_order  # noqa: E402
+
+BASELINES = Path(__file__).resolve().parent / 'baselines' / 'micro.json'
+
+CART_ITEMS = 5
+PDF_LINES = 20
+
+
+def _request(cart_products=()):
+    """GET / of an anonymous visitor with an in-memory session and cart."""
+    request = RequestFactory().get('/')
+    request.session = SessionStore()
+    request.user = AnonymousUser()
+    if cart_products:
+        request.session[settings.CART_SESSION_ID] = {
+            str(product.pk): {'quantity': 1, 'price': str(product.price)} for product in cart_products
+        }
+    return request
+
+
+def _products(count):
+    return list(Product.objects.select_related('category').order_by('pk')[:count])
+
+
+def bench_cart_iter():
+    """Iterate a cart of 5 products (one products query)."""
+    request = _request(_products(CART_ITEMS))
+    return lambda: list(Cart(request))
+
+
+def bench_cart_total():
+    """Total price of a cart of 5 products."""
+    cart = Cart(_request(_products(CART_ITEMS)))
+    return cart.get_total_price
+
+
+def bench_cart_add():
+    """Add a product to the cart (setting its quantity, so the cart stays the same)."""
+    product = _products(1)[0]
+    cart = Cart(_request())
+    return lambda: cart.add(product, quantity=2, override_quantity=True)
+
+
+def bench_search_build():
+    """Validate the search form and build the SQL of its queryset (not executed)."""
+    data = {'q': 'coffee', 'min_price': '100', 'max_price': '900', 'in_stock': 'on', 'sort_by': 'price'}
+
+    def build():
+        form = ProductSearchForm(data)
+        form.is_valid()
+        return str(form.search().query)
+    return build
+
+
+def bench_pdf_invoice():
+    """Render an invoice with 20 lines."""
+    order = make_order(PDF_LINES)
+    return lambda: generate_invoice_pdf(order)
+
+
+def bench_pdf_receipt():
+    """Render a receipt with 20 lines."""
+    order = make_order(PDF_LINES)
+    return lambda: generate_receipt_pdf(order)
+
+
+def bench_cp_categories():
+    """The categories context processor, evaluated (one query)."""
+    request = _request()
+    return lambda: list(product_context.categories(request)['categories'])
+
+
+def bench_cp_cart():
+    """The cart context processor."""
+    request = _request(_products(CART_ITEMS))
+    return lambda: cart_context.cart(request)
+
+
+def bench_template_product_list():
+    """Render products/product_list.html with 12 products (context processors included)."""
+    request = _request()
+    context = {
+        'products': _products(12),
+        'categories': list(Category.objects.all()),
+        'cart_product_form': CartAddProductForm(),
+        'search_query': '',
+        'current_category': None,
+    }
+    return lambda: render_to_string('products/product_list.html', context, request=request)
+
+
+BENCHMARKS = {
+    name[len('bench_'):].replace('_', '.', 1): function
+    for name, function in list(globals().items()) if name.startswith('bench_')
+}
+
+
+def time_call(function, batch_ms, repeat):
+    """Median and minimum seconds per call over ``repeat`` batches of at least ``batch_ms``."""
+    function()  # прогрев: кэши шрифтов, шаблонов, ContentType
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            function()
+        elapsed = time.perf_counter() - started
+        if elapsed * 1000 >= batch_ms:
+            break
+        # Быстрые функции повторяем в цикле, чтобы пачка шла не меньше batch_ms
+        loops = max(loops * 2, math.ceil(loops * batch_ms / max(elapsed * 1000, 1e-3)))
+    samples = [elapsed / loops]
+    for _ in range(repeat - 1):
+        started = time.perf_counter()
+        for _ in range(loops):
+            function()
+        samples.append((time.perf_counter() - started) / loops)
+    return statistics.median(samples), min(samples), loops
+
+
+def commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(names, batch_ms, repeat):
+    setup_test_environment(debug=False)
+    databases = setup_databases(verbosity=0, interactive=False, aliases={'default'})
+    try:
+        # Запросы идут в тестовую базу, реплика и поиск N+1 не участвуют
+        with override_settings(REPLICA_ALIAS=None, NPLUSONE='off'):
+            budgets.seed()
+            results = {}
+            for name in names:
+                median, best, loops = time_call(BENCHMARKS[name](), batch_ms, repeat)
+                results[name] = {'us': round(median * 1e6, 2), 'min_us': round(best * 1e6, 2), 'loops': loops}
+                print(f'{name:<24}{median * 1e6:>12.1f} us', file=sys.stderr)
+            return results
+    finally:
+        teardown_databases(databases, verbosity=0)
+        teardown_test_environment()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('names', nargs='*', help=f'Benchmarks to run (default: all): {", ".join(BENCHMARKS)}')
+    parser.add_argument('--repeat', type=int, default=7, help='Timed batches per benchmark')
+    parser.add_argument('--batch-ms', type=float, default=100, help='Minimum duration of a batch')
+    parser.add_argument('--threshold', type=float, default=1.3,
+                        help='Slower than baseline * threshold is a regression')
+    parser.add_argument('--json', metavar='PATH', help='Write results as JSON ("-" for stdout)')
+    parser.add_argument('--update-baseline', action='store_true', help='Store the results as the new baseline')
+    args = parser.parse_args()
+
+    unknown = set(args.names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f'unknown benchmarks: {", ".join(sorted(unknown))}')
+    names = args.names or list(BENCHMARKS)
+    results = run(names, args.batch_ms, args.repeat)
+
+    baseline = json.loads(BASELINES.read_text())['results'] if BASELINES.exists() else {}
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        result['baseline_us'] = base['us'] if base else None
+        result['ratio'] = round(result['us'] / base['us'], 2) if base else None
+        result['regression'] = bool(base) and result['us'] > base['us'] * args.threshold
+        if result['regression']:
+            regressions.append(name)
+
+    report = {
+        'commit': commit(),
+        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.node(),
+        'threshold': args.threshold,
+        'results': results,
+    }
+    # С --json - в stdout идет только JSON, таблица - в stderr
+    out = sys.stderr if args.json == '-' else sys.stdout
+    print(f'\n{"benchmark":<24}{"us/call":>12}{"baseline":>12}{"ratio":>8}', file=out)
+    for name, result in results.items():
+        base = f'{result["baseline_us"]:.1f}' if result['baseline_us'] else '-'
+        ratio = f'{result["ratio"]:.2f}' if result['ratio'] else '-'
+        print(f'{name:<24}{result["us"]:>12.1f}{base:>12}{ratio:>8}' + ('  REGRESSION' if result['regression'] else ''),
+              file=out)
+
+    if args.json == '-':
+        print(json.dumps(report, indent=2))
+    elif args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+    if args.update_baseline:
+        stored = json.loads(BASELINES.read_text()) if BASELINES.exists() else {'results': {}}
+        stored['results'].update({
+            name: {'us': result['us']} for name, result in results.items()
+        })
+        stored.update(commit=report['commit'], date=report['date'], machine=report['machine'])
+        BASELINES.parent.mkdir(exist_ok=True)
+        BASELINES.write_text(json.dumps(stored, indent=2, sort_keys=True) + '\n')
+        print(f'Baseline updated: {BASELINES}', file=out)
+    elif regressions:
+        print(f'Regressions (> x{args.threshold}): {", ".join(regressions)}', file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Documents per second of the invoice and receipt renderers.
+
+    python -m benchmarks.pdf_render [--seconds 2]
+
+Orders are built in memory (no database access), so the numbers measure
+reportlab rendering only.
+"""
+import argparse
+import os
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'coffee_shop.settings')
+django.setup()
+
+from apps.orders.models import Order  # noqa: E402
+from apps.orders.pdf_utils import generate_invoice_pdf, generate_receipt_pdf  # noqa: E402
+
+LINE_COUNTS = (1, 20, 200)
+
+
+def make_order(line_count):
+    order = Order(
+        id=1000 + line_count, first_name='Иван', last_name='Петров', email='buyer@example.com',
+        address='г. Москва, ул. Примерная, д. 1', postal_code='101000', city='Москва',
+        phone='+7 (999) 123-45-67', paid=True,
+        created_at=datetime(2025, 3, 1, 12, 30, tzinfo=timezone.utc),
+    )
+    order.apply_snapshot(Order.build_snapshot([
+        (i, f'coffee-{i}', f'Кофе в зёрнах №{i}', Decimal('450.50') + i, i % 3 + 1, '')
+        for i in range(1, line_count + 1)
+    ]))
+    return order
+
+
+def measure(render, order, seconds):
+    render(order)  # прогрев
+    count = 0
+    started = time.perf_counter()
+    while True:
+        render(order)
+        count += 1
+        elapsed = time.perf_counter() - started
+        if elapsed >= seconds:
+            return count / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=2.0, help='Duration of each measurement')
+    args = parser.parse_args()
+
+    print(f'{"document":<10}{"lines":>7}{"docs/s":>10}')
+    for name, render in (('invoice', generate_invoice_pdf), ('receipt', generate_receipt_pdf)):
+        for line_count in LINE_COUNTS:
+            rate = measure(render, make_order(line_count), args.seconds)
+            print(f'{name:<10}{line_count:>7}{rate:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
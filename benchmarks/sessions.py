@@ -0,0 +1,186 @@
+"""
+Session load and save under concurrency: database backend against Redis.
+
+    python -m benchmarks.sessions [--concurrency 1 4 16] [--ops 2000] [--redis-url redis://localhost:6379/15]
+
+--sessions sessions holding what a signed-in shopper has (auth keys, a cart
+of --cart-items products, pending messages) are created in each engine,
+then --concurrency threads pick random sessions and either load them (a
+new store reads the user id and the cart, as AuthenticationMiddleware and
+the cart badge do) or change one cart quantity and save, the way
+cart_add does. Every thread has its own database connection. The database
+engine runs in a throwaway test database; the Redis one uses --redis-url
+(local:// is the in-process stand-in, which shows the cost of the engine
+itself rather than of the network) and deletes the keys it created.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'coffee_shop.settings')
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY  # noqa: E402
+from django.contrib.sessions.backends import db  # noqa: E402
+from django.db import connections  # noqa: E402
+from django.test import override_settings  # noqa: E402
+from django.test.utils import (  # noqa: E402
+    setup_databases, setup_test_environment, teardown_databases, teardown_test_environment,
+)
+
+from apps.core import redis_sessions  # noqa: E402
+
+ENGINES = {'db': db.SessionStore, 'redis': redis_sessions.SessionStore}
+
+
+def percentile(timings, fraction):
+    return timings[min(len(timings) - 1, int(len(timings) * fraction))]
+
+
+def session_data(cart_items):
+    return {
+        SESSION_KEY: str(random.randint(1, 100000)),
+        BACKEND_SESSION_KEY: settings.AUTHENTICATION_BACKENDS[0],
+        HASH_SESSION_KEY: '%064x' % random.getrandbits(256),
+        'cart': {
+            str(pk): {'quantity': random.randint(1, 5), 'price': f'{random.randint(200, 2000)}.00'}
+            for pk in random.sample(range(1, 2000), cart_items)
+        },
+        '_messages': json.dumps([[
+            '__json_message', 0, 25, 'Товар добавлен в корзину',
+        ]], ensure_ascii=False),
+    }
+
+
+def load(store_class, key):
+    session = store_class(key)
+    session.get(SESSION_KEY)
+    return session.get('cart')
+
+
+def save(store_class, key):
+    session = store_class(key)
+    cart = session['cart']
+    item = cart[random.choice(list(cart))]
+    item['quantity'] = item['quantity'] % 5 + 1
+    session.modified = True
+    session.save()
+
+
+def measure(store_class, keys, threads, ops):
+    timings = {'load': [], 'save': []}
+    lock = threading.Lock()
+    errors = []
+
+    def worker(count):
+        local = {'load': [], 'save': []}
+        try:
+            for _ in range(count):
+                operation = 'save' if random.random() < 0.5 else 'load'
+                key = random.choice(keys)
+                started = time.perf_counter()
+                (save if operation == 'save' else load)(store_class, key)
+                local[operation].append((time.perf_counter() - started) * 1000)
+        except Exception as e:  # noqa: BLE001 - ошибку показываем после join
+            errors.append(e)
+        finally:
+            connections.close_all()
+        with lock:
+            for operation, values in local.items():
+                timings[operation].extend(values)
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(ops // threads,)) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    if errors:
+        raise errors[0]
+
+    result = {}
+    for operation, values in timings.items():
+        values.sort()
+        result[operation] = {
+            'ops': len(values), 'per_second': round(len(values) / elapsed),
+            'p50_ms': round(percentile(values, 0.5), 3) if values else None,
+            'p95_ms': round(percentile(values, 0.95), 3) if values else None,
+        }
+    return result
+
+
+def run(engines, levels, ops, sessions, cart_items, redis_url):
+    setup_test_environment(debug=False)
+    databases = setup_databases(verbosity=0, interactive=False, aliases={'default'})
+    results = {}
+    try:
+        with override_settings(REPLICA_ALIAS=None, NPLUSONE='off', SESSION_REDIS_URL=redis_url):
+            for engine in engines:
+                store_class = ENGINES[engine]
+                keys = []
+                for _ in range(sessions):
+                    session = store_class()
+                    session.update(session_data(cart_items))
+                    session.create()
+                    keys.append(session.session_key)
+                connections.close_all()
+                measure(store_class, keys, 1, min(ops, 200))  # прогрев
+                results[engine] = {}
+                for threads in levels:
+                    results[engine][threads] = measure(store_class, keys, threads, ops)
+                    print(f'{engine} x{threads} done', file=sys.stderr)
+                if engine == 'redis':
+                    for key in keys:
+                        store_class().delete(key)
+        return results
+    finally:
+        connections.close_all()
+        teardown_databases(databases, verbosity=0)
+        teardown_test_environment()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--engines', nargs='+', choices=ENGINES, default=list(ENGINES))
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 4, 16], help='Thread counts to run')
+    parser.add_argument('--ops', type=int, default=2000, help='Operations per concurrency level')
+    parser.add_argument('--sessions', type=int, default=500, help='Sessions created per engine')
+    parser.add_argument('--cart-items', type=int, default=5, help='Products in every cart')
+    parser.add_argument('--redis-url', default=settings.SESSION_REDIS_URL,
+                        help='Redis for the redis engine (local:// for the in-process stand-in)')
+    parser.add_argument('--json', metavar='PATH', help='Write results as JSON ("-" for stdout)')
+    args = parser.parse_args()
+
+    results = run(args.engines, args.concurrency, args.ops, args.sessions, args.cart_items, args.redis_url)
+
+    # С --json - в stdout идет только JSON, таблица - в stderr
+    out = sys.stderr if args.json == '-' else sys.stdout
+    print(f'\n{"engine":<8}{"threads":>8}{"load/s":>9}{"p50 ms":>8}{"p95 ms":>8}{"save/s":>9}{"p50 ms":>8}{"p95 ms":>8}',
+          file=out)
+    for engine, levels in results.items():
+        for threads, result in levels.items():
+            load_, save_ = result['load'], result['save']
+            print(
+                f'{engine:<8}{threads:>8}{load_["per_second"]:>9}{load_["p50_ms"]:>8.2f}{load_["p95_ms"]:>8.2f}'
+                f'{save_["per_second"]:>9}{save_["p50_ms"]:>8.2f}{save_["p95_ms"]:>8.2f}',
+                file=out
+            )
+
+    report = {'redis_url': args.redis_url, 'cart_items': args.cart_items, 'results': results}
+    if args.json == '-':
+        print(json.dumps(report, indent=2))
+    elif args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,8 @@
+import importlib.util
 import os
+import sys
 from pathlib import Path
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -11,6 +14,8 @@ SECRET_KEY = os.environ.get('SECRET_KEY', 'django-insecure-gnyankbr5(8zu3u!$1996
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = os.environ.get('DEBUG', 'True') == 'True'
 
+TESTING = 'test' in sys.argv
+
 # Custom user model
 AUTH_USER_MODEL = 'accounts.User'
 
@@ -20,18 +25,20 @@ ALLOWED_HOSTS = ['*']
 # Application definition
 
 INSTALLED_APPS = [
-    'django.contrib.admin',
+    # Без автопоиска admin.py при старте: его делает urls.py при первом запросе,
+    # поэтому воркеры, Celery и команды не импортируют import_export (openpyxl, numpy)
+    'django.contrib.admin.apps.SimpleAdminConfig',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     
     # Third-party apps
     'rest_framework',
     'django_filters',
     'import_export',
-    'debug_toolbar',
     
     # Local apps
     'apps.core',
@@ -46,9 +53,13 @@ EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'  # For developm
 # For production, you'll want to configure a real email backend
 
 MIDDLEWARE = [
+    # Первым, чтобы замерять весь запрос (apps/core/metrics.py)
+    'apps.core.metrics.MetricsMiddleware',
+    'apps.core.server_timing.ServerTimingMiddleware',
+    'apps.core.nplusone.NPlusOneMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'apps.core.db_routing.PrimaryPinMiddleware',
     'django.middleware.locale.LocaleMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -72,6 +83,8 @@ TEMPLATES = [
                 'django.contrib.messages.context_processors.messages',
                 'apps.products.context_processors.categories',
                 'apps.shop_cart.context_processors.cart',
+                # После встроенного csrf: подменяет токен в страницах для кэша
+                'apps.core.page_cache.csrf_placeholder',
             ],
         },
     },
@@ -95,12 +108,87 @@ DATABASES = {
         'PASSWORD': os.environ.get('POSTGRES_PASSWORD', 'coffee_password'),
         'HOST': os.environ.get('DB_HOST', 'localhost'),
         'PORT': os.environ.get('DB_PORT', '5434'),
+        'OPTIONS': {
+            # Имя видно в pg_stat_activity, по нему check_postgres находит наши соединения
+            'application_name': 'coffee_shop',
+        },
     }
 }
 
+# Соединения с базой (см. apps/core/db_pool.py). По умолчанию постоянные: одно на
+# поток воркера, живет DB_CONN_MAX_AGE секунд и проверяется перед повторным
+# использованием. DB_POOL=1 включает пул psycopg 3 (нужен пакет "psycopg[pool]"),
+# размером на процесс: воркеров x DB_POOL_MAX_SIZE не должно превышать max_connections.
+WEB_THREADS = int(os.environ.get('WEB_THREADS', '1'))
+if os.environ.get('DB_POOL') == '1':
+    if importlib.util.find_spec('psycopg_pool') is None:
+        raise ImproperlyConfigured('DB_POOL=1 требует пакет "psycopg[binary,pool]"')
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', '1')),
+        # По соединению на поток и одно про запас (фоновые задачи, админка)
+        'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', str(WEB_THREADS + 1))),
+        'timeout': float(os.environ.get('DB_POOL_TIMEOUT', '10')),
+        'max_lifetime': float(os.environ.get('DB_POOL_MAX_LIFETIME', '1800')),
+    }
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', '60'))
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+# Реплика только для чтения (каталог, поиск, отчеты), см. apps/core/db_routing.py
+if os.environ.get('DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+        'HOST': os.environ['DB_REPLICA_HOST'],
+        'PORT': os.environ.get('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+elif TESTING:
+    # В тестах реплика - зеркало основной базы; маршрутизацию включают сами тесты
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['apps.core.db_routing.ReplicaRouter']
+REPLICA_ALIAS = 'replica' if 'replica' in DATABASES and not TESTING else None
+# Сколько секунд после записи клиент читает только с основной базы
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', '10'))
+
+# Кэш: Redis, общий для всех процессов, если задан CACHE_REDIS_URL, иначе память процесса
+if os.environ.get('CACHE_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['CACHE_REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Кэш страниц каталога для анонимных посетителей (apps/core/page_cache.py).
+# В тестах выключен: его включают тесты самого кэша
+PAGE_CACHE_ENABLED = os.environ.get('PAGE_CACHE', '0' if TESTING else '1') == '1'
+PAGE_CACHE_ALIAS = 'default'
+# Сколько секунд страница свежая и сколько еще отдается, пока ее пересобирают
+PAGE_CACHE_TIMEOUT = int(os.environ.get('PAGE_CACHE_TIMEOUT', '300'))
+PAGE_CACHE_GRACE = int(os.environ.get('PAGE_CACHE_GRACE', '60'))
+# Вероятностное обновление до истечения (XFetch): больше - раньше
+PAGE_CACHE_BETA = float(os.environ.get('PAGE_CACHE_BETA', '1'))
+# Сколько секунд держится блокировка пересборки и ждут ее остальные запросы
+PAGE_CACHE_LOCK_TIMEOUT = int(os.environ.get('PAGE_CACHE_LOCK_TIMEOUT', '10'))
+
 # Redis/Celery settings
 CELERY_BROKER_URL = f"redis://{os.environ.get('REDIS_HOST', 'redis')}:{os.environ.get('REDIS_PORT', '6379')}/0"
 CELERY_RESULT_BACKEND = f"redis://{os.environ.get('REDIS_HOST', 'redis')}:{os.environ.get('REDIS_PORT', '6379')}/0"
+# В тестах задачи выполняются синхронно, без брокера
+CELERY_TASK_ALWAYS_EAGER = TESTING
+CELERY_TASK_EAGER_PROPAGATES = TESTING
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -174,6 +262,15 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Columnar order-line exports for analytics (see apps/orders/analytics.py)
+ANALYTICS_ROOT = os.environ.get('ANALYTICS_ROOT', os.path.join(BASE_DIR, 'var', 'analytics'))
+
+# Rendered invoices and receipts, keyed by order content (see apps/orders/documents.py)
+DOCUMENTS_ROOT = os.environ.get('DOCUMENTS_ROOT', os.path.join(BASE_DIR, 'var', 'documents'))
+
+# Compressed archive of old delivered/cancelled orders (see apps/orders/archive.py)
+ORDER_ARCHIVE_ROOT = os.environ.get('ORDER_ARCHIVE_ROOT', os.path.join(BASE_DIR, 'var', 'order_archive'))
+
 # Login/Logout URLs
 LOGIN_URL = 'accounts:login'
 LOGIN_REDIRECT_URL = 'products:product_list'
@@ -181,6 +278,15 @@ LOGOUT_REDIRECT_URL = 'products:product_list'
 
 # Session settings
 SESSION_COOKIE_AGE = 1209600  # 2 weeks in seconds
+# 'apps.core.redis_sessions' хранит сессии в хешах Redis вместо таблицы django_session.
+# SESSION_REDIS_URL=local:// - хранилище в памяти процесса (тесты, разработка без Redis)
+SESSION_ENGINE = os.environ.get('SESSION_ENGINE', 'django.contrib.sessions.backends.db')
+SESSION_REDIS_URL = os.environ.get(
+    'SESSION_REDIS_URL', f"redis://{os.environ.get('REDIS_HOST', 'redis')}:{os.environ.get('REDIS_PORT', '6379')}/1"
+)
+SESSION_REDIS_PREFIX = 'session:'
+# Значения полей сессии от этого размера (байт) сжимаются zlib
+SESSION_REDIS_COMPRESS_MIN = int(os.environ.get('SESSION_REDIS_COMPRESS_MIN', '512'))
 CART_SESSION_ID = 'cart'
 
 # Default primary key field type
@@ -188,18 +294,56 @@ CART_SESSION_ID = 'cart'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-# Debug Toolbar settings
+# Debug Toolbar settings: only in debug mode and never in tests
+DEBUG_TOOLBAR = DEBUG and not TESTING
+if DEBUG_TOOLBAR:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.insert(MIDDLEWARE.index('django.middleware.security.SecurityMiddleware') + 1,
+                      'debug_toolbar.middleware.DebugToolbarMiddleware')
+
 INTERNAL_IPS = [
     '127.0.0.1',
+    '10.0.2.2',
 ]
 
-# Debug Toolbar settings
+# Адреса шлюзов Docker вычисляются при первом запросе, а не при импорте настроек
 DEBUG_TOOLBAR_CONFIG = {
-    'SHOW_TOOLBAR_CALLBACK': lambda request: DEBUG,
+    'SHOW_TOOLBAR_CALLBACK': 'apps.core.debug.show_toolbar',
+}
+
+# Бюджет холодного старта в миллисекундах (python manage.py profile_startup)
+STARTUP_BUDGET_MS = {
+    'check': int(os.environ.get('STARTUP_BUDGET_CHECK_MS', '1200')),
+    'wsgi': int(os.environ.get('STARTUP_BUDGET_WSGI_MS', '800')),
 }
 
-# Ensure the debug toolbar is only shown in debug mode
-if DEBUG:
-    import socket
-    hostname, _, ips = socket.gethostbyname_ex(socket.gethostname())
-    INTERNAL_IPS = [ip[: ip.rfind(".")] + ".1" for ip in ips] + ["127.0.0.1", "10.0.2.2"]
+# Множитель бюджетов времени ответа страниц (apps/core/budgets.py) для медленных машин CI
+VIEW_BUDGET_TIME_FACTOR = float(os.environ.get('VIEW_BUDGET_TIME_FACTOR', '1'))
+
+# Базовые планы запросов основных страниц для manage.py query_plans (apps/core/query_plans.py)
+QUERY_PLANS_BASELINE = os.environ.get(
+    'QUERY_PLANS_BASELINE', str(BASE_DIR / 'benchmarks' / 'baselines' / 'query_plans.json')
+)
+
+# Метрики запросов для Prometheus на /metrics (apps/core/metrics.py).
+# При нескольких процессах (gunicorn) METRICS_DIR - общий каталог, который очищают при деплое
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+METRICS_DIR = os.environ.get('METRICS_DIR') or None
+METRICS_FLUSH_SECONDS = float(os.environ.get('METRICS_FLUSH_SECONDS', '1'))
+# Токен для сборщика метрик без сессии: Authorization: Bearer <METRICS_TOKEN>
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Заголовок Server-Timing с разбивкой времени запроса (apps/core/server_timing.py):
+# off, staff (только персоналу) или all; доля запросов, которые замеряются
+SERVER_TIMING = os.environ.get('SERVER_TIMING', 'off')
+SERVER_TIMING_SAMPLE_RATE = float(os.environ.get('SERVER_TIMING_SAMPLE_RATE', '1'))
+
+# Поиск N+1 запросов (apps/core/nplusone.py): off, log или raise.
+# По умолчанию включен только при разработке; в тестах - через NPLUSONE=raise
+NPLUSONE = os.environ.get('NPLUSONE', 'log' if DEBUG and not TESTING else 'off')
+# Сколько одинаковых запросов из одного места за запрос считать N+1
+NPLUSONE_THRESHOLD = int(os.environ.get('NPLUSONE_THRESHOLD', '3'))
+# Шаблоны fnmatch мест вызова ("apps/shop_cart/*") или SQL, которые не сообщаются
+NPLUSONE_ALLOW = [p for p in os.environ.get('NPLUSONE_ALLOW', '').split(',') if p]
+# Файл JSON lines для команды nplusone_report
+NPLUSONE_LOG = os.environ.get('NPLUSONE_LOG') or None
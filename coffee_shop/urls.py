@@ -23,9 +23,14 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from apps.core import views as core_views
+
 # Импорт представлений текущего приложения
 from . import views
 
+# Админка подключена через SimpleAdminConfig: модели регистрируются при загрузке URL
+admin.autodiscover()
+
 # Основные URL-маршруты приложения
 urlpatterns = [
     # Админ-панель Django
@@ -46,6 +51,12 @@ urlpatterns = [
     # Статические страницы
     path('about/', views.about, name='about'),  # Страница "О нас"
     path('contact/', views.contact, name='contact'),  # Страница контактов
+
+    # Метрики для Prometheus (только персонал или токен METRICS_TOKEN)
+    path('metrics', core_views.metrics, name='metrics'),
+
+    # Корзина, сообщения и CSRF-токен для страниц из кэша (apps/core/page_cache.py)
+    path('fragments/', core_views.page_fragments, name='page_fragments'),
 ]
 
 # Обслуживание медиафайлов в режиме разработки
@@ -53,7 +64,7 @@ if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     
 # Добавление Django Debug Toolbar в режиме разработки
-if settings.DEBUG:
+if settings.DEBUG_TOOLBAR:
     import debug_toolbar
     urlpatterns = [
         # URL для отладки
@@ -0,0 +1,55 @@
+// Personal parts of a page served from the page cache (apps/core/page_cache.py):
+// the cart badge, messages and the visitor's CSRF token come from the page_fragments view.
+(function() {
+    const url = document.body.dataset.fragmentsUrl;
+    if (!url) {
+        return;
+    }
+
+    const ICONS = {
+        success: 'fa-check-circle',
+        error: 'fa-exclamation-circle',
+        danger: 'fa-exclamation-circle',
+        warning: 'fa-exclamation-triangle',
+    };
+
+    function renderMessage(message) {
+        const alert = document.createElement('div');
+        alert.className = `alert alert-${message.tags} alert-dismissible fade show`;
+        alert.setAttribute('role', 'alert');
+
+        const row = document.createElement('div');
+        row.className = 'd-flex align-items-center';
+        const icon = document.createElement('i');
+        icon.className = `fas ${ICONS[message.tags] || 'fa-info-circle'} me-2`;
+        const text = document.createElement('div');
+        text.textContent = message.text;
+        row.append(icon, text);
+
+        const close = document.createElement('button');
+        close.type = 'button';
+        close.className = 'btn-close';
+        close.dataset.bsDismiss = 'alert';
+        close.setAttribute('aria-label', 'Закрыть');
+
+        alert.append(row, close);
+        return alert;
+    }
+
+    fetch(url, {credentials: 'same-origin', headers: {'Accept': 'application/json'}})
+        .then(response => response.ok ? response.json() : Promise.reject(response.status))
+        .then(data => {
+            // The cached page holds a placeholder instead of a token
+            document.querySelectorAll('input[name=csrfmiddlewaretoken]').forEach(input => {
+                input.value = data.csrf_token;
+            });
+            document.querySelectorAll('[data-fragment="cart-count"]').forEach(badge => {
+                badge.textContent = data.cart_count;
+            });
+            const container = document.getElementById('messages');
+            if (container) {
+                data.messages.forEach(message => container.append(renderMessage(message)));
+            }
+        })
+        .catch(error => console.error('Page fragments:', error));
+})();